@@ -0,0 +1,142 @@
+import queue
+import uuid
+
+import numpy as np
+
+import audio_processor
+import vad
+from model_registry import ModelUnavailable
+from ring_buffer import AudioRingBuffer
+
+MIN_TAIL_SECONDS = 0.5
+RESULT_TIMEOUT = 60
+
+
+class LongFileAnalyzer:
+    def __init__(self, pool, window_seconds=audio_processor.DURATION, hop_seconds=None, max_in_flight=64):
+        self.pool = pool
+        self.window_samples = int(window_seconds * audio_processor.SAMPLE_RATE)
+        self.hop_samples = int((hop_seconds or window_seconds) * audio_processor.SAMPLE_RATE)
+        if not 1 <= self.hop_samples <= self.window_samples:
+            raise ValueError(f"hop_seconds must be greater than 0 and at most {window_seconds} seconds.")
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.vad = vad.VoiceActivityDetector()
+        self._pending = 0
+        self._results = None
+        self._lengths = {}
+
+    def run(self, blocks):
+        analysis_id = f"analysis-{uuid.uuid4().hex}"
+        results = self._results = queue.Queue()
+        self.vad.reset()
+        self.pool.register(analysis_id, results.put)
+        buffer = AudioRingBuffer(self.window_samples * 2 + audio_processor.SAMPLE_RATE)
+        summary = AnalysisSummary()
+        self._pending = 0
+        self._lengths = {}
+        index = 0
+        total_samples = 0
+
+        try:
+            for block in blocks:
+                total_samples += block.size
+                offset = 0
+                while offset < block.size:
+                    take = min(block.size - offset, buffer.capacity - len(buffer))
+                    buffer.write(block[offset:offset + take])
+                    offset += take
+                    while len(buffer) >= self.window_samples:
+                        self._submit(analysis_id, index, buffer.peek(self.window_samples))
+                        buffer.consume(self.hop_samples)
+                        index += 1
+                        yield from self._drain(results, summary, keep=self.max_in_flight - 1)
+
+            unscored = len(buffer) - max(0, self.window_samples - self.hop_samples) if index else len(buffer)
+            if unscored >= MIN_TAIL_SECONDS * audio_processor.SAMPLE_RATE:
+                self._submit(analysis_id, index, buffer.peek(len(buffer)))
+                index += 1
+
+            yield from self._drain(results, summary, keep=0)
+
+            yield {"summary": summary.as_dict(
+                windows=index,
+                duration=round(total_samples / audio_processor.SAMPLE_RATE, 3),
+                window_seconds=self.window_samples / audio_processor.SAMPLE_RATE,
+                hop_seconds=self.hop_samples / audio_processor.SAMPLE_RATE
+            )}
+        finally:
+            self.pool.unregister(analysis_id)
+
+    def _submit(self, analysis_id, index, window):
+        self._pending += 1
+        self._lengths[index] = window.size
+        if not vad.check(self.vad, window, "analyze"):
+            self._results.put(vad.no_speech_result(index))
+            return
+        self.pool.submit(analysis_id, index, np.ascontiguousarray(window, dtype=np.float32))
+
+    def _drain(self, results, summary, keep):
+        while self._pending > 0:
+            block = self._pending > keep
+            try:
+                result = results.get(timeout=RESULT_TIMEOUT) if block else results.get_nowait()
+            except queue.Empty:
+                if block:
+                    raise TimeoutError("Timed out waiting for window scores from the worker pool.")
+                return
+            self._pending -= 1
+            yield self._record(result, summary)
+
+    def _record(self, result, summary):
+        if "error" in result:
+            raise (ModelUnavailable if result["unavailable"] else RuntimeError)(result["error"])
+        index = result["seq"]
+        start = index * self.hop_samples / audio_processor.SAMPLE_RATE
+        speech = result.get("speech", True)
+        summary.add(result["score"], result["label"], speech)
+        return {
+            "window": index,
+            "start": round(start, 3),
+            "end": round(start + self._lengths.pop(index) / audio_processor.SAMPLE_RATE, 3),
+            "score": result["score"],
+            "label": result["label"],
+            "speech": speech,
+        }
+
+
+class AnalysisSummary:
+    def __init__(self):
+        self.scores = []
+        self.brainrot = 0
+        self.skipped = 0
+
+    def add(self, score, label, speech=True):
+        if not speech:
+            self.skipped += 1
+            return
+        self.scores.append(score)
+        if label == "brainrot":
+            self.brainrot += 1
+
+    def as_dict(self, **extra):
+        scores = np.asarray(self.scores, dtype=np.float32)
+        summary = dict(extra)
+        summary["scored"] = int(scores.size)
+        summary["skipped_windows"] = self.skipped
+        if scores.size + self.skipped:
+            summary["speech_fraction"] = round(scores.size / (scores.size + self.skipped), 3)
+        if scores.size:
+            summary.update({
+                "mean": round(float(scores.mean()), 3),
+                "min": round(float(scores.min()), 3),
+                "max": round(float(scores.max()), 3),
+                "p50": round(float(np.percentile(scores, 50)), 3),
+                "p90": round(float(np.percentile(scores, 90)), 3),
+                "brainrot_windows": self.brainrot,
+                "brainrot_fraction": round(self.brainrot / scores.size, 3),
+            })
+        if scores.size:
+            summary["label"] = "brainrot" if self.brainrot / scores.size >= 0.5 else "normal"
+        else:
+            summary["label"] = vad.NO_SPEECH if self.skipped else "normal"
+        return summary
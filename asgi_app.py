@@ -0,0 +1,421 @@
+import asyncio
+import mimetypes
+import os
+import queue
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route, WebSocketRoute
+from starlette.staticfiles import StaticFiles
+from starlette.templating import Jinja2Templates
+from starlette.websockets import WebSocketDisconnect
+from werkzeug.http import parse_date, parse_etags, parse_options_header, unquote_etag
+
+import audio_processor
+import decoding
+import log_setup
+import main
+import metrics
+import recorder
+import vad
+from sessions import CLOSED
+
+ASGI_EXECUTOR_WORKERS = int(os.environ.get("ASGI_EXECUTOR_WORKERS", str(min(32, (os.cpu_count() or 1) * 4))))
+ASGI_MAX_PENDING = int(os.environ.get("ASGI_MAX_PENDING", "256"))
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+
+templates = Jinja2Templates(directory=os.path.join(main.BASE_DIR, "templates"))
+app_logger = main.app.logger
+
+
+class BoundedExecutor:
+    def __init__(self, max_workers, max_pending):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="asgi-blocking")
+        self.max_pending = max_pending
+        self._slots = None
+
+    async def run(self, fn, *args):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        async with self._slots:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+blocking = BoundedExecutor(ASGI_EXECUTOR_WORKERS, ASGI_MAX_PENDING)
+
+
+async def spool_body(request):
+    body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    async for chunk in request.stream():
+        body.write(chunk)
+    body.seek(0)
+    return body
+
+
+async def upload_source(request):
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        audio = form.get("audio")
+        if audio is None or isinstance(audio, str):
+            return None, None, None, params
+        return audio.file, audio.content_type, audio.filename, params
+    if content_type.startswith("audio/") or content_type == "application/octet-stream":
+        return await spool_body(request), content_type, None, params
+    return None, None, None, params
+
+
+async def index(request):
+    return templates.TemplateResponse(request, "index.html")
+
+
+async def upload_audio(request):
+    try:
+        stream, mimetype, filename, params = await upload_source(request)
+        if stream is None:
+            return JSONResponse({"error": "No audio file uploaded."}, status_code=400)
+        try:
+            sample_rate, channels = main.raw_pcm_params(request.query_params, params)
+        except ValueError as e:
+            return JSONResponse({"error": f"Invalid PCM parameters: {e}"}, status_code=400)
+        result = await blocking.run(main.score_upload, stream, mimetype, filename, sample_rate, channels,
+                                    main.request_client_id(request.headers, request.query_params))
+        return JSONResponse(result)
+    except decoding.DecodeError as e:
+        app_logger.warning(f"Could not decode upload: {e}")
+        return JSONResponse({"error": f"Could not decode audio: {e}"}, status_code=400)
+    except audio_processor.ModelUnavailable as e:
+        app_logger.error(f"Upload rejected: {e}")
+        return JSONResponse({"error": f"Model unavailable: {e}"}, status_code=503)
+    except Exception as e:
+        app_logger.error(f"Error in /upload: {e}", exc_info=True)
+        return JSONResponse({"error": f"Server error: {str(e)}"}, status_code=500)
+
+
+async def analyze_audio(request):
+    stream, mimetype, filename, params = await upload_source(request)
+    if stream is None:
+        return JSONResponse({"error": "No audio file uploaded."}, status_code=400)
+    try:
+        hop_seconds = main.parse_hop_seconds(request.query_params.get("hop_seconds"))
+    except ValueError as e:
+        return JSONResponse({"error": f"Invalid hop_seconds: {e}"}, status_code=400)
+    try:
+        sample_rate, channels = main.raw_pcm_params(request.query_params, params)
+    except ValueError as e:
+        return JSONResponse({"error": f"Invalid PCM parameters: {e}"}, status_code=400)
+    try:
+        await blocking.run(audio_processor.registry.active)
+    except audio_processor.ModelUnavailable as e:
+        return JSONResponse({"error": f"Model unavailable: {e}"}, status_code=503)
+    try:
+        upload = await blocking.run(main.open_upload, stream, mimetype, filename)
+    except decoding.DecodeError as e:
+        app_logger.warning(f"Could not decode upload for analysis: {e}")
+        return JSONResponse({"error": f"Could not decode audio: {e}"}, status_code=400)
+    records = main.analysis_records(upload, sample_rate, channels, hop_seconds=hop_seconds,
+                                    client_id=main.request_client_id(request.headers, request.query_params))
+
+    return StreamingResponse(iterate_blocking(records), media_type="application/x-ndjson")
+
+
+async def download_audio(request):
+    filename = request.path_params["filename"]
+    file_path = main.recording_file_path(filename)
+    if file_path is None:
+        return JSONResponse({"error": "File not found"}, status_code=404)
+
+    inline = request.query_params.get("inline") == "1"
+    in_progress = recorder.is_recording(file_path)
+    if in_progress and "range" not in request.headers:
+        app_logger.info(f"Streaming in-progress recording: {filename}")
+        return StreamingResponse(
+            iterate_blocking(recorder.follow(file_path)),
+            media_type=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+            headers={"Content-Disposition": main.download_disposition(filename, inline), "Cache-Control": "no-cache"}
+        )
+
+    response = FileResponse(file_path, filename=filename, stat_result=os.stat(file_path),
+                            content_disposition_type="inline" if inline else "attachment")
+    if in_progress:
+        response.headers["Cache-Control"] = "no-cache"
+        del response.headers["etag"]
+    validators = {key: response.headers[key] for key in ("etag", "last-modified") if key in response.headers}
+    if not_modified(request.headers, validators.get("etag"), validators.get("last-modified")):
+        return Response(status_code=304, headers=validators)
+    app_logger.info(f"Downloaded file: {filename}")
+    return response
+
+
+def not_modified(headers, etag, last_modified):
+    if "if-none-match" in headers:
+        return etag is not None and parse_etags(headers["if-none-match"]).contains_weak(unquote_etag(etag)[0])
+    since = parse_date(headers.get("if-modified-since"))
+    modified = parse_date(last_modified)
+    return since is not None and modified is not None and modified <= since
+
+
+async def iterate_blocking(iterator):
+    while True:
+        chunk = await blocking.run(next, iterator, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+async def get_latest_audio(request):
+    try:
+        filename = await blocking.run(main.latest_audio_filename, request.query_params.get("session_id"),
+                                      main.request_client_id(request.headers, request.query_params))
+        return JSONResponse({"filename": filename})
+    except Exception as e:
+        app_logger.error(f"Error fetching latest audio: {e}")
+        return JSONResponse({"error": str(e)}, status_code=404)
+
+
+async def is_recording(request):
+    return JSONResponse({"is_recording": main.recording_status()})
+
+
+async def batcher_stats(request):
+    return JSONResponse(main.inference_batcher.stats())
+
+
+async def cache_stats(request):
+    return JSONResponse(main.result_cache.stats())
+
+
+async def vad_stats(request):
+    return JSONResponse(vad.stats())
+
+
+async def sessions_status(request):
+    return JSONResponse(main.sessions_snapshot())
+
+
+async def recordings_status(request):
+    return JSONResponse(main.recordings_snapshot(int(request.query_params.get("limit", 20))))
+
+
+async def metrics_endpoint(request):
+    return Response(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+async def profiler_stacks(request):
+    limit = request.query_params.get("limit")
+    return Response(metrics.profiler.collapsed(int(limit) if limit else None), media_type="text/plain")
+
+
+async def profiler_control(request):
+    action = request.path_params["action"]
+    if action not in ("start", "stop", "status"):
+        return JSONResponse({"error": f"Unknown profiler action: {action}"}, status_code=404)
+    interval_ms = request.query_params.get("interval_ms")
+    status = await blocking.run(main.profiler_action, action, float(interval_ms) if interval_ms else None)
+    return JSONResponse(status)
+
+
+async def models_status(request):
+    return JSONResponse(await blocking.run(audio_processor.registry.stats))
+
+
+async def register_model(request):
+    try:
+        spec = dict(await request.json())
+    except ValueError:
+        spec = {}
+    body, status = await blocking.run(main.change_models, "register", spec.pop("name", None), spec)
+    return JSONResponse(body, status_code=status)
+
+
+async def activate_model(request):
+    body, status = await blocking.run(main.change_models, "activate", request.path_params["name"])
+    return JSONResponse(body, status_code=status)
+
+
+async def shadow_model(request):
+    rate = request.query_params.get("rate")
+    body, status = await blocking.run(main.change_models, "shadow", request.path_params["name"], None,
+                                      float(rate) if rate else None)
+    return JSONResponse(body, status_code=status)
+
+
+async def stop_shadow(request):
+    body, status = await blocking.run(main.change_models, "shadow", None)
+    return JSONResponse(body, status_code=status)
+
+
+async def send_results(websocket, session, wake):
+    while True:
+        await wake.wait()
+        wake.clear()
+        while True:
+            try:
+                result_str = session.output.get_nowait()
+            except queue.Empty:
+                break
+            if result_str is CLOSED:
+                return
+            started = main.time.perf_counter()
+            await websocket.send_text(result_str)
+            metrics.observe_stage("ws_send", (main.time.perf_counter() - started) * 1000.0)
+
+
+async def realtime_predictions(websocket):
+    await websocket.accept()
+    try:
+        message = await asyncio.wait_for(websocket.receive(), main.STREAM_CONFIG_TIMEOUT)
+        if message["type"] == "websocket.disconnect":
+            return
+        config = main.parse_stream_config(message.get("text"))
+    except asyncio.TimeoutError:
+        config = None
+    if config is None:
+        app_logger.warning("WebSocket closed without a valid start message.")
+        await websocket.send_text(main.STREAM_CONFIG_ERROR)
+        await websocket.close()
+        return
+    session = await blocking.run(main.create_realtime_session, config,
+                                 main.request_client_id(websocket.headers, websocket.query_params))
+    app_logger.info(f"WebSocket connection established for real-time session {session.session_id} ({session.source}).")
+
+    loop = asyncio.get_running_loop()
+    wake = asyncio.Event()
+
+    def notify():
+        try:
+            loop.call_soon_threadsafe(wake.set)
+        except RuntimeError:
+            pass
+
+    session.notify = notify
+    wake.set()
+    sender = asyncio.create_task(send_results(websocket, session, wake))
+    receiver = asyncio.create_task(receive_audio(websocket, session))
+    try:
+        done, _ = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
+        if sender in done and not receiver.done():
+            app_logger.warning(f"Real-time session {session.session_id} stopped unexpectedly.")
+    except (WebSocketDisconnect, ConnectionError):
+        pass
+    except Exception as e:
+        app_logger.error(f"WebSocket communication error: {e}", exc_info=True)
+    finally:
+        for task in (sender, receiver):
+            task.cancel()
+        app_logger.info(f"WebSocket connection closed. Stopping real-time session {session.session_id}.")
+        session.notify = None
+        await blocking.run(main.session_manager.close_session, session.session_id)
+        try:
+            await websocket.close()
+        except RuntimeError:
+            pass
+        app_logger.info(f"Real-time session {session.session_id} cleanup complete.")
+
+
+async def receive_audio(websocket, session):
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            data = message.get("bytes")
+            if data and session.source == "stream":
+                await blocking.run(session.feed, data)
+    except WebSocketDisconnect:
+        pass
+
+
+class AccessLogMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        response = {"status": 500, "size": None}
+
+        async def send_and_record(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                for name, value in message.get("headers", ()):
+                    if name == b"content-length":
+                        response["size"] = int(value)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record)
+        finally:
+            client = scope.get("client")
+            log_setup.log_access(scope["method"], scope["path"], response["status"],
+                                 (time.perf_counter() - started) * 1000.0, response["size"],
+                                 client[0] if client else None)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    os.makedirs(audio_processor.RECORDINGS_DIR, exist_ok=True)
+    main.worker_pool.start()
+    main.recordings.start_sweeper(main.RECORDINGS_SWEEP_SECONDS)
+    if main.PROFILER_ON_START:
+        metrics.profiler.start()
+    warmup_seconds = await blocking.run(audio_processor.warmup)
+    app_logger.info(
+        f"Server cold start: {main.time.perf_counter() - main.SERVER_START:.2f}s "
+        f"(model warmup {warmup_seconds:.2f}s, ASGI mode)"
+    )
+    yield
+    await blocking.run(main.session_manager.close_all)
+    main.recordings.stop_sweeper()
+    metrics.profiler.stop()
+    main.worker_pool.stop()
+    main.inference_batcher.stop()
+    blocking.shutdown()
+
+
+app = Starlette(
+    routes=[
+        Route("/", index),
+        Route("/upload", upload_audio, methods=["POST"]),
+        Route("/analyze", analyze_audio, methods=["POST"]),
+        Route("/download-audio/{filename}", download_audio),
+        Route("/get-latest-audio", get_latest_audio),
+        WebSocketRoute("/ws/realtime-predictions", realtime_predictions),
+        Route("/batcher-stats", batcher_stats),
+        Route("/cache-stats", cache_stats),
+        Route("/vad-stats", vad_stats),
+        Route("/sessions", sessions_status),
+        Route("/recordings", recordings_status),
+        Route("/metrics", metrics_endpoint),
+        Route("/models", models_status),
+        Route("/models", register_model, methods=["POST"]),
+        Route("/models/shadow", stop_shadow, methods=["DELETE"]),
+        Route("/models/{name}/activate", activate_model, methods=["POST"]),
+        Route("/models/{name}/shadow", shadow_model, methods=["POST"]),
+        Route("/profiler", profiler_stacks),
+        Route("/profiler/{action}", profiler_control, methods=["POST"]),
+        Route("/is-recording", is_recording),
+        Mount("/static", StaticFiles(directory=os.path.join(main.BASE_DIR, "static")), name="static"),
+    ],
+    middleware=[Middleware(AccessLogMiddleware)],
+    lifespan=lifespan,
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", "5001")), log_config=None, access_log=False)
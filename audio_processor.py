@@ -1,18 +1,21 @@
+import logging
 import os
+import threading
 import uuid
 import wave
 import numpy as np
-import sounddevice as sd
-import librosa
-from pydub import AudioSegment
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing.sequence import pad_sequences
-import tensorflow as tf
+import features as feature_engine
+import backends
+import cascade
+import decoding
+import recorder
+import metrics
+import shared_weights
+from model_registry import ModelRegistry, ModelUnavailable
 import json
 import time
 
-tf.config.threading.set_intra_op_parallelism_threads(1)
-tf.config.threading.set_inter_op_parallelism_threads(1)
+logger = logging.getLogger(__name__)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 STOP_FLAG_FILE = os.path.join(BASE_DIR, "stop_flag.txt")
@@ -26,36 +29,53 @@ THRESHOLD = 0.95
 RECORDINGS_DIR = os.path.join(os.getcwd(), "recordings")
 os.makedirs(RECORDINGS_DIR, exist_ok=True)
 
-try:
-    if os.path.exists("brainrot_lstm_model.h5"):
-        model = load_model("brainrot_lstm_model.h5")
-    elif os.path.exists("best_model.h5"):
-        model = load_model("best_model.h5")
-    else:
-        model = load_model("brainrot_detector_advanced.h5")
-    print("TensorFlow model loaded successfully.")
-except Exception as e:
-    print(f"Error loading TensorFlow model: {e}")
-    model = None 
-
-try:
-    scaler_mean = np.load("scaler_mean.npy")
-    scaler_scale = np.load("scaler_scale.npy")
-    print("Scaler parameters loaded successfully.")
-except Exception as e:
-    print(f"Error loading scaler parameters: {e}")
-    scaler_mean = None
-    scaler_scale = None
-
-devices = sd.query_devices()
-input_devices = [i for i, d in enumerate(devices) if d['max_input_channels'] > 0]
-if not input_devices:
-    print("No audio input devices found. Please check your microphone setup.")
-    sd.default.device = None
-else:
-    print("Available input devices:")
-    for i in input_devices:
-        print(f"{i}: {devices[i]['name']}")
+MODEL_EXPORT_PATH = os.environ.get("MODEL_EXPORT_PATH", "brainrot_lstm_model.npz")
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "auto")
+if INFERENCE_BACKEND == "auto":
+    INFERENCE_BACKEND = "numpy" if os.path.exists(MODEL_EXPORT_PATH) else "keras"
+MODEL_REGISTRY_PATH = os.environ.get("MODEL_REGISTRY_PATH", os.path.join(BASE_DIR, "models.json"))
+CASCADE_ENABLED = os.environ.get("CASCADE", "0") == "1"
+
+_sd = None
+_init_lock = threading.RLock()
+
+def default_model_config():
+    config = _default_models()
+    if CASCADE_ENABLED and os.path.exists(cascade.CASCADE_PATH):
+        config["models"]["default"]["cascade"] = cascade.CASCADE_PATH
+    return config
+
+def _default_models():
+    if INFERENCE_BACKEND == "numpy":
+        keras_path = next((path for path in backends.MODEL_CANDIDATES if os.path.exists(path)),
+                          backends.MODEL_CANDIDATES[-1])
+        return {
+            "models": {
+                "default": {"backend": "numpy", "path": MODEL_EXPORT_PATH},
+                "keras": {"backend": "keras", "path": keras_path},
+            },
+            "active": "default",
+            "fallback": "keras",
+        }
+    return {"models": {"default": {"backend": "keras"}}, "active": "default"}
+
+registry = ModelRegistry(MODEL_REGISTRY_PATH, default_model_config)
+
+def get_model():
+    try:
+        return registry.active()
+    except Exception:
+        return None
+
+def _select_input_device(sd):
+    devices = sd.query_devices()
+    input_devices = [i for i, d in enumerate(devices) if d['max_input_channels'] > 0]
+    if not input_devices:
+        logger.warning("No audio input devices found. Please check your microphone setup.")
+        sd.default.device = None
+        return
+
+    logger.info("Available input devices: " + ", ".join(f"{i}: {devices[i]['name']}" for i in input_devices))
 
     if len(input_devices) > 1:
         sd.default.device = (input_devices[1], None)
@@ -65,75 +85,131 @@ else:
         sd.default.device = None
 
     if sd.default.device and sd.default.device[0] is not None:
-        print(f"Using input device: {sd.default.device[0]} – {devices[sd.default.device[0]]['name']}")
+        logger.info(f"Using input device: {sd.default.device[0]} – {devices[sd.default.device[0]]['name']}")
     else:
-        print("Could not select a default input device. Please specify manually if needed.")
+        logger.warning("Could not select a default input device. Please specify manually if needed.")
+
+def share_model_weights():
+    if not shared_weights.SHARED_WEIGHTS:
+        return set()
+    paths = [spec["path"] for spec in registry.specs().values()
+             if spec.get("backend", "numpy") == "numpy" and spec.get("path") and os.path.exists(spec["path"])]
+    return shared_weights.publish_all(paths)
+
+def model_files():
+    model = get_model()
+    return model.model_files() if model is not None else []
+
+def get_sounddevice():
+    global _sd
+    if _sd is None:
+        with _init_lock:
+            if _sd is None:
+                import sounddevice as sd
+                _select_input_device(sd)
+                _sd = sd
+    return _sd
+
+def warmup():
+    started = time.perf_counter()
+    try:
+        predict_brainrot(np.zeros((1, MAX_TIMESTEPS, INPUT_FEATURES), dtype=np.float32))
+    except ModelUnavailable as e:
+        logger.warning(f"Skipping model warmup: {e}")
+    return time.perf_counter() - started
+
+def resample(audio, orig_sr, target_sr=SAMPLE_RATE):
+    return decoding.resample(audio, orig_sr, target_sr)
+
+def pcm16_to_float(payload):
+    usable = len(payload) - (len(payload) % 2)
+    return np.frombuffer(payload[:usable], dtype='<i2').astype(np.float32) / 32768.0
 
-def scale_features(features):
-    if scaler_mean is None or scaler_scale is None:
-        print("Scaler not loaded. Cannot scale features.")
-        return features 
-    flat = features.reshape(-1, INPUT_FEATURES)
-    scaled = (flat - scaler_mean) / (scaler_scale + 1e-10) 
-    return scaled.reshape(1, MAX_TIMESTEPS, INPUT_FEATURES).astype(np.float32)
+def scale_features(features, model=None):
+    model = model or get_model()
+    if model is None:
+        return features
+    return model.scale(features)
 
 def extract_features(audio):
-    if not np.all(np.isfinite(audio)) or np.max(np.abs(audio)) < 0.001: 
+    if is_silent(audio):
         return None
 
     try:
-        if audio.dtype != np.float32:
-            audio = audio.astype(np.float32)
-
-        mfcc = librosa.feature.mfcc(y=audio, sr=SAMPLE_RATE, n_mfcc=N_MFCC)
-        delta = librosa.feature.delta(mfcc)
-        delta2 = librosa.feature.delta(mfcc, order=2)
-        full = np.vstack([mfcc, delta, delta2]).T
-
-        if np.isnan(full).any() or np.isinf(full).any():
-            print("MFCC contains NaN or Inf values after extraction.")
+        with metrics.timed("extract_features"):
+            batch, valid = feature_engine.extract_batch([audio])
+        if not valid[0]:
+            logger.warning("Audio clip too short for MFCC extraction.")
             return None
+        return prepare_features(batch[0])
 
-        if full.shape[0] > MAX_TIMESTEPS:
-            full = full[:MAX_TIMESTEPS, :]
-        padded = pad_sequences([full], maxlen=MAX_TIMESTEPS, dtype='float32', padding='post')[0]
-        padded = padded.reshape(1, MAX_TIMESTEPS, INPUT_FEATURES)
+    except Exception as e:
+        logger.error(f"Feature extraction error: {e}")
+        return None
 
-        if padded.shape[1] != MAX_TIMESTEPS or padded.shape[2] != INPUT_FEATURES:
-            print(f"Padded features have incorrect shape: {padded.shape}")
-            return None
+def extract_features_batch(clips, out=None):
+    clips = [np.zeros(0, dtype=np.float32) if is_silent(clip) else clip for clip in clips]
+    with metrics.timed("extract_features"):
+        batch, valid = feature_engine.extract_batch(clips, out=out, max_timesteps=MAX_TIMESTEPS)
+    if not np.isfinite(batch).all():
+        valid &= np.isfinite(batch).all(axis=(1, 2))
+    return batch, valid
 
-        return scale_features(padded)
+def is_silent(audio):
+    return audio.size == 0 or not np.all(np.isfinite(audio)) or np.max(np.abs(audio)) < 0.001
 
-    except Exception as e:
-        print(f"Feature extraction error: {e}")
+def prepare_features(full):
+    if np.isnan(full).any() or np.isinf(full).any():
+        logger.warning("MFCC contains NaN or Inf values after extraction.")
         return None
 
+    padded = np.zeros((1, MAX_TIMESTEPS, INPUT_FEATURES), dtype=np.float32)
+    steps = min(full.shape[0], MAX_TIMESTEPS)
+    padded[0, :steps] = full[:steps]
+    return padded
+
 def predict_brainrot(features):
-    if features is None or model is None:
+    if features is None:
         return 0.0
     try:
-        prediction = model.predict(features, verbose=0)
-        return float(prediction[0][0])
+        return float(registry.predict(features)[0])
+    except ModelUnavailable:
+        raise
     except Exception as e:
-        print(f"Prediction error: {e}")
+        logger.error(f"Prediction error: {e}")
         return 0.0
 
-def record_audio_chunk():
+def predict_batch(features_batch):
+    return registry.predict(features_batch)
+
+def open_input_stream():
+    sd = get_sounddevice()
     if sd.default.device is None or sd.default.device[0] is None:
-        print("No input device selected for recording. Skipping chunk.")
+        logger.warning("No input device selected for recording.")
+        return None
+    stream = sd.InputStream(samplerate=SAMPLE_RATE, channels=1, dtype='float32', device=sd.default.device[0])
+    stream.start()
+    return stream
+
+def record_audio_chunk(stream=None):
+    sd = get_sounddevice()
+    if stream is None and (sd.default.device is None or sd.default.device[0] is None):
+        logger.warning("No input device selected for recording. Skipping chunk.")
         return np.array([])
     try:
+        if stream is not None:
+            audio, _ = stream.read(int(SAMPLE_RATE * DURATION))
+            return audio.flatten()
         audio = sd.rec(int(SAMPLE_RATE * DURATION), samplerate=SAMPLE_RATE, channels=1, dtype='float32')
         sd.wait()
         return audio.flatten()
     except Exception as e:
-        print(f"Error during audio recording: {e}")
+        logger.error(f"Error during audio recording: {e}")
         return np.array([])
 
 def save_audio(audio, path):
     if audio.size == 0:
-        print(f"No audio to save to {path}")
+        logger.warning(f"No audio to save to {path}")
         return
     int_audio = (audio * 32767).astype(np.int16)
     try:
@@ -143,7 +219,7 @@ def save_audio(audio, path):
             wf.setframerate(SAMPLE_RATE)
             wf.writeframes(int_audio.tobytes())
     except Exception as e:
-        print(f"Error saving audio to {path}: {e}")
+        logger.error(f"Error saving audio to {path}: {e}")
 
 def check_stop_flag():
     try:
@@ -153,76 +229,63 @@ def check_stop_flag():
             content = f.read().strip()
         return content.lower() == "stop"
     except Exception as e:
-        print(f"Error checking stop flag: {e}")
+        logger.error(f"Error checking stop flag: {e}")
         return False
 
+def open_live_recorder(name, on_segment=None, on_close=None):
+    return recorder.StreamingRecorder(
+        os.path.join(RECORDINGS_DIR, name), SAMPLE_RATE, on_segment=on_segment, on_close=on_close
+    ).start()
+
 def main_loop_process(prediction_queue, should_run_event):
-    print("Voice detection process started for real-time analysis.")
-    current_merged_file_path = os.path.join(RECORDINGS_DIR, f"live_recording_{uuid.uuid4().hex}.wav")
+    logger.info("Voice detection process started for real-time analysis.")
+    live_recorder = open_live_recorder(f"live_recording_{uuid.uuid4().hex}")
 
     if os.path.exists(STOP_FLAG_FILE):
         os.remove(STOP_FLAG_FILE)
 
     try:
-        with wave.open(current_merged_file_path, 'wb') as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(2)
-            wf.setframerate(SAMPLE_RATE)
+        while should_run_event.is_set() and not check_stop_flag():
+            audio = record_audio_chunk()
+            if audio.size > 0:
+                live_recorder.write(audio)
+                features = extract_features(audio)
+                score = predict_brainrot(features)
+                label = "brainrot" if score > THRESHOLD else "normal"
 
-            while should_run_event.is_set() and not check_stop_flag():
-                audio = record_audio_chunk()
-                if audio.size > 0:
-                    wf.writeframes((audio * 32767).astype(np.int16).tobytes())
-                    features = extract_features(audio)
-                    score = predict_brainrot(features)
-                    label = "brainrot" if score > THRESHOLD else "normal"
-
-                    result = {"score": round(score, 3), "label": label}
-                    prediction_queue.put(json.dumps(result))
-                time.sleep(0.1)
+                result = {"score": round(score, 3), "label": label}
+                prediction_queue.put(json.dumps(result))
 
     except Exception as e:
-        print(f"Error in main_loop_process: {e}")
+        logger.error(f"Error in main_loop_process: {e}")
     finally:
-        print("Real-time detection process stopped.")
-
-        if os.path.exists(current_merged_file_path) and os.path.getsize(current_merged_file_path) > 44:
-            try:
-                audio_segment = AudioSegment.from_wav(current_merged_file_path)
-                mp3_path = current_merged_file_path.replace(".wav", ".mp3")
-                audio_segment.export(mp3_path, format="mp3")
-                print(f"Saved live recording as: {mp3_path}")
-
-                latest_audio_path = os.path.join(RECORDINGS_DIR, "latest_realtime_audio.txt")
-                with open(latest_audio_path, "w") as f:
-                    f.write(os.path.basename(mp3_path))
-            except Exception as e:
-                print(f"Error converting or saving live recording: {e}")
-            finally:
-                if os.path.exists(current_merged_file_path):
-                    os.remove(current_merged_file_path)
-        else:
-            print(f"No valid audio recorded to save from {current_merged_file_path}")
+        logger.info("Real-time detection process stopped.")
+        saved_path = live_recorder.close()
+        logger.info(f"Saved live recording as: {saved_path}" if saved_path else "No audio recorded in this session.")
 
         if os.path.exists(STOP_FLAG_FILE):
             os.remove(STOP_FLAG_FILE)
 
-def predict_from_file(filepath):
+def features_from_file(filepath):
+    return extract_features(decoding.decode_file(filepath, SAMPLE_RATE))
+
+def predict_from_file(filepath, batcher=None):
     if not os.path.exists(filepath):
-        print(f"Error: Audio file not found at {filepath}")
+        logger.error(f"Error: Audio file not found at {filepath}")
         return 0.0
 
     try:
-        audio_segment = AudioSegment.from_file(filepath)
-        audio_segment = audio_segment.set_frame_rate(SAMPLE_RATE).set_channels(1)
-        audio_np = np.array(audio_segment.get_array_of_samples()).astype(np.float32) / 32768.0
-
-        features = extract_features(audio_np)
+        features = features_from_file(filepath)
+        if batcher is not None:
+            return batcher.predict(features)
         return predict_brainrot(features)
+    except ModelUnavailable:
+        raise
     except Exception as e:
-        print(f"Error processing uploaded file {filepath}: {e}")
+        logger.error(f"Error processing uploaded file {filepath}: {e}")
         return 0.0
 
 def main_loop():
-    print("main_loop is now primarily used internally or as a placeholder. For real-time analysis, use the WebSocket endpoint.")
+    logger.info("main_loop is now primarily used internally or as a placeholder. "
+                "For real-time analysis, use the WebSocket endpoint.")
     pass
\ No newline at end of file
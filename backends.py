@@ -0,0 +1,195 @@
+import json
+import os
+
+import numpy as np
+
+import shared_weights
+
+MODEL_CANDIDATES = ("brainrot_lstm_model.h5", "best_model.h5", "brainrot_detector_advanced.h5")
+
+
+def sigmoid(x):
+    return 0.5 * (np.tanh(0.5 * x) + 1.0)
+
+
+def hard_sigmoid(x):
+    return np.clip(0.2 * x + 0.5, 0.0, 1.0)
+
+
+def relu(x):
+    return np.maximum(x, 0.0)
+
+
+def linear(x):
+    return x
+
+
+ACTIVATIONS = {
+    "sigmoid": sigmoid,
+    "hard_sigmoid": hard_sigmoid,
+    "tanh": np.tanh,
+    "relu": relu,
+    "linear": linear,
+}
+
+
+class KerasBackend:
+    name = "keras"
+
+    def __init__(self, model_path=None):
+        import tensorflow as tf
+        from tensorflow.keras.models import load_model
+
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(1)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+        except RuntimeError:
+            pass
+
+        if model_path is None:
+            model_path = next((path for path in MODEL_CANDIDATES if os.path.exists(path)), MODEL_CANDIDATES[-1])
+        self.model_path = model_path
+        self.model = load_model(model_path)
+        self.input_shape = tuple(self.model.input_shape[1:])
+
+    def predict(self, batch):
+        prediction = self.model.predict_on_batch(batch)
+        return np.asarray(prediction, dtype=np.float32).reshape(len(batch), -1)[:, 0]
+
+
+class NumpyBackend:
+    name = "numpy"
+
+    def __init__(self, export_path):
+        self.model_path = export_path
+        shared = shared_weights.attach(export_path)
+        self.shared = shared is not None
+        if shared is not None:
+            self.spec, self.weights = shared
+        else:
+            with np.load(export_path, allow_pickle=False) as data:
+                self.spec = json.loads(str(data["spec"]))
+                self.weights = {key: data[key].astype(np.float32) for key in data.files if key != "spec"}
+        self.input_shape = tuple(self.spec["input_shape"])
+        self.scaler_mean = self.weights.get("scaler_mean")
+        self.scaler_scale = self.weights.get("scaler_scale")
+
+    def predict(self, batch):
+        x = np.asarray(batch, dtype=np.float32)
+        for index, layer in enumerate(self.spec["layers"]):
+            prefix = f"layer{index}"
+            if layer["kind"] == "bidirectional_lstm":
+                forward = self._lstm(x, prefix + "_fw", layer, reverse=False)
+                backward = self._lstm(x, prefix + "_bw", layer, reverse=True)
+                x = self._merge(forward, backward, layer["merge_mode"])
+            elif layer["kind"] == "lstm":
+                x = self._lstm(x, prefix, layer, reverse=layer.get("go_backwards", False))
+            elif layer["kind"] == "dense":
+                x = x @ self.weights[prefix + "_kernel"]
+                if prefix + "_bias" in self.weights:
+                    x = x + self.weights[prefix + "_bias"]
+                x = ACTIVATIONS[layer["activation"]](x)
+        return x.reshape(len(batch), -1)[:, 0].astype(np.float32)
+
+    def _lstm(self, x, prefix, layer, reverse):
+        kernel = self.weights[prefix + "_kernel"]
+        recurrent = self.weights[prefix + "_recurrent_kernel"]
+        bias = self.weights.get(prefix + "_bias")
+        activation = ACTIVATIONS[layer["activation"]]
+        recurrent_activation = ACTIVATIONS[layer["recurrent_activation"]]
+        units = recurrent.shape[0]
+
+        projected = x @ kernel
+        if bias is not None:
+            projected += bias
+        steps = range(x.shape[1] - 1, -1, -1) if reverse else range(x.shape[1])
+
+        h = np.zeros((x.shape[0], units), dtype=np.float32)
+        c = np.zeros((x.shape[0], units), dtype=np.float32)
+        outputs = []
+        for t in steps:
+            z = projected[:, t] + h @ recurrent
+            i = recurrent_activation(z[:, :units])
+            f = recurrent_activation(z[:, units:2 * units])
+            g = activation(z[:, 2 * units:3 * units])
+            o = recurrent_activation(z[:, 3 * units:])
+            c = f * c + i * g
+            h = o * activation(c)
+            if layer.get("return_sequences"):
+                outputs.append(h)
+
+        if not layer.get("return_sequences"):
+            return h
+        if reverse:
+            outputs.reverse()
+        return np.stack(outputs, axis=1)
+
+    def _merge(self, forward, backward, mode):
+        if mode == "concat":
+            return np.concatenate([forward, backward], axis=-1)
+        if mode == "sum":
+            return forward + backward
+        if mode == "mul":
+            return forward * backward
+        if mode == "ave":
+            return (forward + backward) / 2.0
+        raise ValueError(f"Unsupported merge mode: {mode}")
+
+
+def export_keras_model(model, out_path, scaler_mean=None, scaler_scale=None):
+    layers = []
+    arrays = {}
+    for layer in model.layers:
+        kind = layer.__class__.__name__
+        config = layer.get_config()
+        index = len(layers)
+        prefix = f"layer{index}"
+        if kind == "Dropout" or kind == "InputLayer":
+            continue
+        if kind == "Bidirectional":
+            inner = layer.forward_layer
+            if inner.__class__.__name__ != "LSTM":
+                raise ValueError(f"Unsupported wrapped layer: {inner.__class__.__name__}")
+            inner_config = inner.get_config()
+            for direction, wrapped in (("fw", layer.forward_layer), ("bw", layer.backward_layer)):
+                for name, value in zip(("kernel", "recurrent_kernel", "bias"), wrapped.get_weights()):
+                    arrays[f"{prefix}_{direction}_{name}"] = value
+            layers.append({
+                "kind": "bidirectional_lstm",
+                "merge_mode": config.get("merge_mode", "concat"),
+                "activation": inner_config.get("activation", "tanh"),
+                "recurrent_activation": inner_config.get("recurrent_activation", "sigmoid"),
+                "return_sequences": inner_config.get("return_sequences", False),
+            })
+        elif kind == "LSTM":
+            for name, value in zip(("kernel", "recurrent_kernel", "bias"), layer.get_weights()):
+                arrays[f"{prefix}_{name}"] = value
+            layers.append({
+                "kind": "lstm",
+                "activation": config.get("activation", "tanh"),
+                "recurrent_activation": config.get("recurrent_activation", "sigmoid"),
+                "return_sequences": config.get("return_sequences", False),
+                "go_backwards": config.get("go_backwards", False),
+            })
+        elif kind == "Dense":
+            for name, value in zip(("kernel", "bias"), layer.get_weights()):
+                arrays[f"{prefix}_{name}"] = value
+            layers.append({"kind": "dense", "activation": config.get("activation", "linear")})
+        else:
+            raise ValueError(f"Unsupported layer type for export: {kind}")
+
+    if scaler_mean is not None and scaler_scale is not None:
+        arrays["scaler_mean"] = np.asarray(scaler_mean, dtype=np.float32)
+        arrays["scaler_scale"] = np.asarray(scaler_scale, dtype=np.float32)
+
+    spec = {"input_shape": list(model.input_shape[1:]), "layers": layers}
+    np.savez(out_path, spec=np.array(json.dumps(spec)), **arrays)
+    return out_path
+
+
+def create_backend(name, model_path=None):
+    if name == "numpy":
+        return NumpyBackend(model_path)
+    if name == "keras":
+        return KerasBackend(model_path)
+    raise ValueError(f"Unknown inference backend: {name}")
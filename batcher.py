@@ -0,0 +1,111 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from metrics import Histogram
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+QUEUE_WAIT_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 250, 500, 1000, 2500)
+
+_STOP = object()
+
+
+def collect_batch(source, max_batch_size, max_wait, first_timeout=None, stop_item=_STOP):
+    try:
+        first = source.get(timeout=first_timeout)
+    except queue.Empty:
+        return []
+    batch = [first]
+    if first is stop_item:
+        return batch
+    deadline = time.monotonic() + max_wait
+    while len(batch) < max_batch_size:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            item = source.get(timeout=remaining)
+        except queue.Empty:
+            break
+        batch.append(item)
+        if item is stop_item:
+            break
+    return batch
+
+
+class InferenceBatcher:
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=5.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.batch_sizes = Histogram("inference_batch_size", BATCH_SIZE_BUCKETS, "Windows per model call")
+        self.queue_wait = Histogram("inference_queue_wait_ms", QUEUE_WAIT_BUCKETS_MS, "Time a window waited for its batch")
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout=timeout)
+
+    def submit(self, features):
+        future = Future()
+        if features is None:
+            future.set_result(0.0)
+            return future
+        self.start()
+        self._queue.put((features, future, time.monotonic()))
+        return future
+
+    def predict(self, features, timeout=None):
+        return self.submit(features).result(timeout=timeout)
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queued": self._queue.qsize(),
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_ms": self.queue_wait.snapshot(),
+        }
+
+    def _run(self):
+        while True:
+            batch = collect_batch(self._queue, self.max_batch_size, self.max_wait)
+            stopping = bool(batch) and batch[-1] is _STOP
+            jobs = [item for item in batch if item is not _STOP]
+            if jobs:
+                self._run_batch(jobs)
+            if stopping:
+                return
+
+    def _run_batch(self, jobs):
+        started = time.monotonic()
+        for _, _, enqueued in jobs:
+            self.queue_wait.observe((started - enqueued) * 1000.0)
+        self.batch_sizes.observe(len(jobs))
+
+        try:
+            stacked = np.concatenate([features for features, _, _ in jobs], axis=0)
+            scores = self.predict_fn(stacked)
+        except Exception as e:
+            for _, future, _ in jobs:
+                future.set_exception(e)
+            return
+
+        for (_, future, _), score in zip(jobs, scores):
+            future.set_result(float(score))
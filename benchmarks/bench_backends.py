@@ -0,0 +1,100 @@
+import argparse
+import glob
+import multiprocessing
+import os
+import resource
+import time
+
+import numpy as np
+
+import backends
+
+DATA_DIR = "dataset"
+BATCH_SIZES = (1, 8, 32, 128)
+TOLERANCE = 1e-4
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024.0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def dataset_features(count):
+    import audio_processor
+    import librosa
+
+    paths = sorted(glob.glob(os.path.join(DATA_DIR, "*", "*.wav")))[:count]
+    clips = [librosa.load(path, sr=audio_processor.SAMPLE_RATE, duration=audio_processor.DURATION)[0] for path in paths]
+    batch, valid = audio_processor.extract_features_batch(clips)
+    return audio_processor.scale_features(batch[valid])
+
+
+def measure(name, model_path, features, repeat, results):
+    before = rss_mb()
+    started = time.perf_counter()
+    backend = backends.create_backend(name, model_path)
+    load_seconds = time.perf_counter() - started
+    backend.predict(features[:1])
+    loaded = rss_mb()
+
+    timings = {}
+    for size in BATCH_SIZES:
+        batch = np.resize(features, (size,) + features.shape[1:])
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            backend.predict(batch)
+            best = min(best, time.perf_counter() - started)
+        timings[size] = best * 1000.0
+
+    results[name] = {
+        "scores": backend.predict(features),
+        "load_seconds": load_seconds,
+        "rss_mb": loaded - before,
+        "timings_ms": timings,
+    }
+
+
+def run_isolated(name, model_path, features, repeat):
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Manager() as manager:
+        results = manager.dict()
+        process = ctx.Process(target=measure, args=(name, model_path, features, repeat, results))
+        process.start()
+        process.join()
+        return dict(results).get(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parity and latency/memory benchmark for inference backends.")
+    parser.add_argument("--keras-model", default="brainrot_lstm_model.h5")
+    parser.add_argument("--numpy-model", default="brainrot_lstm_model.npz")
+    parser.add_argument("--clips", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    features = dataset_features(args.clips)
+    print(f"Scoring {len(features)} dataset clips.")
+
+    keras = run_isolated("keras", args.keras_model, features, args.repeat)
+    numpy_backend = run_isolated("numpy", args.numpy_model, features, args.repeat)
+
+    error = float(np.abs(keras["scores"] - numpy_backend["scores"]).max())
+    agree = float(np.mean((keras["scores"] > 0.95) == (numpy_backend["scores"] > 0.95)))
+    print(f"Parity: max |keras - numpy| = {error:.2e}, label agreement {agree:.1%} "
+          f"({'ok' if error < TOLERANCE else 'MISMATCH'})")
+
+    print(f"{'backend':<8} {'load s':>8} {'RSS MB':>8} " + " ".join(f"{'bs=' + str(s):>10}" for s in BATCH_SIZES))
+    for name, result in (("keras", keras), ("numpy", numpy_backend)):
+        timings = " ".join(f"{result['timings_ms'][s]:>8.2f}ms" for s in BATCH_SIZES)
+        print(f"{name:<8} {result['load_seconds']:>8.2f} {result['rss_mb']:>8.1f} {timings}")
+
+    if error >= TOLERANCE:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
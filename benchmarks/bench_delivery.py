@@ -0,0 +1,145 @@
+import argparse
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from sessions import CLOSED
+
+POLL_INTERVAL = 0.01
+CHUNK_SAMPLES = 2048
+
+
+def poll_consumer(inbox, output, stop, received):
+    while not stop.is_set():
+        try:
+            inbox.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            pass
+        while not output.empty():
+            message = output.get()
+            if message is not None:
+                received.append((json.loads(message)["seq"], time.perf_counter()))
+
+
+def blocking_consumer(inbox, output, stop, received):
+    while True:
+        try:
+            message = output.get(timeout=5)
+        except queue.Empty:
+            continue
+        if message is CLOSED:
+            return
+        received.append((json.loads(message)["seq"], time.perf_counter()))
+
+
+def blocking_receiver(inbox, stop):
+    while not stop.is_set():
+        inbox.get()
+
+
+def idle_cpu(mode, sessions, seconds):
+    stop = threading.Event()
+    threads = []
+    outputs = []
+    inboxes = []
+    for _ in range(sessions):
+        inbox, output = queue.Queue(), queue.Queue()
+        inboxes.append(inbox)
+        outputs.append(output)
+        if mode == "poll":
+            threads.append(threading.Thread(target=poll_consumer, args=(inbox, output, stop, []), daemon=True))
+        else:
+            threads.append(threading.Thread(target=blocking_consumer, args=(inbox, output, stop, []), daemon=True))
+            threads.append(threading.Thread(target=blocking_receiver, args=(inbox, stop), daemon=True))
+    for thread in threads:
+        thread.start()
+
+    started_cpu, started = time.process_time(), time.perf_counter()
+    time.sleep(seconds)
+    cpu = time.process_time() - started_cpu
+    wall = time.perf_counter() - started
+
+    stop.set()
+    for inbox, output in zip(inboxes, outputs):
+        inbox.put(None)
+        output.put(None)
+    return cpu / wall / sessions * 100.0
+
+
+def score_latency(mode, pool, seconds, hop_seconds):
+    import audio_processor
+    from sessions import RealtimeSession
+
+    session = RealtimeSession(f"bench-{mode}", pool, source="stream", hop_seconds=hop_seconds)
+    session.start()
+    received = []
+    stop = threading.Event()
+    inbox = queue.Queue()
+    target = poll_consumer if mode == "poll" else blocking_consumer
+    consumer = threading.Thread(target=target, args=(inbox, session.output, stop, received), daemon=True)
+    consumer.start()
+
+    rng = np.random.default_rng(0)
+    submitted = {}
+    chunk_seconds = CHUNK_SAMPLES / audio_processor.SAMPLE_RATE
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        chunk = (rng.standard_normal(CHUNK_SAMPLES) * 3000).astype("<i2").tobytes()
+        before = session._seq
+        fed_at = time.perf_counter()
+        session.feed(chunk)
+        for seq in range(before, session._seq):
+            submitted[seq] = fed_at
+        time.sleep(max(0.0, chunk_seconds - (time.perf_counter() - fed_at)))
+
+    time.sleep(1.0)
+    stop.set()
+    session.stop()
+    consumer.join(timeout=5)
+    latencies = np.array([(at - submitted[seq]) * 1000.0 for seq, at in received if seq in submitted])
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Idle CPU and score-delivery latency for realtime sessions.")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--idle-seconds", type=float, default=3.0)
+    parser.add_argument("--stream-seconds", type=float, default=10.0)
+    parser.add_argument("--hop-seconds", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"Idle CPU with {args.sessions} connected sessions (% of one core per session):")
+    for mode in ("poll", "blocking"):
+        print(f"  {mode:<9} {idle_cpu(mode, args.sessions, args.idle_seconds):.3f}%")
+
+    os.environ.setdefault("INFERENCE_BACKEND", "numpy")
+    import audio_processor
+    from worker_pool import InferenceWorkerPool
+
+    audio_processor.RECORDINGS_DIR = tempfile.mkdtemp(prefix="bench-delivery-")
+    pool = InferenceWorkerPool(num_workers=args.workers)
+    pool.start()
+    while len(pool.ready) < args.workers:
+        time.sleep(0.1)
+
+    print(f"Score latency, window-completing chunk fed -> result dequeued ({args.stream_seconds:.0f}s stream):")
+    try:
+        for mode in ("poll", "blocking"):
+            latencies = score_latency(mode, pool, args.stream_seconds, args.hop_seconds)
+            if latencies.size == 0:
+                print(f"  {mode:<9} no results")
+                continue
+            print(f"  {mode:<9} n={latencies.size:<4} p50={np.percentile(latencies, 50):6.2f}ms "
+                  f"p99={np.percentile(latencies, 99):6.2f}ms max={latencies.max():6.2f}ms")
+    finally:
+        pool.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import argparse
+import glob
+import os
+import time
+
+import librosa
+import numpy as np
+
+import features as feature_engine
+
+DATA_DIR = "dataset"
+TOLERANCE = 1e-3
+
+
+def librosa_features(audio, max_timesteps=feature_engine.MAX_TIMESTEPS):
+    mfcc = librosa.feature.mfcc(y=audio, sr=feature_engine.SAMPLE_RATE, n_mfcc=feature_engine.N_MFCC)
+    delta = librosa.feature.delta(mfcc)
+    delta2 = librosa.feature.delta(mfcc, order=2)
+    full = np.vstack([mfcc, delta, delta2]).T[:max_timesteps]
+    out = np.zeros((max_timesteps, feature_engine.INPUT_FEATURES), dtype=np.float32)
+    out[:full.shape[0]] = full
+    return out
+
+
+def load_clips(count):
+    paths = sorted(glob.glob(os.path.join(DATA_DIR, "*", "*.wav")))[:count]
+    clips = []
+    for path in paths:
+        audio, _ = librosa.load(path, sr=feature_engine.SAMPLE_RATE, duration=feature_engine.DURATION)
+        clips.append(np.pad(audio, (0, max(0, feature_engine.WINDOW_SAMPLES - audio.size))))
+    if not clips:
+        rng = np.random.default_rng(0)
+        clips = [(0.1 * rng.standard_normal(feature_engine.WINDOW_SAMPLES)).astype(np.float32) for _ in range(count)]
+    return clips
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the NumPy feature engine against librosa and time both.")
+    parser.add_argument("--clips", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    clips = load_clips(args.clips)
+    print(f"Loaded {len(clips)} clips.")
+
+    reference = np.stack([librosa_features(clip) for clip in clips])
+    out = np.empty((len(clips), feature_engine.MAX_TIMESTEPS, feature_engine.INPUT_FEATURES), dtype=np.float32)
+    engine, valid = feature_engine.extract_batch(clips, out=out)
+
+    scale = np.abs(reference).max(axis=(1, 2), keepdims=True) + 1e-9
+    error = (np.abs(engine - reference) / scale).max()
+    print(f"Max relative error vs librosa: {error:.2e} ({'ok' if valid.all() and error < TOLERANCE else 'MISMATCH'})")
+
+    best_librosa = float("inf")
+    best_engine = float("inf")
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        for clip in clips:
+            librosa_features(clip)
+        best_librosa = min(best_librosa, time.perf_counter() - started)
+
+        started = time.perf_counter()
+        feature_engine.extract_batch(clips, out=out)
+        best_engine = min(best_engine, time.perf_counter() - started)
+
+    per_clip_librosa = best_librosa / len(clips) * 1000.0
+    per_clip_engine = best_engine / len(clips) * 1000.0
+    print(f"librosa: {per_clip_librosa:.3f} ms/clip")
+    print(f"engine:  {per_clip_engine:.3f} ms/clip (batch of {len(clips)})")
+    print(f"speedup: {per_clip_librosa / per_clip_engine:.1f}x")
+
+    if not valid.all() or error >= TOLERANCE:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.bench_serving import HOST, request
+
+MODES = {
+    "sync": {"LOG_LEVEL": "DEBUG", "LOG_FORMAT": "text"},
+    "queue": {"LOG_LEVEL": "DEBUG", "ACCESS_LOG_SAMPLE": ""},
+    "queue-sampled": {},
+}
+
+
+def serve(mode, port, write_delay_ms):
+    import logging
+    import logging.handlers
+
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    import log_setup
+    import main
+
+    handler_class = main.QuietRequestHandler
+    if mode == "sync":
+        file_handler = logging.FileHandler(log_setup.LOG_FILE)
+        file_handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s", log_setup.DATE_FORMAT))
+        logging.getLogger().handlers[:] = [file_handler]
+        logging.getLogger("werkzeug").setLevel(logging.DEBUG)
+        log_setup.access_sampler.rates = {}
+        log_setup.access_sampler.default = 0.0
+        log_setup.access_sampler.slow_ms = float("inf")
+        handler_class = WSGIRequestHandler
+    if write_delay_ms:
+        for cls in (logging.FileHandler, logging.handlers.RotatingFileHandler):
+            emit = cls.emit
+
+            def slow_emit(self, record, emit=emit):
+                time.sleep(write_delay_ms / 1000.0)
+                emit(self, record)
+
+            cls.emit = slow_emit
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    make_server(HOST, port, main.app, threaded=True, request_handler=handler_class).serve_forever()
+
+
+def start_server(mode, port, log_file, write_delay_ms):
+    env = dict(os.environ, **MODES[mode])
+    env.setdefault("INFERENCE_BACKEND", "numpy")
+    env["LOG_FILE"] = log_file
+    env["LOG_CONSOLE_LEVEL"] = "CRITICAL"
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.bench_logging", "--serve", mode, "--port", str(port),
+         "--write-delay-ms", str(write_delay_ms)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            status, _ = request(port, "GET", "/batcher-stats")
+            if status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+def load(port, path, requests, concurrency):
+    latencies = []
+    lock = threading.Lock()
+    remaining = iter(range(requests))
+
+    def client():
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            started = time.perf_counter()
+            status, _ = request(port, "GET", path)
+            elapsed = time.perf_counter() - started
+            if status != 200:
+                raise RuntimeError(f"GET {path} returned {status}")
+            with lock:
+                latencies.append(elapsed * 1000.0)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - started
+
+
+def run_mode(mode, port, path, requests, concurrency, write_delay_ms):
+    log_file = os.path.join(tempfile.mkdtemp(prefix="bench-logging-"), "server.log")
+    process = start_server(mode, port, log_file, write_delay_ms)
+    try:
+        load(port, path, max(20, requests // 10), concurrency)
+        latencies, elapsed = load(port, path, requests, concurrency)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    with open(log_file, "rb") as f:
+        lines = sum(1 for _ in f)
+    return {
+        "mode": mode,
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+        "max_ms": round(float(np.max(latencies)), 2),
+        "log_lines": lines,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request latency with synchronous logging versus the background "
+                                                 "queue with sampled access logs.")
+    parser.add_argument("--serve", choices=tuple(MODES), help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=5093)
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--path", default="/is-recording")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--write-delay-ms", type=float, default=0.0,
+                        help="Sleep this long in every file write to simulate a slow or contended disk")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.write_delay_ms)
+        return
+
+    results = [run_mode(mode, args.port, args.path, args.requests, args.concurrency, args.write_delay_ms)
+               for mode in args.modes.split(",")]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"GET {args.path}: {args.requests} requests, {args.concurrency} clients, "
+          f"{args.write_delay_ms:g} ms per log write")
+    print(f"{'mode':<15}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'log lines':>11}")
+    for result in results:
+        print(f"{result['mode']:<15}{result['requests_per_second']:>9.1f}{result['p50_ms']:>9.2f}"
+              f"{result['p99_ms']:>9.2f}{result['max_ms']:>9.2f}{result['log_lines']:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import argparse
+import asyncio
+import http.client
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+
+import numpy as np
+
+HOST = "127.0.0.1"
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def serve(mode, port):
+    import audio_processor
+
+    audio_processor.RECORDINGS_DIR = tempfile.mkdtemp(prefix="bench-serving-")
+    if mode == "asgi":
+        import uvicorn
+
+        import asgi_app
+
+        uvicorn.run(asgi_app.app, host=HOST, port=port, log_level="warning")
+        return
+
+    from werkzeug.serving import make_server
+
+    import main
+
+    main.worker_pool.start()
+    audio_processor.warmup()
+    make_server(HOST, port, main.app, threaded=True).serve_forever()
+
+
+def start_server(mode, port):
+    env = dict(os.environ)
+    env.setdefault("INFERENCE_BACKEND", "numpy")
+    env["RESULT_CACHE_SIZE"] = "0"
+    env["RESULT_CACHE_DB"] = ""
+    env["SAVE_UPLOADS"] = "0"
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.bench_serving", "--serve", mode, "--port", str(port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            status, _ = request(port, "GET", "/is-recording")
+            if status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+def request(port, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection(HOST, port, timeout=60)
+    try:
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def wav_bytes(seed, seconds=3.0, sample_rate=22050):
+    rng = np.random.default_rng(seed)
+    samples = (rng.standard_normal(int(seconds * sample_rate)) * 3000).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+def upload_load(port, concurrency, seconds):
+    bodies = [wav_bytes(seed) for seed in range(8)]
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client(index):
+        count = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                status, _ = request(port, "POST", "/upload", bodies[(index + count) % len(bodies)],
+                                    {"Content-Type": "audio/wav"})
+            except OSError:
+                status = None
+            elapsed = time.perf_counter() - started
+            with lock:
+                if status == 200:
+                    latencies.append(elapsed * 1000.0)
+                else:
+                    errors[0] += 1
+            count += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    latencies = np.array(latencies)
+    return {
+        "requests_per_s": len(latencies) / wall,
+        "p50_ms": float(np.percentile(latencies, 50)) if latencies.size else None,
+        "p99_ms": float(np.percentile(latencies, 99)) if latencies.size else None,
+        "errors": errors[0],
+    }
+
+
+def process_usage(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    threads = int(fields[17])
+    with open(f"/proc/{pid}/status") as f:
+        rss = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:")) / 1024.0
+    return cpu, threads, rss
+
+
+async def hold_idle_websockets(port, count, seconds, pid):
+    import websockets
+
+    start = json.dumps({"type": "start", "format": "pcm16", "sample_rate": 22050, "hop_seconds": 0.5})
+    connections = []
+    for _ in range(count):
+        connection = await websockets.connect(f"ws://{HOST}:{port}/ws/realtime-predictions", open_timeout=30)
+        await connection.send(start)
+        connections.append(connection)
+    await asyncio.sleep(1.0)
+
+    before_cpu, threads, rss = process_usage(pid)
+    started = time.perf_counter()
+    await asyncio.sleep(seconds)
+    after_cpu, _, _ = process_usage(pid)
+    wall = time.perf_counter() - started
+
+    for connection in connections:
+        await connection.close()
+    return {"idle_cpu_pct": (after_cpu - before_cpu) / wall * 100.0, "threads": threads, "rss_mb": rss}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /upload and idle WebSockets for the Flask and ASGI modes.")
+    parser.add_argument("--serve", choices=("flask", "asgi"), help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=5090)
+    parser.add_argument("--modes", default="flask,asgi")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--idle-websockets", type=int, default=200)
+    parser.add_argument("--idle-seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port)
+        return
+
+    results = {}
+    for offset, mode in enumerate(args.modes.split(",")):
+        port = args.port + offset
+        process = start_server(mode, port)
+        try:
+            request(port, "POST", "/upload", wav_bytes(99), {"Content-Type": "audio/wav"})
+            results[mode] = upload_load(port, args.concurrency, args.seconds)
+            if args.idle_websockets:
+                results[mode].update(asyncio.run(
+                    hold_idle_websockets(port, args.idle_websockets, args.idle_seconds, process.pid)
+                ))
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    print(f"/upload with {args.concurrency} concurrent clients for {args.seconds:.0f}s; "
+          f"{args.idle_websockets} idle WebSockets")
+    print(f"{'mode':<6} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'idle CPU%':>10} {'threads':>8} {'RSS MB':>8}")
+    for mode, result in results.items():
+        print(f"{mode:<6} {result['requests_per_s']:>8.1f} {result['p50_ms'] or 0:>8.1f} {result['p99_ms'] or 0:>8.1f} "
+              f"{result['errors']:>7} {result.get('idle_cpu_pct', 0):>10.2f} {result.get('threads', 0):>8} "
+              f"{result.get('rss_mb', 0):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
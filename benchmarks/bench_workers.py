@@ -0,0 +1,123 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+MODES = {
+    "spawn": {"WORKER_START_METHOD": "spawn", "SHARED_WEIGHTS": "0"},
+    "spawn-shared": {"WORKER_START_METHOD": "spawn", "SHARED_WEIGHTS": "1"},
+    "prefork": {"WORKER_START_METHOD": "forkserver", "SHARED_WEIGHTS": "1"},
+}
+
+
+def measure(workers, windows, payload):
+    from worker_pool import InferenceWorkerPool
+
+    pool = InferenceWorkerPool(num_workers=workers)
+    started = time.perf_counter()
+    pool.start()
+    while len(pool.ready) < workers:
+        time.sleep(0.02)
+    startup = time.perf_counter() - started
+
+    rng = np.random.default_rng(0)
+    if payload == "features":
+        items = rng.standard_normal((64, 1, 130, 39)).astype(np.float32)
+    else:
+        items = (0.1 * rng.standard_normal((64, 66150))).astype(np.float32)
+    done = []
+    pool.register("bench", done.append)
+    for i in range(workers * 4):
+        pool.submit("bench", i, items[i % len(items)])
+    while len(done) < workers * 4:
+        time.sleep(0.005)
+    done.clear()
+    started = time.perf_counter()
+    for i in range(windows):
+        pool.submit("bench", i, items[i % len(items)])
+    while len(done) < windows:
+        time.sleep(0.005)
+    elapsed = time.perf_counter() - started
+
+    memory = [process["memory"] for process in pool.stats()["processes"]]
+    pool.stop()
+    return {
+        "workers": workers,
+        "startup_seconds": round(startup, 3),
+        "windows_per_second": round(windows / elapsed, 1),
+        "rss_mb": round(float(np.mean([m.get("rss_mb", 0.0) for m in memory])), 1),
+        "pss_mb": round(float(np.mean([m.get("pss_mb", 0.0) for m in memory])), 1),
+        "anon_mb": round(float(np.mean([m.get("anon_mb", 0.0) for m in memory])), 1),
+    }
+
+
+def run_mode(mode, workers, windows, payload):
+    env = dict(os.environ, **MODES[mode])
+    env.setdefault("INFERENCE_BACKEND", "numpy")
+    env.setdefault("OMP_NUM_THREADS", "1")
+    env.setdefault("OPENBLAS_NUM_THREADS", "1")
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_workers", "--run", str(workers), "--windows", str(windows),
+         "--payload", payload],
+        env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def check(workers):
+    from worker_pool import InferenceWorkerPool
+
+    pool = InferenceWorkerPool(num_workers=workers)
+    pool.start()
+    deadline = time.monotonic() + 180
+    while len(pool.ready) < workers and time.monotonic() < deadline:
+        time.sleep(0.05)
+    ready = dict(pool.ready)
+    memory = [process["memory"] for process in pool.stats()["processes"]]
+    pool.stop()
+    print(f"{pool.start_method} workers: " + ", ".join(
+        f"{pid} {info['backend']} shared={info['shared_weights']}" for pid, info in ready.items()))
+    print("Worker PSS: " + ", ".join(f"{m.get('pss_mb', 0.0):.1f} MB" for m in memory))
+    ok = len(ready) == workers and all(info["shared_weights"] for info in ready.values())
+    print("OK: every worker serves from the shared weight block." if ok else
+          "FAIL: some workers loaded their own copy of the model. Export it with python export_model.py.")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker memory and cores-to-throughput scaling of the worker "
+                                                 "pool.")
+    parser.add_argument("--run", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--check", action="store_true",
+                        help="Start the pool with the serving defaults and fail unless every worker shares weights")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--workers", default=",".join(str(n) for n in (1, 2, 4, 8) if n <= (os.cpu_count() or 1)))
+    parser.add_argument("--windows", type=int, default=2000)
+    parser.add_argument("--payload", choices=("features", "audio"), default="features")
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(measure(args.run, args.windows, args.payload)))
+        return
+    if args.check:
+        sys.exit(0 if check(int(args.workers.split(",")[-1])) else 1)
+
+    print(f"{os.cpu_count()} CPUs, {args.windows} {args.payload} windows per run, one BLAS thread per worker")
+    print(f"{'mode':<13}{'workers':>8}{'startup s':>11}{'win/s':>10}{'scaling':>9}"
+          f"{'RSS MB':>9}{'PSS MB':>9}{'anon MB':>9}")
+    for mode in args.modes.split(","):
+        baseline = None
+        for workers in (int(n) for n in args.workers.split(",")):
+            result = run_mode(mode, workers, args.windows, args.payload)
+            baseline = baseline or result["windows_per_second"]
+            print(f"{mode:<13}{workers:>8}{result['startup_seconds']:>11.2f}{result['windows_per_second']:>10.1f}"
+                  f"{result['windows_per_second'] / baseline:>8.2f}x{result['rss_mb']:>9.1f}"
+                  f"{result['pss_mb']:>9.1f}{result['anon_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
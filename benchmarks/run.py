@@ -0,0 +1,349 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+DATA_DIR = "dataset"
+RESULTS_DIR = os.path.join("benchmarks", "results")
+BATCH_SIZES = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+FILE_CONCURRENCY = (1, 8, 32)
+SECTIONS = ("features", "scale", "predict", "file", "realtime", "upload", "accuracy")
+SCORE_TOLERANCE = 1e-4
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                               text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if dirty else commit
+
+
+def environment():
+    import audio_processor
+
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "inference_backend": audio_processor.INFERENCE_BACKEND,
+    }
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def synthetic_clips(count, seed=0):
+    import audio_processor
+
+    rng = np.random.default_rng(seed)
+    samples = audio_processor.SAMPLE_RATE * audio_processor.DURATION
+    return [(0.1 * rng.standard_normal(samples)).astype(np.float32) for _ in range(count)]
+
+
+def dataset_files(count):
+    classes = {"brainrot": 1, "no_brainrot": 0}
+    per_class = [sorted(glob.glob(os.path.join(DATA_DIR, name, "*.wav"))) for name in classes]
+    files = []
+    for index in range(max((len(paths) for paths in per_class), default=0)):
+        for label, paths in zip(classes.values(), per_class):
+            if index < len(paths):
+                files.append((paths[index], label))
+    return files[:count]
+
+
+def bench_features(batch_sizes, repeat):
+    import audio_processor
+
+    clips = synthetic_clips(max(batch_sizes))
+    results = {"single_ms": best_of(lambda: audio_processor.extract_features(clips[0]), repeat) * 1000.0}
+    for size in batch_sizes:
+        elapsed = best_of(lambda: audio_processor.extract_features_batch(clips[:size]), repeat)
+        results[f"bs={size}"] = {"batch_ms": elapsed * 1000.0, "per_clip_ms": elapsed / size * 1000.0}
+    return results
+
+
+def bench_scale(batch_sizes, repeat):
+    import audio_processor
+
+    rng = np.random.default_rng(1)
+    results = {}
+    for size in batch_sizes:
+        features = rng.standard_normal((size, audio_processor.MAX_TIMESTEPS, audio_processor.INPUT_FEATURES))
+        features = features.astype(np.float32)
+        elapsed = best_of(lambda: audio_processor.scale_features(features), repeat)
+        results[f"bs={size}"] = {"batch_ms": elapsed * 1000.0, "per_clip_ms": elapsed / size * 1000.0}
+    return results
+
+
+def bench_predict(batch_sizes, repeat):
+    import audio_processor
+
+    batch, _ = audio_processor.extract_features_batch(synthetic_clips(max(batch_sizes), seed=2))
+    results = {"predict_brainrot_ms": best_of(lambda: audio_processor.predict_brainrot(batch[:1]), repeat) * 1000.0}
+    for size in batch_sizes:
+        elapsed = best_of(lambda: audio_processor.predict_batch(batch[:size]), repeat)
+        results[f"bs={size}"] = {"batch_ms": elapsed * 1000.0, "per_clip_ms": elapsed / size * 1000.0}
+    return results
+
+
+def bench_file(count, concurrency_levels):
+    import audio_processor
+    from batcher import InferenceBatcher
+
+    paths = [path for path, _ in dataset_files(count)]
+    if not paths:
+        return {"skipped": f"no WAV files under {DATA_DIR}/"}
+    started = time.perf_counter()
+    for path in paths:
+        audio_processor.predict_from_file(path)
+    results = {"files": len(paths), "sequential_per_file_ms": (time.perf_counter() - started) / len(paths) * 1000.0}
+
+    batcher = InferenceBatcher(audio_processor.predict_batch, max_batch_size=max(concurrency_levels))
+    try:
+        for concurrency in concurrency_levels:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                started = time.perf_counter()
+                list(executor.map(lambda path: audio_processor.predict_from_file(path, batcher), paths))
+                elapsed = time.perf_counter() - started
+            results[f"concurrency={concurrency}"] = {"files_per_s": len(paths) / elapsed}
+    finally:
+        batcher.stop()
+    return results
+
+
+def bench_realtime(seconds, hop_seconds, workers):
+    import audio_processor
+    from benchmarks.bench_delivery import score_latency
+    from worker_pool import InferenceWorkerPool
+
+    audio_processor.RECORDINGS_DIR = tempfile.mkdtemp(prefix="bench-run-")
+    pool = InferenceWorkerPool(num_workers=workers)
+    pool.start()
+    try:
+        while len(pool.ready) < workers:
+            time.sleep(0.1)
+        latencies = score_latency("blocking", pool, seconds, hop_seconds)
+    finally:
+        pool.stop()
+    if latencies.size == 0:
+        return {"skipped": "no results"}
+    return {
+        "windows": int(latencies.size),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "max_ms": float(latencies.max()),
+    }
+
+
+def bench_upload(port, concurrency, seconds):
+    from benchmarks.bench_serving import request, start_server, upload_load, wav_bytes
+
+    process = start_server("flask", port)
+    try:
+        request(port, "POST", "/upload", wav_bytes(99), {"Content-Type": "audio/wav"})
+        result = upload_load(port, concurrency, seconds)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    result["concurrency"] = concurrency
+    return result
+
+
+def dense_scores(model_path):
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(model_path, compile=False)
+    return model.predict(np.load("X_test.npy"), verbose=0).reshape(-1)
+
+
+def bench_accuracy(dense_model, clips):
+    import audio_processor
+
+    results = {}
+    if os.path.exists(dense_model) and os.path.exists("X_test.npy") and os.path.exists("y_test.npy"):
+        try:
+            scores = dense_scores(dense_model)
+            labels = np.load("y_test.npy").reshape(-1)
+            results["dense"] = {
+                "model": dense_model,
+                "samples": int(labels.size),
+                "accuracy": float(np.mean((scores > 0.5) == (labels > 0.5))),
+                "scores": [round(float(score), 6) for score in scores],
+            }
+        except ImportError as e:
+            results["dense"] = {"skipped": f"TensorFlow not available: {e}"}
+
+    files = dataset_files(clips)
+    if files:
+        import decoding
+
+        audio = [decoding.decode_file(path, audio_processor.SAMPLE_RATE)[:audio_processor.SAMPLE_RATE
+                                                                          * audio_processor.DURATION]
+                 for path, _ in files]
+        batch, valid = audio_processor.extract_features_batch(audio)
+        scores = np.zeros(len(files), dtype=np.float32)
+        if valid.any():
+            scores[valid] = audio_processor.predict_batch(batch[valid])
+        labels = np.array([label for _, label in files])
+        results["serving"] = {
+            "backend": audio_processor.INFERENCE_BACKEND,
+            "samples": len(files),
+            "accuracy": float(np.mean((scores > audio_processor.THRESHOLD) == (labels == 1))),
+            "scores": [round(float(score), 6) for score in scores],
+        }
+    return results
+
+
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = float(value)
+    return flat
+
+
+def compare(current, baseline, max_regression, score_tolerance):
+    failures = []
+    print(f"\nComparison with {baseline['commit']} ({baseline['timestamp']}):")
+    now, before = flatten(current["results"]), flatten(baseline["results"])
+    for name in sorted(set(now) & set(before)):
+        lower_is_better = name.endswith("_ms")
+        if not lower_is_better and not name.endswith("_per_s") and not name.endswith("accuracy"):
+            continue
+        if before[name] == 0:
+            continue
+        change = (now[name] - before[name]) / abs(before[name])
+        worse = change > 0 if lower_is_better else change < 0
+        flag = ""
+        if name.endswith("accuracy") and now[name] != before[name]:
+            flag = "  ACCURACY CHANGED"
+            failures.append(name)
+        elif worse and max_regression is not None and abs(change) > max_regression:
+            flag = "  REGRESSION"
+            failures.append(name)
+        print(f"  {name:<48} {before[name]:>12.3f} -> {now[name]:>12.3f} ({change:+.1%}){flag}")
+
+    for section in ("dense", "serving"):
+        old = baseline["results"].get("accuracy", {}).get(section, {}).get("scores")
+        new = current["results"].get("accuracy", {}).get(section, {}).get("scores")
+        if not old or not new:
+            continue
+        if len(old) != len(new):
+            print(f"  accuracy.{section}.scores: sample count changed ({len(old)} -> {len(new)})")
+            failures.append(f"accuracy.{section}.scores")
+            continue
+        drift = float(np.max(np.abs(np.array(new) - np.array(old))))
+        ok = drift <= score_tolerance
+        print(f"  accuracy.{section}.scores max |drift| = {drift:.2e} ({'ok' if ok else 'SCORES CHANGED'})")
+        if not ok:
+            failures.append(f"accuracy.{section}.scores")
+    return failures
+
+
+def summarize(results):
+    for section, values in results.items():
+        print(f"\n[{section}]")
+        for name, value in flatten(values).items():
+            print(f"  {name:<40} {value:>12.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite and save machine-readable results.")
+    parser.add_argument("--sections", default=",".join(SECTIONS))
+    parser.add_argument("--batch-sizes", default=",".join(str(size) for size in BATCH_SIZES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--files", type=int, default=32)
+    parser.add_argument("--accuracy-clips", type=int, default=128)
+    parser.add_argument("--dense-model", default="brainrot_detector.h5")
+    parser.add_argument("--realtime-seconds", type=float, default=10.0)
+    parser.add_argument("--hop-seconds", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--upload-seconds", type=float, default=10.0)
+    parser.add_argument("--upload-concurrency", type=int, default=16)
+    parser.add_argument("--port", type=int, default=5095)
+    parser.add_argument("--output", help=f"Results file (default {RESULTS_DIR}/<commit>.json)")
+    parser.add_argument("--compare", help="Baseline results file to compare against")
+    parser.add_argument("--max-regression", type=float, help="Fail when a latency/throughput metric is this much "
+                                                             "worse than the baseline (e.g. 0.2 for 20%%)")
+    parser.add_argument("--score-tolerance", type=float, default=SCORE_TOLERANCE)
+    args = parser.parse_args()
+
+    os.environ.setdefault("INFERENCE_BACKEND", "numpy")
+    import audio_processor
+
+    sections = [section for section in args.sections.split(",") if section]
+    unknown = set(sections) - set(SECTIONS)
+    if unknown:
+        parser.error(f"unknown sections: {', '.join(sorted(unknown))}")
+    batch_sizes = tuple(int(size) for size in args.batch_sizes.split(","))
+
+    audio_processor.warmup()
+    runners = {
+        "features": lambda: bench_features(batch_sizes, args.repeat),
+        "scale": lambda: bench_scale(batch_sizes, args.repeat),
+        "predict": lambda: bench_predict(batch_sizes, args.repeat),
+        "file": lambda: bench_file(args.files, FILE_CONCURRENCY),
+        "realtime": lambda: bench_realtime(args.realtime_seconds, args.hop_seconds, args.workers),
+        "upload": lambda: bench_upload(args.port, args.upload_concurrency, args.upload_seconds),
+        "accuracy": lambda: bench_accuracy(args.dense_model, args.accuracy_clips),
+    }
+    results = {}
+    for section in sections:
+        print(f"Running {section}...", flush=True)
+        started = time.perf_counter()
+        results[section] = runners[section]()
+        print(f"  done in {time.perf_counter() - started:.1f}s", flush=True)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "argv": sys.argv[1:],
+        "environment": environment(),
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['commit']}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    summarize({section: values for section, values in results.items() if section != "accuracy"})
+    for section, values in results.get("accuracy", {}).items():
+        if "accuracy" in values:
+            print(f"\n[accuracy.{section}] {values['accuracy']:.1%} on {values['samples']} samples")
+        else:
+            print(f"\n[accuracy.{section}] {values.get('skipped')}")
+    print(f"\nSaved results to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        failures = compare(report, baseline, args.max_regression, args.score_tolerance)
+        if failures:
+            print(f"\n{len(failures)} check(s) failed: {', '.join(failures)}")
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
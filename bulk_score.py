@@ -0,0 +1,265 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+import audio_processor
+import decoding
+import vad
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".ogg", ".webm", ".flac", ".m4a")
+COLUMNS = ("path", "score", "label", "speech", "duration", "model", "error")
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".json": "jsonl", ".parquet": "parquet"}
+CHUNK_FILES = 16
+PROGRESS_SECONDS = 5.0
+
+
+def find_audio(directory):
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        paths.extend(os.path.join(root, name) for name in sorted(files) if name.lower().endswith(AUDIO_EXTENSIONS))
+    return paths
+
+
+def read_manifest(path):
+    base = os.path.dirname(path)
+    with open(path, newline="") as f:
+        if path.endswith(".csv"):
+            rows = list(csv.reader(f))
+            if rows and rows[0] and rows[0][0].strip().lower() == "path":
+                rows = rows[1:]
+            entries = [row[0] for row in rows if row]
+        elif path.endswith((".jsonl", ".json")):
+            entries = [json.loads(line)["path"] for line in f if line.strip()]
+        else:
+            entries = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return [entry if os.path.isabs(entry) else os.path.join(base, entry) for entry in entries]
+
+
+def prepare_chunk(paths):
+    detector = vad.VoiceActivityDetector()
+    prepared = []
+    clips = []
+    for path in paths:
+        row = {"path": path, "speech": None, "duration": None, "error": None}
+        prepared.append(row)
+        try:
+            audio = decoding.decode_file(path, audio_processor.SAMPLE_RATE)
+        except Exception as e:
+            row["error"] = f"decode: {e}"
+            continue
+        row["duration"] = round(audio.size / audio_processor.SAMPLE_RATE, 3)
+        detector.reset()
+        row["speech"] = bool(vad.check(detector, audio[:audio_processor.SAMPLE_RATE * audio_processor.DURATION],
+                                       "bulk"))
+        if row["speech"]:
+            clips.append((row, audio))
+
+    features = np.zeros((0, audio_processor.MAX_TIMESTEPS, audio_processor.INPUT_FEATURES), dtype=np.float32)
+    if clips:
+        batch, valid = audio_processor.extract_features_batch([audio for _, audio in clips])
+        for (row, _), ok, index in zip(clips, valid, np.cumsum(valid) - 1):
+            if ok:
+                row["feature_row"] = int(index)
+            else:
+                row["error"] = "features: clip is silent, too short or not finite"
+        features = batch[valid]
+    return prepared, features
+
+
+class ResultWriter:
+    def __init__(self, path, fmt, resume=True, retry_errors=False):
+        self.path = path
+        self.fmt = fmt
+        self.data_path = f"{path}.partial.jsonl" if fmt == "parquet" else path
+        self.data_fmt = "jsonl" if fmt == "parquet" else fmt
+        if fmt == "parquet":
+            import pyarrow  # noqa: F401
+        if not resume and os.path.exists(self.data_path):
+            os.remove(self.data_path)
+        self.done = self._load(retry_errors) if resume else set()
+        existed = os.path.exists(self.data_path) and os.path.getsize(self.data_path) > 0
+        self.file = open(self.data_path, "a", newline="")
+        self.csv = None
+        if self.data_fmt == "csv":
+            self.csv = csv.DictWriter(self.file, fieldnames=COLUMNS)
+            if not existed:
+                self.csv.writeheader()
+
+    def _load(self, retry_errors):
+        if self.fmt == "parquet" and os.path.exists(self.path) and not os.path.exists(self.data_path):
+            import pyarrow.parquet as pq
+
+            with open(self.data_path, "w") as f:
+                for row in pq.read_table(self.path).to_pylist():
+                    f.write(json.dumps(row) + "\n")
+        if not os.path.exists(self.data_path):
+            return set()
+        with open(self.data_path, "rb+") as f:
+            data = f.read()
+            complete = data.rfind(b"\n") + 1
+            if complete < len(data):
+                f.truncate(complete)
+        text = data[:complete].decode()
+        if self.data_fmt == "csv":
+            rows = list(csv.DictReader(text.splitlines()))
+        else:
+            rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+        if retry_errors:
+            kept = [row for row in rows if not row.get("error")]
+            if len(kept) < len(rows):
+                self._rewrite(kept)
+            rows = kept
+        return {row["path"] for row in rows}
+
+    def _rewrite(self, rows):
+        tmp_path = f"{self.data_path}.tmp"
+        with open(tmp_path, "w", newline="") as f:
+            if self.data_fmt == "csv":
+                writer = csv.DictWriter(f, fieldnames=COLUMNS)
+                writer.writeheader()
+                writer.writerows({key: row.get(key, "") for key in COLUMNS} for row in rows)
+            else:
+                f.writelines(json.dumps({key: row.get(key) for key in COLUMNS}) + "\n" for row in rows)
+        os.replace(tmp_path, self.data_path)
+
+    def write(self, rows):
+        for row in rows:
+            if self.csv is not None:
+                self.csv.writerow({key: "" if row.get(key) is None else row[key] for key in COLUMNS})
+            else:
+                self.file.write(json.dumps({key: row.get(key) for key in COLUMNS}) + "\n")
+        self.file.flush()
+
+    def close(self, finalize=True):
+        self.file.close()
+        if self.fmt != "parquet" or not finalize:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        with open(self.data_path) as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        table = pa.Table.from_pylist(rows, schema=pa.schema([
+            ("path", pa.string()), ("score", pa.float32()), ("label", pa.string()), ("speech", pa.bool_()),
+            ("duration", pa.float32()), ("model", pa.string()), ("error", pa.string()),
+        ]))
+        tmp_path = f"{self.path}.tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, self.path)
+        os.remove(self.data_path)
+
+
+def score_rows(rows, features, model_name):
+    scores = audio_processor.predict_batch(features) if len(features) else []
+    for row in rows:
+        index = row.pop("feature_row", None)
+        row["model"] = model_name
+        if row["error"]:
+            row["label"] = "error"
+        elif not row["speech"]:
+            row["score"], row["label"] = 0.0, vad.NO_SPEECH
+        else:
+            score = float(scores[index])
+            row["score"] = round(score, 4)
+            row["label"] = "brainrot" if score > audio_processor.THRESHOLD else "normal"
+    return rows
+
+
+def run(paths, writer, workers=None, batch_size=64, chunk_files=CHUNK_FILES):
+    todo = [path for path in paths if path not in writer.done]
+    print(f"{len(paths)} files, {len(paths) - len(todo)} already scored, {len(todo)} to score.")
+    if not todo:
+        return 0
+    model_name = audio_processor.registry.active().name
+    chunks = [todo[i:i + chunk_files] for i in range(0, len(todo), chunk_files)]
+    started = last_report = time.perf_counter()
+    pending_rows, pending_features = [], []
+    scored = 0
+
+    def flush():
+        nonlocal scored
+        features = np.concatenate(pending_features) if pending_features else np.zeros((0,), dtype=np.float32)
+        writer.write(score_rows(pending_rows, features, model_name))
+        scored += len(pending_rows)
+        pending_rows.clear()
+        pending_features.clear()
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        limit = workers * 2
+        queued = iter(chunks)
+        in_flight = set()
+        while True:
+            for chunk in queued:
+                in_flight.add(executor.submit(prepare_chunk, chunk))
+                if len(in_flight) >= limit:
+                    break
+            if not in_flight:
+                break
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                rows, features = future.result()
+                offset = sum(len(part) for part in pending_features)
+                for row in rows:
+                    if row.get("feature_row") is not None:
+                        row["feature_row"] += offset
+                pending_rows.extend(rows)
+                pending_features.append(features)
+            if sum(len(part) for part in pending_features) >= batch_size or not in_flight:
+                flush()
+            now = time.perf_counter()
+            if now - last_report >= PROGRESS_SECONDS:
+                print(f"Scored {scored}/{len(todo)} files ({scored / (now - started):.1f} files/s).")
+                last_report = now
+        flush()
+
+    elapsed = time.perf_counter() - started
+    print(f"Scored {scored} files in {elapsed:.1f}s ({scored / elapsed:.1f} files/s).")
+    return scored
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score every audio file in directories or manifests and write "
+                                                 "the results to CSV, JSONL or Parquet.")
+    parser.add_argument("inputs", nargs="+", help="Directories to scan, or manifest files (.txt, .csv or .jsonl) "
+                                                  "whose relative paths resolve against the manifest's directory")
+    parser.add_argument("--out", required=True, help="Output file (.csv, .jsonl or .parquet)")
+    parser.add_argument("--format", choices=("csv", "jsonl", "parquet"), default=None)
+    parser.add_argument("--workers", type=int, default=None, help="Decode/feature processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--no-resume", action="store_true", help="Discard existing results and start over")
+    parser.add_argument("--retry-errors", action="store_true", help="Re-score files that failed on a previous run")
+    args = parser.parse_args()
+
+    fmt = args.format or FORMATS.get(os.path.splitext(args.out)[1].lower())
+    if fmt is None:
+        parser.error(f"Cannot infer the output format from {args.out}. Use --format.")
+
+    paths = []
+    for entry in args.inputs:
+        paths.extend(find_audio(entry) if os.path.isdir(entry) else read_manifest(entry))
+    paths = list(dict.fromkeys(paths))
+
+    try:
+        writer = ResultWriter(args.out, fmt, resume=not args.no_resume, retry_errors=args.retry_errors)
+    except ImportError:
+        parser.error("Parquet output needs pyarrow (pip install pyarrow).")
+    completed = False
+    try:
+        run(paths, writer, workers=args.workers, batch_size=args.batch_size)
+        completed = True
+    except KeyboardInterrupt:
+        print(f"Interrupted. Run the same command again to resume from {writer.data_path}.")
+    finally:
+        writer.close(finalize=completed)
+
+
+if __name__ == "__main__":
+    main()
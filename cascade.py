@@ -0,0 +1,264 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+import metrics
+from backends import sigmoid
+
+CASCADE_PATH = os.environ.get("CASCADE_PATH", "brainrot_cascade.npz")
+CASCADE_TARGET_RECALL = float(os.environ.get("CASCADE_TARGET_RECALL", "0.995"))
+REPORT_PATH = "cascade_report.json"
+SWEEP_THRESHOLDS = (0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5)
+WINDOW_HOP_SECONDS = 0.5
+TRAIN_PASSES = 3
+FOLDS = 5
+FEATURE_CHUNK = 256
+RECALL_TOLERANCE = 0.005
+
+metrics.describe("cascade_windows_total", "Windows seen by a cascade model, by exit stage")
+
+
+def pooled_features(features):
+    x = np.asarray(features, dtype=np.float32)
+    return np.concatenate([x.mean(axis=1), x.std(axis=1)], axis=-1)
+
+
+class CascadeStage:
+    def __init__(self, path, threshold=None):
+        self.path = path
+        with np.load(path, allow_pickle=False) as data:
+            self.mean = data["mean"]
+            self.scale = data["scale"]
+            self.coef = data["coef"]
+            self.intercept = float(data["intercept"])
+            self.trained_threshold = float(data["threshold"])
+        self.threshold = self.trained_threshold if threshold is None else float(threshold)
+
+    def probabilities(self, features):
+        return sigmoid((pooled_features(features) - self.mean) / self.scale @ self.coef + self.intercept)
+
+    def describe(self, model_name):
+        early = metrics.counter_value("cascade_windows_total", model=model_name, stage="early_exit")
+        full = metrics.counter_value("cascade_windows_total", model=model_name, stage="full")
+        return {
+            "path": self.path,
+            "threshold": self.threshold,
+            "trained_threshold": self.trained_threshold,
+            "windows": int(early + full),
+            "early_exit_fraction": round(early / (early + full), 4) if early + full else None,
+        }
+
+
+def choose_threshold(probabilities, labels, target_recall=CASCADE_TARGET_RECALL):
+    positives = np.sort(probabilities[labels == 1])
+    if positives.size == 0:
+        return 0.0
+    return float(positives[int(np.floor((1.0 - target_recall) * positives.size))])
+
+
+def fit_stage(pooled, labels, groups, full_positive, target_recall=CASCADE_TARGET_RECALL):
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import GroupKFold, cross_val_predict
+
+    mean = pooled.mean(axis=0)
+    scale = pooled.std(axis=0) + 1e-6
+    z = (pooled - mean) / scale
+    model = LogisticRegression(class_weight="balanced", max_iter=2000)
+    held_out = cross_val_predict(model, z, labels, groups=groups, cv=GroupKFold(n_splits=len(np.unique(groups))),
+                                 method="predict_proba")[:, 1]
+    model.fit(z, labels)
+    threshold = min(choose_threshold(held_out, labels, target_recall),
+                    choose_threshold(held_out, full_positive.astype(int), target_recall))
+    return {
+        "mean": mean,
+        "scale": scale,
+        "coef": model.coef_[0],
+        "intercept": model.intercept_[0],
+        "threshold": threshold,
+    }
+
+
+def save_stage(path, stage):
+    np.savez(path, **{key: np.asarray(value, dtype=np.float32) for key, value in stage.items()})
+    return path
+
+
+def _scores(passed, stage2_scores, labels, decision_threshold):
+    full_positive = stage2_scores > decision_threshold
+    predicted = passed & full_positive
+    actual = labels == 1
+    tp = int(np.sum(predicted & actual))
+    fp = int(np.sum(predicted & ~actual))
+    fn = int(np.sum(~predicted & actual))
+    return {
+        "precision": round(tp / (tp + fp), 4) if tp + fp else None,
+        "recall": round(tp / (tp + fn), 4) if tp + fn else None,
+        "accuracy": round(float(np.mean(predicted == actual)), 4),
+        "early_exit_fraction": round(float(np.mean(~passed)), 4),
+        "normal_early_exit_fraction": round(float(np.mean(~passed[~actual])), 4) if np.any(~actual) else None,
+        "full_positives_kept": round(float(np.mean(passed[full_positive])), 4) if np.any(full_positive) else None,
+    }
+
+
+def cascade_report(stage1_scores, stage2_scores, labels, threshold, decision_threshold, costs=None,
+                   thresholds=SWEEP_THRESHOLDS):
+    labels = np.asarray(labels).astype(int)
+    report = {
+        "samples": int(labels.size),
+        "threshold": threshold,
+        "decision_threshold": decision_threshold,
+        "full_model": _scores(np.ones(labels.size, dtype=bool), stage2_scores, labels, decision_threshold),
+        "sweep": [],
+    }
+    for value in sorted(set(thresholds) | {threshold}):
+        row = dict(threshold=round(value, 4), **_scores(stage1_scores >= value, stage2_scores, labels,
+                                                        decision_threshold))
+        if costs:
+            cascade_ms = costs["stage1_ms"] + (1.0 - row["early_exit_fraction"]) * costs["stage2_ms"]
+            row["speedup"] = round((costs["stage1_ms"] + costs["stage2_ms"]) / cascade_ms, 2)
+        report["sweep"].append(row)
+    if costs:
+        report["costs"] = costs
+    trained = next(row for row in report["sweep"] if row["threshold"] == round(threshold, 4))
+    full_recall = report["full_model"]["recall"] or 0.0
+    report["recall_holds"] = bool((trained["recall"] or 0.0) >= full_recall - RECALL_TOLERANCE
+                                  and (trained["full_positives_kept"] or 1.0) >= CASCADE_TARGET_RECALL)
+    return report
+
+
+def measure_costs(stage, predict_full, features, repeat=3):
+    timings = {}
+    for name, fn in (("stage1_ms", stage.probabilities), ("stage2_ms", predict_full)):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn(features)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        timings[name] = round(best * 1000.0 / len(features), 4)
+    return timings
+
+
+def source_files(data_dir):
+    from dataset_cache import LABEL_DIRS
+
+    sources = []
+    for label_dir, label_value in LABEL_DIRS:
+        full_dir = os.path.join(data_dir, label_dir)
+        sources.extend((os.path.join(full_dir, name), label_value) for name in sorted(os.listdir(full_dir))
+                       if name.endswith(".wav"))
+    return sources
+
+
+def split_files(sources, test_size=0.2, folds=FOLDS, seed=42):
+    from sklearn.model_selection import StratifiedKFold, train_test_split
+
+    labels = [label for _, label in sources]
+    train, test = train_test_split(sources, test_size=test_size, stratify=labels, random_state=seed)
+    groups = np.zeros(len(train), dtype=int)
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    for fold, (_, members) in enumerate(splitter.split(train, [label for _, label in train])):
+        groups[members] = fold
+    return train, groups, test
+
+
+def window_features(sources, groups=None, passes=1, hop_seconds=WINDOW_HOP_SECONDS, seed=0):
+    import audio_processor
+    import decoding
+
+    rng = np.random.default_rng(seed)
+    groups = np.zeros(len(sources), dtype=int) if groups is None else np.asarray(groups)
+    clips = {path: decoding.decode_file(path, audio_processor.SAMPLE_RATE) for path, _ in sources}
+    window = audio_processor.SAMPLE_RATE * audio_processor.DURATION
+    hop = int(hop_seconds * audio_processor.SAMPLE_RATE)
+    features, labels, window_groups = [], [], []
+    for group in np.unique(groups):
+        for label in (0, 1):
+            paths = [path for (path, value), g in zip(sources, groups) if g == group and value == label]
+            for _ in range(passes if paths else 0):
+                stream = np.concatenate([clips[paths[i]] for i in rng.permutation(len(paths))])
+                starts = range(0, len(stream) - window + 1, hop)
+                for i in range(0, len(starts), FEATURE_CHUNK):
+                    batch, valid = audio_processor.extract_features_batch(
+                        [stream[start:start + window] for start in starts[i:i + FEATURE_CHUNK]])
+                    features.append(batch[valid])
+                    labels.extend([label] * int(valid.sum()))
+                    window_groups.extend([group] * int(valid.sum()))
+    return np.concatenate(features), np.asarray(labels), np.asarray(window_groups)
+
+
+def full_scores(predict_full, features, chunk=FEATURE_CHUNK):
+    return np.concatenate([predict_full(features[i:i + chunk]) for i in range(0, len(features), chunk)])
+
+
+def train_and_report(data_dir, out=CASCADE_PATH, target_recall=CASCADE_TARGET_RECALL, evaluate_only=False):
+    import audio_processor
+
+    model = audio_processor.registry.active()
+    predict_full = model.predict_full
+    train, groups, test = split_files(source_files(data_dir))
+    if not evaluate_only:
+        X, y, window_groups = window_features(train, groups, passes=TRAIN_PASSES)
+        full_positive = full_scores(predict_full, X) > audio_processor.THRESHOLD
+        save_stage(out, fit_stage(pooled_features(X), y, window_groups, full_positive, target_recall))
+        print(f"Saved cascade stage to {out} ({len(y)} windows from {len(train)} files).")
+
+    stage = CascadeStage(out)
+    X, y, _ = window_features(test, seed=1)
+    report = cascade_report(stage.probabilities(X), full_scores(predict_full, X), y, stage.threshold,
+                            audio_processor.THRESHOLD, costs=measure_costs(stage, predict_full, X[:64]))
+    report["model"] = model.name
+    report["test_files"] = len(test)
+    return report
+
+
+def print_report(report):
+    full = report["full_model"]
+    print(f"Cascade on {report['samples']} 3 s windows from {report.get('test_files', '?')} held-out files "
+          f"(brainrot above {report['decision_threshold']}). 'kept' is the share of full-model positives that "
+          f"reach the full model.")
+    print(f"Full model: precision={full['precision']} recall={full['recall']} accuracy={full['accuracy']}")
+    if "costs" in report:
+        print(f"Cost per window: stage 1 {report['costs']['stage1_ms']:.4f} ms, "
+              f"full model {report['costs']['stage2_ms']:.4f} ms")
+    print(f"{'threshold':>10}{'early exit':>12}{'of normal':>11}{'kept':>8}{'precision':>11}{'recall':>9}"
+          f"{'accuracy':>10}{'speedup':>9}")
+    for row in report["sweep"]:
+        marker = " <- trained" if row["threshold"] == round(report["threshold"], 4) else ""
+        print(f"{row['threshold']:>10.4f}{row['early_exit_fraction']:>12.1%}"
+              f"{row['normal_early_exit_fraction'] or 0:>11.1%}{row['full_positives_kept'] or 0:>8.1%}"
+              f"{row['precision'] or 0:>11.4f}"
+              f"{row['recall'] or 0:>9.4f}{row['accuracy']:>10.4f}{row.get('speedup', 0):>8.2f}x{marker}")
+
+
+def write_report(report, path=REPORT_PATH):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the cascade's first stage on continuous 3 s windows cut from "
+                                                 "the dataset and report recall and early exits against the "
+                                                 "active model on held-out files.")
+    parser.add_argument("--data-dir", default="dataset")
+    parser.add_argument("--out", default=CASCADE_PATH)
+    parser.add_argument("--target-recall", type=float, default=CASCADE_TARGET_RECALL)
+    parser.add_argument("--evaluate-only", action="store_true", help="Keep the existing stage and only report")
+    args = parser.parse_args()
+
+    report = train_and_report(args.data_dir, args.out, args.target_recall, args.evaluate_only)
+    print_report(report)
+    write_report(report)
+    if report["recall_holds"]:
+        trained = next(row for row in report["sweep"] if row["threshold"] == round(report["threshold"], 4))
+        print(f"Recall holds on held-out files at an estimated {trained.get('speedup', 1.0):.2f}x. "
+              f"Set CASCADE=1 to serve with the cascade.")
+    else:
+        print("Recall does not hold on held-out files. Leave CASCADE=0.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import features as feature_engine
+
+SAMPLE_RATE = feature_engine.SAMPLE_RATE
+DURATION = feature_engine.DURATION
+CACHE_DIR = os.environ.get("FEATURE_CACHE_DIR", "feature_cache")
+CACHE_VERSION = 1
+LABEL_DIRS = (("brainrot", 1), ("no_brainrot", 0))
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def entry_key(digest, augment, seed):
+    return f"{digest[:24]}-{f'aug{seed}' if augment else 'plain'}-v{CACHE_VERSION}"
+
+
+def augment_audio(y, rng):
+    import librosa
+
+    noise = y + 0.005 * rng.standard_normal(len(y)).astype(np.float32)
+    stretch = librosa.effects.time_stretch(y, rate=rng.uniform(0.8, 1.2))
+    pitch = librosa.effects.pitch_shift(y, sr=SAMPLE_RATE, n_steps=int(rng.integers(-2, 2)))
+    return [noise[:len(y)], stretch[:len(y)], pitch[:len(y)]]
+
+
+def build_entry(path, digest, augment, seed, out_path):
+    import librosa
+
+    y, _ = librosa.load(path, sr=SAMPLE_RATE, duration=DURATION)
+    if len(y) < SAMPLE_RATE * DURATION:
+        y = np.pad(y, (0, SAMPLE_RATE * DURATION - len(y)))
+
+    clips = [y]
+    if augment:
+        clips += augment_audio(y, np.random.default_rng([seed, int(digest[:8], 16)]))
+    batch, valid = feature_engine.extract_batch(clips)
+    rows = batch[valid]
+    tmp_path = out_path + ".tmp.npy"
+    np.save(tmp_path, rows)
+    os.replace(tmp_path, out_path)
+    return out_path, len(rows)
+
+
+class FeatureStore:
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.entries_dir = os.path.join(cache_dir, "entries")
+        self.manifest_path = os.path.join(cache_dir, "manifest.json")
+        self.features_path = os.path.join(cache_dir, "features.npy")
+        self.labels_path = os.path.join(cache_dir, "labels.npy")
+        os.makedirs(self.entries_dir, exist_ok=True)
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            if manifest.get("version") == CACHE_VERSION:
+                return manifest
+        return {"version": CACHE_VERSION, "files": {}}
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def digest(self, path):
+        stat = os.stat(path)
+        known = self.manifest["files"].get(path)
+        if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            return known["digest"]
+        digest = file_digest(path)
+        self.manifest["files"][path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "digest": digest}
+        return digest
+
+    def entry_path(self, key):
+        return os.path.join(self.entries_dir, key + ".npy")
+
+    def build(self, data_dir="dataset", augment=True, seed=0, workers=None):
+        sources = []
+        for label_dir, label_value in LABEL_DIRS:
+            full_dir = os.path.join(data_dir, label_dir)
+            for filename in sorted(os.listdir(full_dir)):
+                if filename.endswith(".wav"):
+                    sources.append((os.path.join(full_dir, filename), label_value))
+
+        plan = []
+        pending = {}
+        for path, label_value in sources:
+            digest = self.digest(path)
+            use_augment = augment and label_value == 1
+            key = entry_key(digest, use_augment, seed)
+            plan.append((path, key, label_value))
+            if not os.path.exists(self.entry_path(key)) and key not in pending:
+                pending[key] = (path, digest, use_augment, seed, self.entry_path(key))
+
+        known = {path for path, _ in sources}
+        self.manifest["files"] = {path: info for path, info in self.manifest["files"].items() if path in known}
+
+        failed = set()
+        if pending:
+            print(f"Extracting features for {len(pending)} of {len(plan)} files...")
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {key: executor.submit(build_entry, *args) for key, args in pending.items()}
+                for key, future in futures.items():
+                    try:
+                        future.result()
+                    except Exception as e:
+                        failed.add(key)
+                        print(f"Error processing {os.path.basename(pending[key][0])}: {e}")
+        else:
+            print(f"All {len(plan)} files are cached.")
+        self._save_manifest()
+
+        plan = [item for item in plan if item[1] not in failed]
+        return self._assemble(plan)
+
+    def _assemble(self, plan):
+        parts = [(np.load(self.entry_path(key), mmap_mode="r"), label_value) for _, key, label_value in plan]
+        total = sum(len(rows) for rows, _ in parts)
+        shape = parts[0][0].shape[1:] if parts else (feature_engine.MAX_TIMESTEPS, feature_engine.INPUT_FEATURES)
+
+        features = np.lib.format.open_memmap(self.features_path + ".tmp.npy", mode="w+", dtype=np.float32,
+                                             shape=(total,) + tuple(shape))
+        labels = np.empty(total, dtype=np.int64)
+        offset = 0
+        for rows, label_value in parts:
+            features[offset:offset + len(rows)] = rows
+            labels[offset:offset + len(rows)] = label_value
+            offset += len(rows)
+        features.flush()
+        del features
+        os.replace(self.features_path + ".tmp.npy", self.features_path)
+        np.save(self.labels_path, labels)
+
+        index = [{"path": path, "key": key, "label": label_value, "rows": len(rows)}
+                 for (path, key, label_value), (rows, _) in zip(plan, parts)]
+        with open(os.path.join(self.cache_dir, "index.json"), "w") as f:
+            json.dump(index, f, indent=1)
+        return self.load()
+
+    def load(self):
+        return np.load(self.features_path, mmap_mode="r"), np.load(self.labels_path)
+
+
+def build_dataset(data_dir="dataset", augment=True, seed=0, workers=None, cache_dir=CACHE_DIR):
+    return FeatureStore(cache_dir).build(data_dir, augment=augment, seed=seed, workers=workers)
@@ -0,0 +1,346 @@
+import os
+import shutil
+import struct
+import subprocess
+import threading
+
+import numpy as np
+
+import metrics
+
+SAMPLE_RATE = 22050
+HEAD_BYTES = 64
+CHUNK_BYTES = 64 * 1024
+FFMPEG_EXIT_TIMEOUT = 5
+
+RAW_MIMETYPES = ("audio/l16", "audio/pcm", "audio/x-pcm", "audio/raw")
+RAW_EXTENSIONS = (".pcm", ".raw")
+EXTENSIONS = {"wav": ".wav", "raw": ".pcm", "webm": ".webm", "ogg": ".ogg", "mp3": ".mp3",
+              "flac": ".flac", "mp4": ".m4a"}
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class DecodeError(Exception):
+    pass
+
+
+class UploadReader:
+    def __init__(self, stream, tee=None):
+        self.stream = stream
+        self.tee = tee
+        self.head = stream.read(HEAD_BYTES) or b""
+        self._head_pending = True
+        self.bytes_read = len(self.head)
+
+    def read(self, size=CHUNK_BYTES):
+        if self._head_pending:
+            self._head_pending = False
+            if self.tee is not None and self.head:
+                self.tee.write(self.head)
+            if size >= len(self.head):
+                rest = self.stream.read(size - len(self.head)) if size > len(self.head) else b""
+                self._count(rest)
+                return self.head + rest
+            self.stream = _Prefixed(self.head[size:], self.stream)
+            return self.head[:size]
+        data = self.stream.read(size) or b""
+        self._count(data)
+        return data
+
+    def chunks(self, size=CHUNK_BYTES):
+        while True:
+            data = self.read(size)
+            if not data:
+                return
+            yield data
+
+    def read_all(self):
+        buffer = bytearray()
+        for data in self.chunks():
+            buffer += data
+        return buffer
+
+    def _count(self, data):
+        if data:
+            self.bytes_read += len(data)
+            if self.tee is not None:
+                self.tee.write(data)
+
+
+class _Prefixed:
+    def __init__(self, prefix, stream):
+        self.prefix = prefix
+        self.stream = stream
+
+    def read(self, size):
+        if self.prefix:
+            data, self.prefix = self.prefix[:size], self.prefix[size:]
+            return data
+        return self.stream.read(size)
+
+
+def sniff_format(head, mimetype=None, filename=None):
+    if not head:
+        raise DecodeError("The upload is empty.")
+    mimetype = (mimetype or "").lower()
+    extension = os.path.splitext(filename or "")[1].lower()
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav"
+    if mimetype in RAW_MIMETYPES or extension in RAW_EXTENSIONS:
+        return "raw"
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"
+    if head[:4] == b"OggS":
+        return "ogg"
+    if head[:4] == b"fLaC":
+        return "flac"
+    if head[4:8] == b"ftyp":
+        return "mp4"
+    if head[:3] == b"ID3" or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return "mp3"
+    raise DecodeError("Unrecognised audio format. Send WAV, MP3, OGG, WebM, FLAC or MP4/M4A audio, or raw 16-bit PCM "
+                      "with an audio/l16 or audio/pcm content type.")
+
+
+def resample(audio, orig_sr, target_sr=SAMPLE_RATE):
+    if orig_sr == target_sr or audio.size == 0:
+        return audio.astype(np.float32, copy=False)
+    with metrics.timed("resample"):
+        target_len = int(round(audio.size * target_sr / orig_sr))
+        positions = np.arange(target_len, dtype=np.float64) * (orig_sr / target_sr)
+        return np.interp(positions, np.arange(audio.size), audio).astype(np.float32)
+
+
+class LinearResampler:
+    def __init__(self, orig_sr, target_sr=SAMPLE_RATE):
+        self.step = orig_sr / target_sr
+        self.passthrough = orig_sr == target_sr
+        self._tail = None
+        self._pos = 0.0
+
+    def process(self, block):
+        if self.passthrough or block.size == 0:
+            return block.astype(np.float32, copy=False)
+        with metrics.timed("resample"):
+            data = block if self._tail is None else np.concatenate([self._tail, block])
+            last = data.size - 1
+            if last < self._pos:
+                self._tail = data[-1:]
+                self._pos -= data.size - 1
+                return np.zeros(0, dtype=np.float32)
+            count = int(np.floor((last - self._pos) / self.step)) + 1
+            positions = self._pos + np.arange(count) * self.step
+            out = np.interp(positions, np.arange(data.size), data).astype(np.float32)
+            self._pos = self._pos + count * self.step - last
+            self._tail = data[-1:]
+            return out
+
+
+def pcm_to_float(data, sample_width=2, channels=1, float_format=False):
+    usable = len(data) - len(data) % (sample_width * channels)
+    view = memoryview(data)[:usable]
+    if float_format and sample_width == 4:
+        samples = np.frombuffer(view, dtype="<f4")
+    elif sample_width == 2:
+        samples = np.frombuffer(view, dtype="<i2").astype(np.float32) / 32768.0
+    elif sample_width == 4:
+        samples = np.frombuffer(view, dtype="<i4").astype(np.float32) / 2147483648.0
+    elif sample_width == 1:
+        samples = (np.frombuffer(view, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif sample_width == 3:
+        raw = np.frombuffer(view, dtype=np.uint8).reshape(-1, 3)
+        ints = (raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8) | (raw[:, 2].astype(np.int32) << 16))
+        samples = ((ints << 8) >> 8).astype(np.float32) / 8388608.0
+    else:
+        raise DecodeError(f"Unsupported sample width: {sample_width}")
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples.astype(np.float32, copy=False)
+
+
+def parse_wav_header(data):
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise DecodeError("Not a RIFF/WAVE file.")
+    offset = 12
+    params = None
+    while offset + 8 <= len(data):
+        chunk_id = bytes(data[offset:offset + 4])
+        chunk_size = struct.unpack_from("<I", data, offset + 4)[0]
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            if body + 16 > len(data):
+                return None
+            fmt_tag, channels, rate, _, _, bits = struct.unpack_from("<HHIIHH", data, body)
+            if fmt_tag == WAVE_FORMAT_EXTENSIBLE and chunk_size >= 26 and body + 26 <= len(data):
+                fmt_tag = struct.unpack_from("<H", data, body + 24)[0]
+            if fmt_tag not in (WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT):
+                raise DecodeError(f"Unsupported WAV encoding: {fmt_tag}")
+            params = {"channels": channels, "sample_rate": rate, "sample_width": bits // 8,
+                      "float_format": fmt_tag == WAVE_FORMAT_IEEE_FLOAT}
+        elif chunk_id == b"data":
+            if params is None:
+                raise DecodeError("WAV data chunk appears before fmt chunk.")
+            return params, body, chunk_size
+        offset = body + chunk_size + (chunk_size & 1)
+    return None
+
+
+def decode_wav_bytes(data, target_sr=SAMPLE_RATE):
+    header = parse_wav_header(data)
+    if header is None:
+        raise DecodeError("Truncated WAV header.")
+    params, start, size = header
+    end = len(data) if size in (0, 0xFFFFFFFF) else min(len(data), start + size)
+    samples = pcm_to_float(memoryview(data)[start:end], params["sample_width"], params["channels"],
+                           params["float_format"])
+    return resample(samples, params["sample_rate"], target_sr)
+
+
+def ffmpeg_available():
+    return shutil.which("ffmpeg") is not None
+
+
+# ffmpeg demuxes a single container from stdin and exits at its end, so one long-lived process cannot be reset
+# between uploads. Each upload gets its own process, fed and read concurrently so decoding still streams.
+class FFmpegStreamDecoder:
+    def __init__(self, target_sr=SAMPLE_RATE):
+        if not ffmpeg_available():
+            raise DecodeError("ffmpeg is required to decode compressed audio but was not found.")
+        self.process = subprocess.Popen(
+            ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+             "-f", "s16le", "-ac", "1", "-ar", str(target_sr), "pipe:1"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        self._writer = None
+        self._write_error = None
+
+    def _feed(self, chunks):
+        try:
+            for data in chunks:
+                self.process.stdin.write(data)
+        except (BrokenPipeError, OSError) as e:
+            self._write_error = e
+        finally:
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+
+    def decode(self, chunks, block_bytes=CHUNK_BYTES):
+        self._writer = threading.Thread(target=self._feed, args=(chunks,), daemon=True)
+        self._writer.start()
+        remainder = b""
+        complete = False
+        try:
+            while True:
+                data = self.process.stdout.read(block_bytes)
+                if not data:
+                    complete = True
+                    break
+                data = remainder + data
+                usable = len(data) - len(data) % 2
+                remainder = data[usable:]
+                if usable:
+                    yield np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768.0
+        finally:
+            self.close(complete)
+
+    def close(self, complete=True):
+        killed = False
+        try:
+            self.process.wait(timeout=FFMPEG_EXIT_TIMEOUT if complete else 0)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+            killed = True
+        self.process.stdout.close()
+        if self._writer is not None:
+            self._writer.join(timeout=5)
+        message = self.process.stderr.read().decode("utf-8", "replace").strip()
+        self.process.stderr.close()
+        if complete and not killed and self.process.returncode != 0:
+            raise DecodeError(f"ffmpeg failed: {message or self.process.returncode}")
+
+
+def iter_decoded(reader, fmt, target_sr=SAMPLE_RATE, raw_sample_rate=SAMPLE_RATE, raw_channels=1):
+    if fmt == "wav":
+        buffer = bytearray()
+        header = None
+        for data in reader.chunks():
+            buffer += data
+            header = parse_wav_header(buffer)
+            if header is not None:
+                break
+        if header is None:
+            raise DecodeError("Truncated WAV header.")
+        params, start, size = header
+        frame = params["sample_width"] * params["channels"]
+        remaining = None if size in (0, 0xFFFFFFFF) else size
+        resampler = LinearResampler(params["sample_rate"], target_sr)
+        carry = b""
+        for data in _chain([bytes(buffer[start:])], reader.chunks()):
+            if remaining is not None:
+                data = data[:remaining]
+                remaining -= len(data)
+            data = carry + data
+            usable = len(data) - len(data) % frame
+            carry = data[usable:]
+            if usable:
+                yield resampler.process(pcm_to_float(data[:usable], params["sample_width"], params["channels"],
+                                                     params["float_format"]))
+            if remaining == 0:
+                return
+        return
+
+    if fmt == "raw":
+        resampler = LinearResampler(raw_sample_rate, target_sr)
+        carry = b""
+        for data in reader.chunks():
+            data = carry + data
+            usable = len(data) - len(data) % (2 * raw_channels)
+            carry = data[usable:]
+            if usable:
+                yield resampler.process(pcm_to_float(data[:usable], 2, raw_channels))
+        return
+
+    decoder = FFmpegStreamDecoder(target_sr)
+    yield from decoder.decode(reader.chunks())
+
+
+def _chain(first, rest):
+    for data in first:
+        if data:
+            yield data
+    yield from rest
+
+
+def decode_reader(reader, fmt, target_sr=SAMPLE_RATE, raw_sample_rate=SAMPLE_RATE, raw_channels=1):
+    if fmt in ("wav", "raw"):
+        return decode_bytes(reader.read_all(), fmt, target_sr, raw_sample_rate, raw_channels)
+    return _decode_compressed(reader.chunks(), target_sr)
+
+
+def decode_bytes(data, fmt, target_sr=SAMPLE_RATE, raw_sample_rate=SAMPLE_RATE, raw_channels=1):
+    if fmt == "wav":
+        return decode_wav_bytes(data, target_sr)
+    if fmt == "raw":
+        samples = pcm_to_float(data, 2, raw_channels)
+        return resample(samples, raw_sample_rate, target_sr)
+    view = memoryview(data)
+    return _decode_compressed((view[i:i + CHUNK_BYTES] for i in range(0, len(view), CHUNK_BYTES)), target_sr)
+
+
+def _decode_compressed(chunks, target_sr):
+    blocks = list(FFmpegStreamDecoder(target_sr).decode(chunks))
+    if not blocks:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(blocks)
+
+
+def decode_file(path, target_sr=SAMPLE_RATE):
+    with open(path, "rb") as f:
+        reader = UploadReader(f)
+        return decode_reader(reader, sniff_format(reader.head, filename=path), target_sr)
@@ -0,0 +1,48 @@
+import argparse
+import os
+
+import numpy as np
+
+from backends import MODEL_CANDIDATES, export_keras_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export .h5 models and scaler files to the compact NumPy backend format.")
+    parser.add_argument("models", nargs="*", help="Keras .h5 files to export (default: every known model in the repo)")
+    parser.add_argument("--scaler-mean", default="scaler_mean.npy")
+    parser.add_argument("--scaler-scale", default="scaler_scale.npy")
+    parser.add_argument("--out-dir", default=None, help="Directory for the .npz files (default: next to each model)")
+    args = parser.parse_args()
+
+    from tensorflow.keras.models import load_model
+
+    models = args.models or [path for path in MODEL_CANDIDATES if os.path.exists(path)]
+    if not models:
+        print("No models found to export.")
+        return
+
+    scaler_mean = np.load(args.scaler_mean) if os.path.exists(args.scaler_mean) else None
+    scaler_scale = np.load(args.scaler_scale) if os.path.exists(args.scaler_scale) else None
+
+    for model_path in models:
+        model = load_model(model_path, compile=False)
+        base = os.path.splitext(os.path.basename(model_path))[0] + ".npz"
+        out_path = os.path.join(args.out_dir or os.path.dirname(model_path), base)
+
+        expected = tuple(model.input_shape[1:])
+        use_scaler = scaler_mean is not None and expected[-1] == scaler_mean.shape[0]
+        try:
+            export_keras_model(
+                model,
+                out_path,
+                scaler_mean if use_scaler else None,
+                scaler_scale if use_scaler else None
+            )
+        except ValueError as e:
+            print(f"Skipping {model_path}: {e}")
+            continue
+        print(f"Exported {model_path} -> {out_path} ({os.path.getsize(out_path) / 1024:.1f} KB, input {expected})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+from functools import lru_cache
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy import fft as sp_fft
+
+SAMPLE_RATE = 22050
+DURATION = 3
+N_MFCC = 13
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MELS = 128
+TOP_DB = 80.0
+AMIN = 1e-10
+DELTA_WIDTH = 9
+MAX_TIMESTEPS = 130
+INPUT_FEATURES = N_MFCC * 3
+WINDOW_SAMPLES = SAMPLE_RATE * DURATION
+
+
+@lru_cache(maxsize=None)
+def hann_window():
+    n = np.arange(N_FFT, dtype=np.float64)
+    return (0.5 - 0.5 * np.cos(2.0 * np.pi * n / N_FFT)).astype(np.float32)
+
+
+def _hz_to_mel(freqs):
+    freqs = np.asarray(freqs, dtype=np.float64)
+    f_sp = 200.0 / 3
+    min_log_hz = 1000.0
+    min_log_mel = min_log_hz / f_sp
+    logstep = np.log(6.4) / 27.0
+    mels = freqs / f_sp
+    log_region = freqs >= min_log_hz
+    mels[log_region] = min_log_mel + np.log(freqs[log_region] / min_log_hz) / logstep
+    return mels
+
+
+def _mel_to_hz(mels):
+    mels = np.asarray(mels, dtype=np.float64)
+    f_sp = 200.0 / 3
+    min_log_hz = 1000.0
+    min_log_mel = min_log_hz / f_sp
+    logstep = np.log(6.4) / 27.0
+    freqs = f_sp * mels
+    log_region = mels >= min_log_mel
+    freqs[log_region] = min_log_hz * np.exp(logstep * (mels[log_region] - min_log_mel))
+    return freqs
+
+
+@lru_cache(maxsize=None)
+def mel_basis():
+    fft_freqs = np.linspace(0, SAMPLE_RATE / 2.0, 1 + N_FFT // 2)
+    mel_edges = _mel_to_hz(np.linspace(_hz_to_mel([0.0])[0], _hz_to_mel([SAMPLE_RATE / 2.0])[0], N_MELS + 2))
+    widths = np.diff(mel_edges)
+    ramps = np.subtract.outer(mel_edges, fft_freqs)
+    lower = -ramps[:-2] / widths[:-1, None]
+    upper = ramps[2:] / widths[1:, None]
+    weights = np.maximum(0.0, np.minimum(lower, upper))
+    weights *= (2.0 / (mel_edges[2:] - mel_edges[:-2]))[:, None]
+    return weights.astype(np.float32)
+
+
+@lru_cache(maxsize=None)
+def mel_basis_t():
+    return np.ascontiguousarray(mel_basis().T)
+
+
+@lru_cache(maxsize=None)
+def dct_matrix():
+    n = np.arange(N_MELS, dtype=np.float64)
+    k = np.arange(N_MFCC, dtype=np.float64)[:, None]
+    basis = np.cos(np.pi * k * (2.0 * n + 1.0) / (2.0 * N_MELS)) * np.sqrt(2.0 / N_MELS)
+    basis[0] *= np.sqrt(0.5)
+    return np.ascontiguousarray(basis.T.astype(np.float32))
+
+
+def frame_count(n_samples):
+    return 1 + n_samples // HOP_LENGTH
+
+
+def mel_frames(frames):
+    spectrum = sp_fft.rfft(frames * hann_window(), axis=-1, workers=-1)
+    power = spectrum.real ** 2 + spectrum.imag ** 2
+    return power @ mel_basis_t()
+
+
+def edge_frames(audio, indices):
+    frames = np.zeros((len(indices), N_FFT), dtype=np.float32)
+    for row, index in enumerate(indices):
+        start = index * HOP_LENGTH - N_FFT // 2
+        lo, hi = max(start, 0), min(start + N_FFT, audio.size)
+        if hi > lo:
+            frames[row, lo - start:hi - start] = audio[lo:hi]
+    return frames
+
+
+def interior_range(n_samples):
+    first = -(-(N_FFT // 2) // HOP_LENGTH)
+    last = (n_samples - N_FFT // 2) // HOP_LENGTH
+    return first, min(last, frame_count(n_samples) - 1)
+
+
+def padded_frames(audio):
+    padded = np.pad(audio, N_FFT // 2)
+    return sliding_window_view(padded, N_FFT)[::HOP_LENGTH]
+
+
+def mel_spectrogram(audio):
+    return mel_frames(padded_frames(audio))
+
+
+def log_mel(mel, floor_ref=None):
+    log_spec = 10.0 * np.log10(np.maximum(AMIN, mel))
+    ref = log_spec.max() if floor_ref is None else floor_ref
+    return np.maximum(log_spec, ref - TOP_DB)
+
+
+@lru_cache(maxsize=None)
+def savgol_rows(order):
+    positions = np.arange(DELTA_WIDTH, dtype=np.float64)
+    rows = np.empty((DELTA_WIDTH, DELTA_WIDTH), dtype=np.float64)
+    for at in range(DELTA_WIDTH):
+        vander = np.vander(positions - at, order + 1, increasing=True)
+        rows[at] = np.linalg.pinv(vander)[order] * np.prod(np.arange(1, order + 1))
+    return rows.astype(np.float32)
+
+
+def savgol_delta(mfcc, order):
+    half = DELTA_WIDTH // 2
+    rows = savgol_rows(order)
+    out = np.empty_like(mfcc)
+    windows = sliding_window_view(mfcc, DELTA_WIDTH, axis=-2)
+    out[..., half:-half, :] = windows @ rows[half]
+    out[..., :half, :] = np.einsum("ew,...wc->...ec", rows[:half], mfcc[..., :DELTA_WIDTH, :])
+    out[..., -half:, :] = np.einsum("ew,...wc->...ec", rows[half + 1:], mfcc[..., -DELTA_WIDTH:, :])
+    return out
+
+
+def deltas(mfcc):
+    return savgol_delta(mfcc, 1), savgol_delta(mfcc, 2)
+
+
+def mel_to_features(mel):
+    mfcc = log_mel(mel) @ dct_matrix()
+    delta, delta2 = deltas(mfcc)
+    return np.hstack([mfcc, delta, delta2]).astype(np.float32)
+
+
+def compute_features(audio):
+    return mel_to_features(mel_spectrogram(np.asarray(audio, dtype=np.float32)))
+
+
+def extract_batch(clips, out=None, max_timesteps=MAX_TIMESTEPS):
+    clips = [np.asarray(clip, dtype=np.float32).reshape(-1) for clip in clips]
+    if out is None:
+        out = np.zeros((len(clips), max_timesteps, INPUT_FEATURES), dtype=np.float32)
+    else:
+        out[:len(clips)] = 0.0
+    valid = np.zeros(len(clips), dtype=bool)
+    if not clips:
+        return out, valid
+
+    counts = np.array([frame_count(clip.size) for clip in clips])
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    frames = np.empty((offsets[-1], N_FFT), dtype=np.float32)
+    for i, clip in enumerate(clips):
+        frames[offsets[i]:offsets[i + 1]] = padded_frames(clip)
+
+    mel = mel_frames(frames)
+    log_spec = 10.0 * np.log10(np.maximum(AMIN, mel))
+    clip_max = np.maximum.reduceat(log_spec.max(axis=1), offsets[:-1])
+    log_spec = np.maximum(log_spec, np.repeat(clip_max - TOP_DB, counts)[:, None])
+    mfcc = log_spec @ dct_matrix()
+
+    keep = np.minimum(counts, max_timesteps + DELTA_WIDTH // 2)
+    groups = {}
+    for i in range(len(clips)):
+        if counts[i] >= DELTA_WIDTH:
+            groups.setdefault(keep[i], []).append(i)
+
+    for length, members in groups.items():
+        stacked = np.stack([mfcc[offsets[i]:offsets[i] + length] for i in members])
+        delta, delta2 = deltas(stacked)
+        steps = min(length, max_timesteps)
+        rows = np.asarray(members)
+        out[rows, :steps, :N_MFCC] = stacked[:, :steps]
+        out[rows, :steps, N_MFCC:2 * N_MFCC] = delta[:, :steps]
+        out[rows, :steps, 2 * N_MFCC:] = delta2[:, :steps]
+        valid[rows] = True
+
+    return out, valid
+
+
+class StreamingFeatureExtractor:
+    def __init__(self, hop_seconds=0.5, window_samples=WINDOW_SAMPLES):
+        hop_frames = max(1, int(round(hop_seconds * SAMPLE_RATE / HOP_LENGTH)))
+        self.hop_samples = hop_frames * HOP_LENGTH
+        self.window_samples = window_samples
+        self._cache = {}
+        self.frames_computed = 0
+        self.frames_reused = 0
+
+    def reset(self):
+        self._cache.clear()
+
+    def window_features(self, window, start):
+        window = np.asarray(window, dtype=np.float32)
+        if window.size != self.window_samples or start % HOP_LENGTH != 0:
+            self.reset()
+            self.frames_computed += frame_count(window.size)
+            return compute_features(window)
+
+        base = start // HOP_LENGTH
+        total = frame_count(window.size)
+        first, last = interior_range(window.size)
+        mel = np.empty((total, N_MELS), dtype=np.float32)
+
+        missing = []
+        for k in range(first, last + 1):
+            cached = self._cache.get(base + k)
+            if cached is None:
+                missing.append(k)
+            else:
+                mel[k] = cached
+        if missing:
+            starts = np.asarray(missing) * HOP_LENGTH - N_FFT // 2
+            fresh = mel_frames(sliding_window_view(window, N_FFT)[starts])
+            mel[missing] = fresh
+            for k, column in zip(missing, fresh):
+                self._cache[base + k] = column
+
+        edges = [k for k in range(total) if k < first or k > last]
+        mel[edges] = mel_frames(edge_frames(window, edges))
+
+        for key in [key for key in self._cache if key < base + first]:
+            del self._cache[key]
+
+        self.frames_computed += len(missing) + len(edges)
+        self.frames_reused += (last - first + 1) - len(missing)
+        return mel_to_features(mel)
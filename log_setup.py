@@ -0,0 +1,187 @@
+import atexit
+import collections
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+
+LOG_FILE = os.environ.get("LOG_FILE", "server.log")
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+LOG_MAX_BYTES = int(float(os.environ.get("LOG_MAX_MB", "10")) * 1024 * 1024)
+LOG_BACKUPS = int(os.environ.get("LOG_BACKUPS", "5"))
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+LOG_CONSOLE_LEVEL = os.environ.get("LOG_CONSOLE_LEVEL", "INFO").upper()
+ACCESS_LOG_SAMPLE = os.environ.get(
+    "ACCESS_LOG_SAMPLE", "/is-recording=0.01,/get-latest-audio=0.1,/metrics=0,/static=0.05,/sessions=0.1"
+)
+ACCESS_LOG_SLOW_MS = float(os.environ.get("ACCESS_LOG_SLOW_MS", "1000"))
+WORKER_LOG_BUFFER = 1000
+TEXT_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+access_logger = logging.getLogger("access")
+_listener = None
+_handler = None
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.processName != "MainProcess":
+            entry["process"] = record.process
+        entry.update({key: value for key, value in vars(record).items() if key not in RECORD_FIELDS})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BufferedLogHandler(logging.Handler):
+    def __init__(self, capacity=WORKER_LOG_BUFFER):
+        super().__init__()
+        self.records = collections.deque(maxlen=capacity)
+
+    def emit(self, record):
+        entry = dict(vars(record), msg=record.getMessage(), args=None, exc_info=None)
+        if record.exc_info:
+            entry["exc_text"] = logging.Formatter().formatException(record.exc_info)
+        self.records.append(entry)
+
+    def drain(self):
+        entries = []
+        while self.records:
+            entries.append(self.records.popleft())
+        return entries
+
+
+class AccessSampler:
+    def __init__(self, spec=ACCESS_LOG_SAMPLE, slow_ms=ACCESS_LOG_SLOW_MS):
+        self.rates = {}
+        for part in filter(None, (item.strip() for item in spec.split(","))):
+            prefix, _, rate = part.partition("=")
+            self.rates[prefix.strip()] = max(0.0, min(1.0, float(rate)))
+        self.default = self.rates.pop("default", 1.0)
+        self.slow_ms = slow_ms
+        self.counts = collections.Counter()
+
+    def rate(self, path):
+        matches = [prefix for prefix in self.rates if path == prefix or path.startswith(prefix.rstrip("/") + "/")]
+        return self.rates[max(matches, key=len)] if matches else self.default
+
+    def sample(self, path, status, duration_ms):
+        if status >= 500 or duration_ms >= self.slow_ms:
+            return 1.0
+        rate = self.rate(path)
+        return rate if rate >= 1.0 or random.random() < rate else None
+
+
+access_sampler = AccessSampler()
+
+
+def log_access(method, path, status, duration_ms, size=None, client=None, route=None):
+    if not access_logger.isEnabledFor(logging.INFO):
+        return
+    rate = access_sampler.sample(path, status, duration_ms)
+    access_sampler.counts["logged" if rate else "skipped"] += 1
+    if not rate:
+        return
+    access_logger.info(
+        "%s %s %s %.1fms", method, path, status, duration_ms,
+        extra={"method": method, "path": path, "route": route, "status": status,
+               "duration_ms": round(duration_ms, 2), "bytes": size, "client": client, "sample_rate": rate}
+    )
+
+
+def setup_logging(path=LOG_FILE, level=LOG_LEVEL, fmt=LOG_FORMAT):
+    global _listener, _handler
+    with _lock:
+        if _listener is not None:
+            return _handler
+        console = logging.StreamHandler()
+        console.setLevel(LOG_CONSOLE_LEVEL)
+        console.setFormatter(logging.Formatter(TEXT_FORMAT, DATE_FORMAT))
+        console.addFilter(lambda record: record.name != access_logger.name)
+        handlers = [console]
+        if path:
+            file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS,
+                                                                encoding="utf-8")
+            file_handler.setLevel(level)
+            file_handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT,
+                                                                                               DATE_FORMAT))
+            handlers.insert(0, file_handler)
+
+        _handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+        root = logging.getLogger()
+        root.handlers[:] = [_handler]
+        root.setLevel(level)
+        _listener = logging.handlers.QueueListener(_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+        return _handler
+
+
+def stop_logging():
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
+
+
+def buffer_logs(level=LOG_LEVEL):
+    handler = BufferedLogHandler()
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    return handler
+
+
+def replay(entries):
+    for entry in entries:
+        record = logging.makeLogRecord(entry)
+        logger = logging.getLogger(record.name)
+        if logger.isEnabledFor(record.levelno):
+            logger.handle(record)
+
+
+def stats():
+    return {
+        "queued": _handler.queue.qsize() if _handler is not None else 0,
+        "dropped": _handler.dropped if _handler is not None else 0,
+        "access_logged": access_sampler.counts["logged"],
+        "access_skipped": access_sampler.counts["skipped"],
+    }
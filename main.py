@@ -1,173 +1,566 @@
-from flask import Flask, jsonify, send_file, render_template, request
-import logging
+import time
+SERVER_START = time.perf_counter()
+
+from flask import Flask, Response, jsonify, send_file, render_template, request, stream_with_context
 from flask_cors import CORS
 import os
 import audio_processor
+import decoding
+import log_setup
+import metrics
+import recorder
+import vad
+from analysis import LongFileAnalyzer
+from batcher import InferenceBatcher
+from recordings_index import RecordingsIndex
+from result_cache import ResultCache, content_key
+from sessions import CLOSED, WINDOW_SAMPLES, SessionManager
+from worker_pool import InferenceWorkerPool
 import threading
 import multiprocessing
 import uuid
-from flask_sock import Sock
+from flask_sock import Sock, ConnectionClosed
+from werkzeug.serving import WSGIRequestHandler, is_running_from_reloader
 import json
+import mimetypes
+import queue
+from werkzeug.utils import safe_join
 
 multiprocessing.set_start_method("spawn", force=True)
 
+RELOADER_PARENT = __name__ == "__main__" and not is_running_from_reloader()
+log_setup.setup_logging(path=None if RELOADER_PARENT else log_setup.LOG_FILE)
+
 app = Flask(__name__)
 CORS(app)
 sock = Sock(app)
 
-logging.basicConfig(
-    filename="server.log",
-    level=logging.DEBUG,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
-
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 STOP_FLAG_PATH = os.path.join(BASE_DIR, "stop_flag.txt")
 
-realtime_detection_process = None
-realtime_detection_should_run = multiprocessing.Event()
-prediction_queue = multiprocessing.Queue()
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "32"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", "5"))
+REALTIME_WORKERS = int(os.environ.get("REALTIME_WORKERS", "2"))
+UPLOAD_INFERENCE = os.environ.get("UPLOAD_INFERENCE", "local")
+REALTIME_HOP_SECONDS = float(os.environ.get("REALTIME_HOP_SECONDS", "0.5"))
+STREAM_CONFIG_TIMEOUT = 60
+WS_IDLE_TIMEOUT = 5
+SAVE_UPLOADS = os.environ.get("SAVE_UPLOADS", "1") == "1"
+ANALYZE_MAX_IN_FLIGHT = int(os.environ.get("ANALYZE_MAX_IN_FLIGHT", "64"))
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", "3600"))
+RESULT_CACHE_DB = os.environ.get("RESULT_CACHE_DB", "")
+RESULT_CACHE_DB_ROWS = int(os.environ.get("RESULT_CACHE_DB_ROWS", "100000"))
+RECORDINGS_DB = os.environ.get("RECORDINGS_DB", "")
+RECORDINGS_MAX_AGE_HOURS = float(os.environ.get("RECORDINGS_MAX_AGE_HOURS", "168"))
+RECORDINGS_MAX_MB = float(os.environ.get("RECORDINGS_MAX_MB", "1024"))
+RECORDINGS_SWEEP_SECONDS = float(os.environ.get("RECORDINGS_SWEEP_SECONDS", "300"))
+PROFILER_ON_START = os.environ.get("PROFILER", "0") == "1"
+MAX_RAW_SAMPLE_RATE = 384000
+MAX_RAW_CHANNELS = 32
+
+worker_pool = InferenceWorkerPool(
+    num_workers=REALTIME_WORKERS,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait_ms=BATCH_MAX_WAIT_MS
+)
+inference_batcher = InferenceBatcher(
+    worker_pool.predict if UPLOAD_INFERENCE == "pool" else audio_processor.predict_batch,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait_ms=BATCH_MAX_WAIT_MS
+)
+recordings = RecordingsIndex(
+    audio_processor.RECORDINGS_DIR,
+    db_path=RECORDINGS_DB or None,
+    max_age_seconds=RECORDINGS_MAX_AGE_HOURS * 3600 or None,
+    max_total_bytes=int(RECORDINGS_MAX_MB * 1024 * 1024) or None
+)
+session_manager = SessionManager(worker_pool, recordings)
+
+result_cache = ResultCache(
+    audio_processor.model_files,
+    max_entries=RESULT_CACHE_SIZE,
+    ttl=RESULT_CACHE_TTL,
+    db_path=RESULT_CACHE_DB or None,
+    max_db_rows=RESULT_CACHE_DB_ROWS
+)
+
+metrics.register(inference_batcher.queue_wait)
+metrics.register(inference_batcher.batch_sizes)
+metrics.register_gauge("sessions_active", "Active realtime sessions", session_manager.active_count)
+metrics.register_gauge("session_dropped_results", "Realtime results dropped by active sessions",
+                       lambda: sum(session_manager.dropped_results().values()))
+metrics.register_gauge("inference_workers_alive", "Live inference worker processes", worker_pool.alive_workers)
+metrics.register_gauge("inference_workers_rss_mb", "Resident memory of all inference workers", worker_pool.memory_mb)
+metrics.register_gauge("inference_workers_pss_mb", "Proportional set size of all inference workers, shared pages split",
+                       lambda: worker_pool.memory_mb("pss_mb"))
+metrics.register_gauge("inference_batcher_queued", "Windows waiting for the upload batcher",
+                       lambda: inference_batcher.stats()["queued"])
+metrics.register_gauge("result_cache_hits_total", "Result cache hits",
+                       lambda: result_cache.counters["memory_hits"] + result_cache.counters["disk_hits"], kind="counter")
+metrics.register_gauge("result_cache_misses_total", "Result cache misses",
+                       lambda: result_cache.counters["misses"], kind="counter")
+metrics.register_gauge("recordings_bytes", "Bytes held in the recordings directory",
+                       lambda: recordings.stats()["total_bytes"])
+metrics.register_gauge("log_queue_depth", "Log records waiting for the background writer",
+                       lambda: log_setup.stats()["queued"])
+metrics.register_gauge("log_records_dropped_total", "Log records dropped because the log queue was full",
+                       lambda: log_setup.stats()["dropped"], kind="counter")
 
-log = logging.getLogger('werkzeug')
-log.setLevel(logging.DEBUG)
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, code="-", size="-"):
+        pass
+
+@app.before_request
+def start_timer():
+    request.environ["brainrot.started"] = time.perf_counter()
+
+@app.after_request
+def log_access(response):
+    started = request.environ.get("brainrot.started")
+    if started is not None:
+        log_setup.log_access(request.method, request.path, response.status_code,
+                             (time.perf_counter() - started) * 1000.0, response.content_length, request.remote_addr,
+                             request.url_rule.rule if request.url_rule else None)
+    return response
 
 @app.route('/')
 def index():
     return render_template("index.html")
 
+def upload_source():
+    audio = request.files.get("audio")
+    if audio:
+        return audio.stream, audio.mimetype, audio.filename
+    if request.mimetype.startswith("audio/") or request.mimetype == "application/octet-stream":
+        return request.stream, request.mimetype, None
+    return None, None, None
+
+def request_client_id(headers=None, args=None):
+    headers = request.headers if headers is None else headers
+    args = request.args if args is None else args
+    return headers.get("X-Client-Id") or args.get("client_id") or None
+
+def raw_pcm_params(args=None, mimetype_params=None):
+    args = request.args if args is None else args
+    mimetype_params = request.mimetype_params if mimetype_params is None else mimetype_params
+    rate = args.get("sample_rate") or mimetype_params.get("rate")
+    channels = args.get("channels") or mimetype_params.get("channels")
+    try:
+        sample_rate, channel_count = int(rate or audio_processor.SAMPLE_RATE), int(channels or 1)
+    except ValueError:
+        raise ValueError(f"sample_rate and channels must be integers, got {rate!r} and {channels!r}.") from None
+    if not 0 < sample_rate <= MAX_RAW_SAMPLE_RATE:
+        raise ValueError(f"sample_rate must be between 1 and {MAX_RAW_SAMPLE_RATE}.")
+    if not 0 < channel_count <= MAX_RAW_CHANNELS:
+        raise ValueError(f"channels must be between 1 and {MAX_RAW_CHANNELS}.")
+    return sample_rate, channel_count
+
+def parse_hop_seconds(value, window_seconds=audio_processor.DURATION):
+    if value in (None, ""):
+        return None
+    hop_seconds = float(value)
+    if not 0 < hop_seconds <= window_seconds or int(hop_seconds * audio_processor.SAMPLE_RATE) < 1:
+        raise ValueError(f"hop_seconds must be greater than 0 and at most {window_seconds} seconds.")
+    return hop_seconds
+
+def open_upload(stream, mimetype, filename):
+    reader = decoding.UploadReader(stream)
+    fmt = decoding.sniff_format(reader.head, mimetype, filename)
+    saved_name = None
+    if SAVE_UPLOADS:
+        saved_name = f"{uuid.uuid4()}{decoding.EXTENSIONS[fmt]}"
+        reader.tee = open(os.path.join(audio_processor.RECORDINGS_DIR, saved_name), "wb")
+    return reader, fmt, saved_name
+
+def close_upload(reader, saved_name, keep=True, client_id=None):
+    if reader.tee is not None:
+        reader.tee.close()
+    if saved_name and not keep:
+        os.remove(os.path.join(audio_processor.RECORDINGS_DIR, saved_name))
+    elif saved_name:
+        recordings.add(saved_name, "upload", client_id=client_id, complete=True,
+                       size=os.path.getsize(os.path.join(audio_processor.RECORDINGS_DIR, saved_name)))
+
+def score_upload(stream, mimetype, filename, sample_rate, channels, client_id=None):
+    reader, fmt, saved_name = open_upload(stream, mimetype, filename)
+    try:
+        with metrics.timed("upload_read"):
+            data = reader.read_all()
+        cache_key = content_key(data, fmt, sample_rate, channels)
+        cached = result_cache.get(cache_key)
+        if cached is None:
+            with metrics.timed("decode"):
+                audio = decoding.decode_bytes(data, fmt, audio_processor.SAMPLE_RATE, sample_rate, channels)
+    except Exception:
+        close_upload(reader, saved_name, keep=False)
+        raise
+    close_upload(reader, saved_name, client_id=client_id)
+    if cached is not None:
+        if saved_name:
+            recordings.update(saved_name, score=round(cached["score"], 3), label=cached["label"])
+        app.logger.info(f"Uploaded audio served from cache ({fmt}): score={cached['score']:.3f}, label={cached['label']}")
+        return {"score": round(cached["score"], 3), "label": cached["label"], "cached": True}
+    if not vad.check(vad.VoiceActivityDetector(), audio[:WINDOW_SAMPLES], "upload"):
+        if saved_name:
+            recordings.update(saved_name, score=0.0, label=vad.NO_SPEECH,
+                              duration=round(len(audio) / audio_processor.SAMPLE_RATE, 3))
+        app.logger.info(f"Uploaded audio has no speech ({fmt}). Inference skipped.")
+        return dict(vad.no_speech_result(), cached=False)
+    features = audio_processor.extract_features(audio)
+    score = inference_batcher.predict(features)
+    label = "brainrot" if score > audio_processor.THRESHOLD else "normal"
+    if features is not None:
+        result_cache.put(cache_key, score, label)
+    if saved_name:
+        recordings.update(saved_name, score=round(score, 3), label=label,
+                          duration=round(len(audio) / audio_processor.SAMPLE_RATE, 3))
+    app.logger.info(f"Uploaded audio processed ({fmt}): score={score:.3f}, label={label}")
+    return {"score": round(score, 3), "label": label, "cached": False}
+
+def analysis_records(upload, sample_rate, channels, hop_seconds=None, client_id=None):
+    reader, fmt, saved_name = upload
+    analyzer = LongFileAnalyzer(worker_pool, hop_seconds=hop_seconds, max_in_flight=ANALYZE_MAX_IN_FLIGHT)
+    keep = True
+    try:
+        blocks = decoding.iter_decoded(reader, fmt, audio_processor.SAMPLE_RATE, sample_rate, channels)
+        for record in analyzer.run(blocks):
+            yield json.dumps(record) + "\n"
+    except decoding.DecodeError as e:
+        keep = False
+        app.logger.warning(f"Could not decode upload for analysis: {e}")
+        yield json.dumps({"error": f"Could not decode audio: {e}"}) + "\n"
+    except audio_processor.ModelUnavailable as e:
+        app.logger.error(f"Analysis stopped: {e}")
+        yield json.dumps({"error": f"Model unavailable: {e}"}) + "\n"
+    except Exception as e:
+        app.logger.error(f"Error in /analyze: {e}", exc_info=True)
+        yield json.dumps({"error": f"Server error: {str(e)}"}) + "\n"
+    finally:
+        close_upload(reader, saved_name, keep=keep, client_id=client_id)
+
 @app.route("/upload", methods=["POST"])
 def upload_audio():
     try:
-        audio = request.files.get("audio")
-        if not audio:
+        stream, mimetype, filename = upload_source()
+        if stream is None:
             return jsonify({"error": "No audio file uploaded."}), 400
-        filename = f"{uuid.uuid4()}.webm"
-        filepath = os.path.join(audio_processor.RECORDINGS_DIR, filename)
-        audio.save(filepath)
-        with open(os.path.join(audio_processor.RECORDINGS_DIR, "latest_uploaded_audio.txt"), "w") as f:
-            f.write(filename)
-        score = audio_processor.predict_from_file(filepath)
-        label = "brainrot" if score > audio_processor.THRESHOLD else "normal"
-        app.logger.info(f"Uploaded audio processed: score={score:.3f}, label={label}")
-        return jsonify({"score": round(score, 3), "label": label})
+        try:
+            sample_rate, channels = raw_pcm_params()
+        except ValueError as e:
+            return jsonify({"error": f"Invalid PCM parameters: {e}"}), 400
+        return jsonify(score_upload(stream, mimetype, filename, sample_rate, channels, request_client_id()))
+    except decoding.DecodeError as e:
+        app.logger.warning(f"Could not decode upload: {e}")
+        return jsonify({"error": f"Could not decode audio: {e}"}), 400
+    except audio_processor.ModelUnavailable as e:
+        app.logger.error(f"Upload rejected: {e}")
+        return jsonify({"error": f"Model unavailable: {e}"}), 503
     except Exception as e:
         app.logger.error(f"Error in /upload: {e}", exc_info=True)
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
+@app.route("/analyze", methods=["POST"])
+def analyze_audio():
+    stream, mimetype, filename = upload_source()
+    if stream is None:
+        return jsonify({"error": "No audio file uploaded."}), 400
+
+    try:
+        hop_seconds = parse_hop_seconds(request.args.get("hop_seconds"))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid hop_seconds: {e}"}), 400
+    try:
+        sample_rate, channels = raw_pcm_params()
+    except ValueError as e:
+        return jsonify({"error": f"Invalid PCM parameters: {e}"}), 400
+    try:
+        audio_processor.registry.active()
+    except audio_processor.ModelUnavailable as e:
+        return jsonify({"error": f"Model unavailable: {e}"}), 503
+    try:
+        upload = open_upload(stream, mimetype, filename)
+    except decoding.DecodeError as e:
+        app.logger.warning(f"Could not decode upload for analysis: {e}")
+        return jsonify({"error": f"Could not decode audio: {e}"}), 400
+    records = analysis_records(upload, sample_rate, channels, hop_seconds=hop_seconds, client_id=request_client_id())
+    return Response(stream_with_context(records), mimetype="application/x-ndjson")
+
+def recording_file_path(filename):
+    file_path = safe_join(audio_processor.RECORDINGS_DIR, filename)
+    if file_path is None or not os.path.isfile(file_path):
+        return None
+    return file_path
+
+def download_disposition(filename, inline):
+    return f'{"inline" if inline else "attachment"}; filename="{filename}"'
+
 @app.route('/download-audio/<filename>', methods=['GET'])
 def download_audio(filename):
-    recordings_dir = audio_processor.RECORDINGS_DIR
-    file_path = os.path.join(recordings_dir, filename)
+    file_path = recording_file_path(filename)
+    if file_path is None:
+        return jsonify({"error": "File not found"}), 404
 
-    if os.path.exists(file_path):
-        try:
-            response = send_file(file_path, as_attachment=True)
-            app.logger.info(f"Downloaded file: {filename}")
-            return response
-        except Exception as e:
-            app.logger.error(f"Error handling file: {e}")
-            return jsonify({"error": str(e)}), 500
+    inline = request.args.get("inline") == "1"
+    in_progress = recorder.is_recording(file_path)
+    try:
+        if in_progress and request.range is None:
+            app.logger.info(f"Streaming in-progress recording: {filename}")
+            return Response(
+                stream_with_context(recorder.follow(file_path)),
+                mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+                headers={"Content-Disposition": download_disposition(filename, inline), "Cache-Control": "no-cache"}
+            )
+        response = send_file(file_path, as_attachment=not inline, conditional=True, etag=not in_progress,
+                             max_age=0)
+        if in_progress:
+            response.headers["Cache-Control"] = "no-cache"
+        app.logger.info(f"Downloaded file: {filename} ({response.status_code})")
+        return response
+    except Exception as e:
+        app.logger.error(f"Error handling file: {e}")
+        return jsonify({"error": str(e)}), 500
+
+def latest_audio_filename(session_id=None, client_id=None):
+    if session_id:
+        lookups = [{"session_id": session_id}]
+    elif client_id:
+        lookups = [{"kind": "realtime", "client_id": client_id}, {"kind": "upload", "client_id": client_id}]
     else:
-        return jsonify({"error": "File not found"}), 404
+        lookups = [{"kind": "realtime"}, {"kind": "upload"}]
+
+    for lookup in lookups:
+        record = recordings.latest(**lookup)
+        while record is not None and not os.path.exists(
+                os.path.join(audio_processor.RECORDINGS_DIR, record["filename"])):
+            recordings.remove(record["filename"], delete_file=False)
+            record = recordings.latest(**lookup)
+        if record is not None:
+            app.logger.info(f"Serving latest {record['kind']} audio: {record['filename']}")
+            return record["filename"]
+
+    raise FileNotFoundError("No recent audio file found.")
 
 @app.route('/get-latest-audio', methods=['GET'])
 def get_latest_audio():
     try:
-        latest_realtime_path = os.path.join(audio_processor.RECORDINGS_DIR, "latest_realtime_audio.txt")
-        latest_uploaded_path = os.path.join(audio_processor.RECORDINGS_DIR, "latest_uploaded_audio.txt")
-
-        filename = None
-        if os.path.exists(latest_realtime_path):
-            with open(latest_realtime_path, "r") as f:
-                filename = f.read().strip()
-            if os.path.exists(os.path.join(audio_processor.RECORDINGS_DIR, filename)):
-                app.logger.info(f"Serving latest real-time audio: {filename}")
-                return jsonify({"filename": filename})
-
-        if os.path.exists(latest_uploaded_path):
-            with open(latest_uploaded_path, "r") as f:
-                filename = f.read().strip()
-            if os.path.exists(os.path.join(audio_processor.RECORDINGS_DIR, filename)):
-                app.logger.info(f"Serving latest uploaded audio: {filename}")
-                return jsonify({"filename": filename})
-
-        raise FileNotFoundError("No recent audio file found.")
-
+        return jsonify({"filename": latest_audio_filename(request.args.get("session_id"), request_client_id())})
     except Exception as e:
         app.logger.error(f"Error fetching latest audio: {e}")
         return jsonify({"error": str(e)}), 404
 
+def read_stream_config(sock):
+    try:
+        message = sock.receive(timeout=STREAM_CONFIG_TIMEOUT)
+    except Exception:
+        return None
+    return parse_stream_config(message)
+
+def parse_stream_config(message):
+    if not isinstance(message, str):
+        return None
+    try:
+        config = json.loads(message)
+    except ValueError:
+        return None
+    if not isinstance(config, dict) or config.get("type") != "start":
+        return None
+    if config.get("source", "stream") == "device":
+        return config
+    if config.get("source", "stream") != "stream" or config.get("format", "pcm16") != "pcm16":
+        return None
+    return config
+
+def create_realtime_session(config, client_id=None):
+    if config.get("source") == "device":
+        return session_manager.create_session(source="device", hop_seconds=REALTIME_HOP_SECONDS,
+                                              client_id=config.get("client_id") or client_id)
+    return session_manager.create_session(
+        source="stream",
+        sample_rate=int(config.get("sample_rate", audio_processor.SAMPLE_RATE)),
+        hop_seconds=float(config.get("hop_seconds", REALTIME_HOP_SECONDS)),
+        client_id=config.get("client_id") or client_id
+    )
+
+STREAM_CONFIG_ERROR = json.dumps({"error": 'Expected {"type": "start", "format": "pcm16", "sample_rate": ...} '
+                                           'as the first message.'})
+
+def receive_audio(sock, session):
+    try:
+        while True:
+            message = sock.receive()
+            if isinstance(message, (bytes, bytearray)) and session.source == "stream":
+                session.feed(message)
+    except ConnectionClosed:
+        pass
+    except Exception as e:
+        app.logger.error(f"WebSocket receive error for session {session.session_id}: {e}")
+    finally:
+        session.close_output()
+
 @sock.route('/ws/realtime-predictions')
 def realtime_predictions(sock):
-    global realtime_detection_process
-    global realtime_detection_should_run
-    global prediction_queue
-
-    app.logger.info("WebSocket connection established for real-time predictions.")
-
-    if realtime_detection_process and realtime_detection_process.is_alive():
-        app.logger.warning("Existing real-time detection process found. Signaling it to stop.")
-        realtime_detection_should_run.clear()
-        realtime_detection_process.join(timeout=5)
-        if realtime_detection_process.is_alive():
-            app.logger.warning("Existing real-time detection process did not terminate gracefully. Terminating forcefully.")
-            realtime_detection_process.terminate()
-        realtime_detection_process = None
-        if os.path.exists(audio_processor.STOP_FLAG_FILE):
-            os.remove(audio_processor.STOP_FLAG_FILE)
-
-    realtime_detection_should_run.set()
-    if os.path.exists(audio_processor.STOP_FLAG_FILE):
-        os.remove(audio_processor.STOP_FLAG_FILE)
+    config = read_stream_config(sock)
+    if config is None:
+        app.logger.warning("WebSocket closed without a valid start message.")
+        if sock.connected:
+            sock.send(STREAM_CONFIG_ERROR)
+        return
+    session = create_realtime_session(config, request_client_id())
+    app.logger.info(f"WebSocket connection established for real-time session {session.session_id} ({session.source}).")
 
-    realtime_detection_process = multiprocessing.Process(
-        target=audio_processor.main_loop_process,
-        args=(prediction_queue, realtime_detection_should_run)
-    )
-    realtime_detection_process.start()
-    app.logger.info("Real-time detection process started.")
+    receiver = threading.Thread(target=receive_audio, args=(sock, session),
+                                name=f"ws-receive-{session.session_id}", daemon=True)
+    receiver.start()
 
     try:
         while True:
-            if not prediction_queue.empty():
-                result_str = prediction_queue.get()
-                try:
-                    sock.send(result_str)
-                except Exception as send_e:
-                    app.logger.error(f"Error sending WebSocket message: {send_e}. Closing connection.")
+            try:
+                result_str = session.output.get(timeout=WS_IDLE_TIMEOUT)
+            except queue.Empty:
+                if not sock.connected:
                     break
-            threading.Event().wait(0.01)
-            if not realtime_detection_process.is_alive() and realtime_detection_should_run.is_set():
-                app.logger.warning("Real-time detection process terminated unexpectedly.")
+                continue
+            if result_str is CLOSED:
+                if sock.connected:
+                    app.logger.warning(f"Real-time session {session.session_id} stopped unexpectedly.")
                 break
+            try:
+                with metrics.timed("ws_send"):
+                    sock.send(result_str)
+            except Exception as send_e:
+                app.logger.error(f"Error sending WebSocket message: {send_e}. Closing connection.")
+                return
 
+    except ConnectionClosed:
+        pass
     except Exception as e:
         app.logger.error(f"WebSocket communication error: {e}", exc_info=True)
     finally:
-        app.logger.info("WebSocket connection closed. Signaling real-time process to stop.")
-        realtime_detection_should_run.clear()
-        with open(audio_processor.STOP_FLAG_FILE, "w") as f:
-            f.write("stop")
-
-        realtime_detection_process.join(timeout=10)
-        if realtime_detection_process.is_alive():
-            app.logger.warning("Real-time detection process did not terminate gracefully. Terminating forcefully.")
-            realtime_detection_process.terminate()
-        realtime_detection_process = None
-        if os.path.exists(audio_processor.STOP_FLAG_FILE):
-            os.remove(audio_processor.STOP_FLAG_FILE)
-        app.logger.info("Real-time detection process cleanup complete.")
+        app.logger.info(f"WebSocket connection closed. Stopping real-time session {session.session_id}.")
+        session_manager.close_session(session.session_id)
+        app.logger.info(f"Real-time session {session.session_id} cleanup complete.")
+
+@app.route('/batcher-stats', methods=['GET'])
+def batcher_stats():
+    return jsonify(inference_batcher.stats()), 200
+
+@app.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    return jsonify(result_cache.stats()), 200
+
+@app.route('/vad-stats', methods=['GET'])
+def vad_stats():
+    return jsonify(vad.stats()), 200
+
+def sessions_snapshot():
+    return {
+        "active": session_manager.active_count(),
+        "session_ids": session_manager.session_ids(),
+        "dropped_results": session_manager.dropped_results(),
+        "workers": worker_pool.stats()
+    }
+
+@app.route('/sessions', methods=['GET'])
+def sessions_status():
+    return jsonify(sessions_snapshot()), 200
+
+def recordings_snapshot(limit=20):
+    return {"recordings": recordings.recent(limit), "stats": recordings.stats()}
+
+@app.route('/recordings', methods=['GET'])
+def recordings_status():
+    return jsonify(recordings_snapshot(request.args.get("limit", 20, type=int))), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+def profiler_action(action, interval_ms=None):
+    if action == "start":
+        metrics.profiler.start(interval_ms)
+    elif action == "stop":
+        metrics.profiler.stop()
+    return metrics.profiler.status()
+
+@app.route('/profiler', methods=['GET'])
+def profiler_stacks():
+    return Response(metrics.profiler.collapsed(request.args.get("limit", type=int)), mimetype="text/plain")
+
+@app.route('/profiler/<action>', methods=['POST'])
+def profiler_control(action):
+    if action not in ("start", "stop", "status"):
+        return jsonify({"error": f"Unknown profiler action: {action}"}), 404
+    return jsonify(profiler_action(action, request.args.get("interval_ms", type=float))), 200
+
+def change_models(action, name=None, spec=None, rate=None):
+    registry = audio_processor.registry
+    try:
+        if action == "register":
+            if not name or not isinstance(spec, dict):
+                return {"error": "A model name and spec are required."}, 400
+            stats = registry.register(name, spec)
+        elif action == "activate":
+            stats = registry.activate(name)
+        elif action == "shadow":
+            stats = registry.set_shadow(name, rate if rate is not None else 0.1)
+        else:
+            return {"error": f"Unknown model action: {action}"}, 404
+    except KeyError as e:
+        return {"error": str(e.args[0])}, 404
+    except Exception as e:
+        app.logger.error(f"Model {action} failed: {e}")
+        return {"error": str(e)}, 400
+    worker_pool.reload_models()
+    app.logger.info(f"Model registry updated ({action} {name}): active={stats['active']}, shadow={stats['shadow']}")
+    return stats, 200
+
+@app.route('/models', methods=['GET'])
+def models_status():
+    return jsonify(audio_processor.registry.stats()), 200
+
+@app.route('/models', methods=['POST'])
+def register_model():
+    spec = dict(request.get_json(silent=True) or {})
+    body, status = change_models("register", spec.pop("name", None), spec)
+    return jsonify(body), status
+
+@app.route('/models/<name>/activate', methods=['POST'])
+def activate_model(name):
+    body, status = change_models("activate", name)
+    return jsonify(body), status
+
+@app.route('/models/<name>/shadow', methods=['POST'])
+def shadow_model(name):
+    body, status = change_models("shadow", name, rate=request.args.get("rate", type=float))
+    return jsonify(body), status
+
+@app.route('/models/shadow', methods=['DELETE'])
+def stop_shadow():
+    body, status = change_models("shadow", None)
+    return jsonify(body), status
+
+def recording_status():
+    status = session_manager.active_count() > 0
+    app.logger.debug(f"Real-time detection process status checked: {'alive' if status else 'not running'}")
+    return status
 
 @app.route('/is-recording', methods=['GET'])
 def is_recording():
-    global realtime_detection_process
-    status = bool(realtime_detection_process and realtime_detection_process.is_alive())
-    app.logger.info(f"Real-time detection process status checked: {'alive' if status else 'not running'}")
-    return jsonify({"is_recording": status}), 200
+    return jsonify({"is_recording": recording_status()}), 200
 
 if __name__ == "__main__":
     os.makedirs(audio_processor.RECORDINGS_DIR, exist_ok=True)
     if os.path.exists(audio_processor.STOP_FLAG_FILE):
         os.remove(audio_processor.STOP_FLAG_FILE)
-    app.run(host="0.0.0.0", port=5001, debug=True)
\ No newline at end of file
+    if is_running_from_reloader():
+        worker_pool.start()
+        recordings.start_sweeper(RECORDINGS_SWEEP_SECONDS)
+        if PROFILER_ON_START:
+            metrics.profiler.start()
+        warmup_seconds = audio_processor.warmup()
+        app.logger.info(
+            f"Server cold start: {time.perf_counter() - SERVER_START:.2f}s "
+            f"(model warmup {warmup_seconds:.2f}s)"
+        )
+    app.run(host="0.0.0.0", port=5001, debug=True, request_handler=QuietRequestHandler)
\ No newline at end of file
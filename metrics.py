@@ -0,0 +1,322 @@
+import bisect
+import collections
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_PREFIX = "brainrot_"
+STAGE_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+PROFILER_INTERVAL_MS = float(os.environ.get("PROFILER_INTERVAL_MS", "10"))
+PROFILER_MAX_DEPTH = 64
+
+_registry = []
+_gauges = []
+_families = {"stage_latency_ms": ("Time spent per pipeline stage", STAGE_BUCKETS_MS)}
+_histograms = {}
+_counters = {}
+_lock = threading.Lock()
+_pending = None
+
+
+class Histogram:
+    def __init__(self, name, buckets, description="", labels=None):
+        self.name = name
+        self.description = description
+        self.labels = dict(labels or {})
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def quantile(self, q):
+        with self._lock:
+            counts = list(self._counts)
+            total = self._count
+        if total == 0:
+            return None
+        target = q * total
+        running = 0
+        for index, count in enumerate(counts):
+            running += count
+            if running >= target:
+                if index < len(self.buckets):
+                    return self.buckets[index]
+                return float("inf")
+        return float("inf")
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            total = self._count
+            value_sum = self._sum
+        cumulative = []
+        running = 0
+        for bound, count in zip(list(self.buckets) + ["+Inf"], counts):
+            running += count
+            cumulative.append([bound, running])
+        return {
+            "name": self.name,
+            "count": total,
+            "sum": round(value_sum, 6),
+            "mean": round(value_sum / total, 6) if total else None,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": cumulative,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * (len(self.buckets) + 1)
+            self._sum = 0.0
+            self._count = 0
+
+    def prometheus_lines(self):
+        with self._lock:
+            counts = list(self._counts)
+            total = self._count
+            value_sum = self._sum
+        name = METRICS_PREFIX + self.name
+        lines = []
+        running = 0
+        for bound, count in zip(list(self.buckets) + ["+Inf"], counts):
+            running += count
+            lines.append(f"{name}_bucket{_format_labels(self.labels, le=bound)} {running}")
+        lines.append(f"{name}_sum{_format_labels(self.labels)} {value_sum}")
+        lines.append(f"{name}_count{_format_labels(self.labels)} {total}")
+        return lines
+
+
+def _format_labels(labels, **extra):
+    items = dict(labels, **extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items.items()) + "}"
+
+
+def register(histogram):
+    _registry.append(histogram)
+    return histogram
+
+
+def register_gauge(name, description, fn, kind="gauge"):
+    _gauges.append((name, description, fn, kind))
+
+
+def describe(family, description, buckets=None):
+    _families[family] = (description, tuple(buckets) if buckets is not None else None)
+
+
+def _key(family, labels):
+    return family, tuple(sorted(labels.items()))
+
+
+def histogram(family, **labels):
+    key = _key(family, labels)
+    found = _histograms.get(key)
+    if found is None:
+        with _lock:
+            found = _histograms.get(key)
+            if found is None:
+                description, buckets = _families.get(family, ("", None))
+                found = Histogram(family, buckets or STAGE_BUCKETS_MS, description, labels=labels)
+                _histograms[key] = found
+    return found
+
+
+def observe(family, value, **labels):
+    with _lock:
+        pending = _pending
+        if pending is not None:
+            pending["histograms"][_key(family, labels)].append(value)
+            return
+    histogram(family, **labels).observe(value)
+
+
+def increment(family, value=1, **labels):
+    with _lock:
+        key = _key(family, labels)
+        if _pending is not None:
+            _pending["counters"][key] += value
+        else:
+            _counters[key] = _counters.get(key, 0) + value
+
+
+def counter_value(family, **labels):
+    with _lock:
+        return _counters.get(_key(family, labels), 0)
+
+
+def stage(name):
+    return histogram("stage_latency_ms", stage=name)
+
+
+def observe_stage(name, elapsed_ms):
+    observe("stage_latency_ms", elapsed_ms, stage=name)
+
+
+@contextmanager
+def timed(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, (time.perf_counter() - started) * 1000.0)
+
+
+def _empty_pending():
+    return {"histograms": collections.defaultdict(list), "counters": collections.defaultdict(float)}
+
+
+def buffer():
+    global _pending
+    with _lock:
+        _pending = _empty_pending()
+
+
+def drain():
+    global _pending
+    with _lock:
+        pending = _pending
+        if pending is None or not (pending["histograms"] or pending["counters"]):
+            return None
+        _pending = _empty_pending()
+    return {"histograms": dict(pending["histograms"]), "counters": dict(pending["counters"])}
+
+
+def merge(observations):
+    for (family, labels), values in observations["histograms"].items():
+        target = histogram(family, **dict(labels))
+        for value in values:
+            target.observe(value)
+    with _lock:
+        for key, value in observations["counters"].items():
+            _counters[key] = _counters.get(key, 0) + value
+
+
+def render_prometheus():
+    lines = []
+    with _lock:
+        histograms = [_histograms[key] for key in sorted(_histograms)]
+        counters = sorted(_counters.items())
+    families = collections.OrderedDict()
+    for item in histograms + list(_registry):
+        families.setdefault(item.name, []).append(item)
+    for name, items in families.items():
+        lines.append(f"# HELP {METRICS_PREFIX}{name} {items[0].description}")
+        lines.append(f"# TYPE {METRICS_PREFIX}{name} histogram")
+        for item in items:
+            lines.extend(item.prometheus_lines())
+    seen = set()
+    for (family, labels), value in counters:
+        if family not in seen:
+            seen.add(family)
+            lines.append(f"# HELP {METRICS_PREFIX}{family} {_families.get(family, ('',))[0]}")
+            lines.append(f"# TYPE {METRICS_PREFIX}{family} counter")
+        lines.append(f"{METRICS_PREFIX}{family}{_format_labels(dict(labels))} {float(value)}")
+    for name, description, fn, kind in _gauges:
+        try:
+            value = fn()
+        except Exception:
+            continue
+        if value is None:
+            continue
+        lines.append(f"# HELP {METRICS_PREFIX}{name} {description}")
+        lines.append(f"# TYPE {METRICS_PREFIX}{name} {kind}")
+        lines.append(f"{METRICS_PREFIX}{name} {float(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    def __init__(self, interval_ms=PROFILER_INTERVAL_MS, max_depth=PROFILER_MAX_DEPTH):
+        self.interval = interval_ms / 1000.0
+        self.max_depth = max_depth
+        self.samples = 0
+        self.started_at = None
+        self.stopped_at = None
+        self._stacks = collections.Counter()
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms=None):
+        with self._lock:
+            if self.running:
+                return False
+            if interval_ms:
+                self.interval = float(interval_ms) / 1000.0
+            self._stacks = collections.Counter()
+            self.samples = 0
+            self.started_at = time.time()
+            self.stopped_at = None
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return False
+            self._stop.set()
+        thread.join()
+        with self._lock:
+            if self._thread is thread:
+                self._thread = None
+                self.stopped_at = time.time()
+        return True
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if len(names) != threading.active_count():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            sampled = []
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                sampled.append(";".join(reversed(stack)))
+            with self._lock:
+                self._stacks.update(sampled)
+                self.samples += 1
+
+    def collapsed(self, limit=None):
+        with self._lock:
+            stacks = self._stacks.most_common(limit)
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def status(self):
+        with self._lock:
+            return {
+                "running": self.running,
+                "interval_ms": self.interval * 1000.0,
+                "samples": self.samples,
+                "stacks": len(self._stacks),
+                "started_at": self.started_at,
+                "stopped_at": self.stopped_at,
+            }
+
+
+profiler = SamplingProfiler()
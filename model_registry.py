@@ -0,0 +1,319 @@
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+
+import numpy as np
+
+import backends
+import metrics
+from cascade import CascadeStage
+
+logger = logging.getLogger(__name__)
+
+SHADOW_QUEUE_SIZE = 4
+AGREEMENT_THRESHOLD = 0.95
+ABS_DIFF_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0)
+LOAD_RETRY_SECONDS = float(os.environ.get("MODEL_LOAD_RETRY_SECONDS", "1"))
+LOAD_RETRY_MAX_SECONDS = float(os.environ.get("MODEL_LOAD_RETRY_MAX_SECONDS", "60"))
+
+metrics.describe("model_predict_ms", "Model call latency per batch, by model and role")
+metrics.describe("shadow_abs_diff", "Absolute score difference between shadow and active model", ABS_DIFF_BUCKETS)
+metrics.describe("shadow_windows_total", "Windows scored by the shadow model")
+metrics.describe("shadow_agreements_total", "Shadow windows whose label matched the active model")
+metrics.describe("shadow_dropped_total", "Shadow batches skipped because the shadow queue was full")
+
+
+class ModelUnavailable(RuntimeError):
+    pass
+
+
+class ModelEntry:
+    def __init__(self, name, spec):
+        self.name = name
+        self.spec = dict(spec)
+        self.backend_name = spec.get("backend", "numpy")
+        self.path = spec.get("path")
+        started = time.perf_counter()
+        self.backend = backends.create_backend(self.backend_name, self.path)
+        self.path = self.backend.model_path
+        self.load_seconds = time.perf_counter() - started
+        self.loaded_at = time.time()
+        self.input_shape = tuple(self.backend.input_shape)
+
+        pinned = spec.get("input_shape")
+        if pinned is not None and not _shape_matches(self.input_shape, pinned):
+            raise ValueError(f"Model {name} expects input {self.input_shape}, but the registry pins {tuple(pinned)}")
+
+        self.scaler_files = []
+        self.scaler_mean = getattr(self.backend, "scaler_mean", None)
+        self.scaler_scale = getattr(self.backend, "scaler_scale", None)
+        if spec.get("scaler_mean") or self.scaler_mean is None:
+            mean_path = spec.get("scaler_mean", "scaler_mean.npy")
+            scale_path = spec.get("scaler_scale", "scaler_scale.npy")
+            if os.path.exists(mean_path) and os.path.exists(scale_path):
+                self.scaler_mean = np.load(mean_path)
+                self.scaler_scale = np.load(scale_path)
+                self.scaler_files = [mean_path, scale_path]
+            else:
+                logger.warning(f"Scaler files for model {name} not found. Features will not be scaled.")
+        if self.scaler_mean is not None and self.scaler_mean.shape[-1] != self.input_shape[-1]:
+            raise ValueError(f"Scaler for model {name} has {self.scaler_mean.shape[-1]} features, "
+                             f"but the model expects {self.input_shape[-1]}")
+
+        self.cascade = None
+        if spec.get("cascade"):
+            self.cascade = CascadeStage(spec["cascade"], spec.get("cascade_threshold"))
+            if self.cascade.mean.shape[-1] != 2 * self.input_shape[-1]:
+                raise ValueError(f"Cascade {spec['cascade']} for model {name} was trained on "
+                                 f"{self.cascade.mean.shape[-1] // 2} features, but the model expects "
+                                 f"{self.input_shape[-1]}")
+
+    def scale(self, features):
+        if self.scaler_mean is None or self.scaler_scale is None:
+            return features
+        with metrics.timed("scale_features"):
+            flat = features.reshape(-1, features.shape[-1])
+            scaled = (flat - self.scaler_mean) / (self.scaler_scale + 1e-10)
+            return scaled.reshape(features.shape).astype(np.float32)
+
+    def predict(self, features, role="active"):
+        if not _shape_matches(features.shape[1:], self.input_shape):
+            raise ValueError(f"Model {self.name} expects input {self.input_shape}, got {features.shape[1:]}")
+        started = time.perf_counter()
+        if self.cascade is None:
+            scores = self.predict_full(features)
+        else:
+            with metrics.timed("cascade_stage1"):
+                scores = self.cascade.probabilities(features).astype(np.float32)
+            passed = scores >= self.cascade.threshold
+            if passed.any():
+                scores[passed] = self.predict_full(features[passed])
+            metrics.increment("cascade_windows_total", int(np.sum(~passed)), model=self.name, stage="early_exit")
+            metrics.increment("cascade_windows_total", int(np.sum(passed)), model=self.name, stage="full")
+        metrics.observe("model_predict_ms", (time.perf_counter() - started) * 1000.0, model=self.name, role=role)
+        return scores
+
+    def predict_full(self, features):
+        scaled = self.scale(features)
+        with metrics.timed("predict"):
+            return self.backend.predict(scaled)
+
+    def model_files(self):
+        return [self.path] + self.scaler_files + ([self.cascade.path] if self.cascade is not None else [])
+
+    def describe(self):
+        return {
+            "backend": self.backend_name,
+            "path": self.path,
+            "input_shape": list(self.input_shape),
+            "shared_weights": getattr(self.backend, "shared", False),
+            "scaler": "files" if self.scaler_files else ("embedded" if self.scaler_mean is not None else None),
+            "cascade": self.cascade.describe(self.name) if self.cascade is not None else None,
+            "load_seconds": round(self.load_seconds, 3),
+            "loaded_at": self.loaded_at,
+        }
+
+
+def _shape_matches(actual, expected):
+    return len(actual) == len(expected) and all(e is None or a is None or a == e for a, e in zip(actual, expected))
+
+
+class ModelRegistry:
+    def __init__(self, config_path, default_config):
+        self.config_path = config_path
+        self.default_config = default_config
+        self.config = None
+        self.generation = 0
+        self.load_error = None
+        self._retry_at = 0.0
+        self._retry_delay = LOAD_RETRY_SECONDS
+        self._entries = {}
+        self._active = None
+        self._shadow = None
+        self._shadow_queue = queue.Queue(maxsize=SHADOW_QUEUE_SIZE)
+        self._shadow_thread = None
+        self._lock = threading.RLock()
+
+    def _read_config(self):
+        if os.path.exists(self.config_path):
+            with open(self.config_path) as f:
+                config = json.load(f)
+        else:
+            config = self.default_config()
+        config.setdefault("models", {})
+        config.setdefault("active", next(iter(config["models"]), None))
+        config.setdefault("shadow", None)
+        config.setdefault("shadow_rate", 0.0)
+        return config
+
+    def _write_config(self, config):
+        tmp_path = f"{self.config_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(config, f, indent=2)
+        os.replace(tmp_path, self.config_path)
+
+    def _entry(self, config, name):
+        spec = config["models"].get(name)
+        if spec is None:
+            raise KeyError(f"Unknown model: {name}")
+        entry = self._entries.get(name)
+        if entry is None or entry.spec != spec:
+            entry = ModelEntry(name, spec)
+            logger.info(f"Model {name} loaded ({entry.backend_name}, {entry.path}, input {entry.input_shape}).")
+            self._entries[name] = entry
+        return entry
+
+    def _apply(self, config):
+        with self._lock:
+            try:
+                active = self._entry(config, config["active"])
+            except Exception as e:
+                fallback = config.get("fallback")
+                if not fallback or fallback == config["active"]:
+                    raise
+                logger.error(f"Error loading model {config['active']} ({e}). Falling back to {fallback}.")
+                active = self._entry(config, fallback)
+            shadow = self._entry(config, config["shadow"]) if config.get("shadow") else None
+            self._active, self._shadow, self.config = active, shadow, config
+            self.load_error = None
+            self._retry_delay = LOAD_RETRY_SECONDS
+            self.generation += 1
+            for name in list(self._entries):
+                if name not in (active.name, shadow.name if shadow else None):
+                    del self._entries[name]
+
+    def reload(self):
+        self._apply(self._read_config())
+
+    def active(self):
+        if self._active is None:
+            with self._lock:
+                if self._active is None:
+                    if self.load_error is not None and time.monotonic() < self._retry_at:
+                        raise ModelUnavailable(f"No model loaded: {self.load_error}")
+                    try:
+                        self.reload()
+                    except Exception as e:
+                        logger.error(f"Error loading model: {e}. Retrying in {self._retry_delay:g}s.")
+                        self.load_error = e
+                        self._retry_at = time.monotonic() + self._retry_delay
+                        self._retry_delay = min(self._retry_delay * 2, LOAD_RETRY_MAX_SECONDS)
+                        raise ModelUnavailable(f"No model loaded: {e}") from e
+        return self._active
+
+    def _update(self, mutate):
+        with self._lock:
+            config = json.loads(json.dumps(self.config or self._read_config()))
+            mutate(config)
+            self._apply(config)
+            self._write_config(config)
+            return self.stats()
+
+    def register(self, name, spec):
+        def mutate(config):
+            entry = ModelEntry(name, spec)
+            logger.info(f"Model {name} loaded ({entry.backend_name}, {entry.path}, input {entry.input_shape}).")
+            config["models"][name] = entry.spec
+            self._entries[name] = entry
+        return self._update(mutate)
+
+    def activate(self, name):
+        def mutate(config):
+            if name not in config["models"]:
+                raise KeyError(f"Unknown model: {name}")
+            config["active"] = name
+            if config.get("shadow") == name:
+                config["shadow"] = None
+        return self._update(mutate)
+
+    def set_shadow(self, name, rate):
+        def mutate(config):
+            if name is not None and name not in config["models"]:
+                raise KeyError(f"Unknown model: {name}")
+            config["shadow"] = name
+            config["shadow_rate"] = max(0.0, min(1.0, float(rate))) if name is not None else 0.0
+        return self._update(mutate)
+
+    def specs(self):
+        with self._lock:
+            config = self.config or self._read_config()
+            return {name: dict(spec) for name, spec in config["models"].items()}
+
+    def predict(self, features):
+        active = self.active()
+        scores = active.predict(features)
+        shadow = self._shadow
+        if shadow is not None and random.random() < self.config.get("shadow_rate", 0.0):
+            self._submit_shadow(shadow, active, features, scores)
+        return scores
+
+    def model_files(self):
+        return self.active().model_files()
+
+    def _submit_shadow(self, shadow, active, features, scores):
+        if self._shadow_thread is None or not self._shadow_thread.is_alive():
+            with self._lock:
+                if self._shadow_thread is None or not self._shadow_thread.is_alive():
+                    self._shadow_thread = threading.Thread(target=self._shadow_loop, name="shadow-scoring",
+                                                           daemon=True)
+                    self._shadow_thread.start()
+        try:
+            self._shadow_queue.put_nowait((shadow, active.name, features, np.asarray(scores)))
+        except queue.Full:
+            metrics.increment("shadow_dropped_total", model=shadow.name)
+
+    def _shadow_loop(self):
+        while True:
+            shadow, active_name, features, active_scores = self._shadow_queue.get()
+            try:
+                shadow_scores = np.asarray(shadow.predict(features, role="shadow"))
+            except Exception as e:
+                logger.error(f"Shadow scoring error for model {shadow.name}: {e}")
+                continue
+            agreements = int(np.sum((shadow_scores > AGREEMENT_THRESHOLD) == (active_scores > AGREEMENT_THRESHOLD)))
+            for diff in np.abs(shadow_scores - active_scores):
+                metrics.observe("shadow_abs_diff", float(diff), model=shadow.name, baseline=active_name)
+            metrics.increment("shadow_windows_total", len(shadow_scores), model=shadow.name, baseline=active_name)
+            metrics.increment("shadow_agreements_total", agreements, model=shadow.name, baseline=active_name)
+
+    def shadow_report(self):
+        config = self.config or {}
+        shadow, active = config.get("shadow"), config.get("active")
+        if not shadow:
+            return None
+        windows = metrics.counter_value("shadow_windows_total", model=shadow, baseline=active)
+        agreements = metrics.counter_value("shadow_agreements_total", model=shadow, baseline=active)
+        diff = metrics.histogram("shadow_abs_diff", model=shadow, baseline=active).snapshot()
+        latency = {}
+        for role, name in (("active", active), ("shadow", shadow)):
+            snapshot = metrics.histogram("model_predict_ms", model=name, role=role).snapshot()
+            latency[role] = {"batches": snapshot["count"], "mean_ms": snapshot["mean"], "p99_ms": snapshot["p99"]}
+        return {
+            "model": shadow,
+            "baseline": active,
+            "rate": config.get("shadow_rate", 0.0),
+            "windows": int(windows),
+            "agreement": round(agreements / windows, 4) if windows else None,
+            "mean_abs_diff": diff["mean"],
+            "dropped_batches": int(metrics.counter_value("shadow_dropped_total", model=shadow)),
+            "latency": latency,
+        }
+
+    def stats(self):
+        with self._lock:
+            config = self.config or self._read_config()
+            loaded = {name: entry.describe() for name, entry in self._entries.items()}
+        return {
+            "active": self._active.name if self._active is not None else None,
+            "load_error": str(self.load_error) if self.load_error is not None else None,
+            "shadow": config.get("shadow"),
+            "shadow_rate": config.get("shadow_rate", 0.0),
+            "generation": self.generation,
+            "config_path": self.config_path,
+            "models": {name: dict(spec, loaded=loaded.get(name)) for name, spec in config["models"].items()},
+            "shadow_report": self.shadow_report(),
+        }
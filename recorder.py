@@ -0,0 +1,205 @@
+import logging
+import os
+import queue
+import struct
+import subprocess
+import threading
+
+import numpy as np
+
+import decoding
+
+logger = logging.getLogger(__name__)
+
+RECORDING_FORMAT = os.environ.get("RECORDING_FORMAT", "mp3")
+RECORDING_BITRATE = os.environ.get("RECORDING_BITRATE", "64k")
+RECORDING_SEGMENT_SECONDS = float(os.environ.get("RECORDING_SEGMENT_SECONDS", "900"))
+STREAMING_DATA_SIZE = 0xFFFFFFFF
+FOLLOW_WAIT_SECONDS = 0.5
+FOLLOW_CHUNK_BYTES = 64 * 1024
+
+_active_paths = set()
+_activity = threading.Condition()
+
+
+def is_recording(path):
+    with _activity:
+        return os.path.abspath(path) in _active_paths
+
+
+def follow(path, chunk_bytes=FOLLOW_CHUNK_BYTES, wait_seconds=FOLLOW_WAIT_SECONDS):
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(chunk_bytes)
+            if data:
+                yield data
+                continue
+            with _activity:
+                if os.path.abspath(path) not in _active_paths:
+                    break
+                _activity.wait(timeout=wait_seconds)
+        while True:
+            data = f.read(chunk_bytes)
+            if not data:
+                return
+            yield data
+
+
+def wav_header(sample_rate, data_bytes=STREAMING_DATA_SIZE, channels=1, sample_width=2):
+    riff_size = STREAMING_DATA_SIZE if data_bytes == STREAMING_DATA_SIZE else 36 + data_bytes
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI", b"RIFF", riff_size, b"WAVE", b"fmt ", 16, 1, channels, sample_rate,
+        sample_rate * channels * sample_width, channels * sample_width, sample_width * 8, b"data", data_bytes
+    )
+
+
+class WavSegment:
+    extension = ".wav"
+
+    def __init__(self, path, sample_rate):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.data_bytes = 0
+        self._file = open(path, "wb")
+        self._file.write(wav_header(sample_rate))
+        self._file.flush()
+
+    def write(self, pcm):
+        self._file.write(pcm)
+        self._file.flush()
+        self.data_bytes += len(pcm)
+
+    def close(self):
+        self._file.seek(0)
+        self._file.write(wav_header(self.sample_rate, self.data_bytes))
+        self._file.close()
+
+
+class FFmpegSegment:
+    extension = ".mp3"
+
+    def __init__(self, path, sample_rate, bitrate=RECORDING_BITRATE):
+        self.path = path
+        self.process = subprocess.Popen(
+            ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+             "-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "-i", "pipe:0",
+             "-b:a", bitrate, "-flush_packets", "1", "-f", "mp3", path],
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+
+    def write(self, pcm):
+        self.process.stdin.write(pcm)
+        self.process.stdin.flush()
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self.process.wait()
+        error = self.process.stderr.read().decode("utf-8", "replace").strip()
+        self.process.stderr.close()
+        if self.process.returncode != 0:
+            raise RuntimeError(f"ffmpeg exited with {self.process.returncode}: {error}")
+
+
+class StreamingRecorder:
+    def __init__(self, base_path, sample_rate, segment_seconds=RECORDING_SEGMENT_SECONDS,
+                 fmt=RECORDING_FORMAT, on_segment=None, on_close=None):
+        self.base_path = base_path
+        self.sample_rate = int(sample_rate)
+        self.segment_bytes = int(segment_seconds * self.sample_rate) * 2 if segment_seconds else None
+        self.use_ffmpeg = fmt == "mp3" and decoding.ffmpeg_available()
+        self.on_segment = on_segment
+        self.on_close = on_close
+        self.segments = []
+        self.samples_written = 0
+        self._queue = queue.Queue()
+        self._segment = None
+        self._segment_written = 0
+        self._thread = None
+        self._closed = False
+
+    @property
+    def current_path(self):
+        return self.segments[-1] if self.segments else None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="recording-encoder", daemon=True)
+        self._thread.start()
+        return self
+
+    def write(self, samples):
+        if self._closed or samples.size == 0:
+            return
+        pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+        self._queue.put(pcm)
+
+    def close(self, timeout=30):
+        if self._closed:
+            return self.current_path
+        self._closed = True
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        return self.current_path
+
+    def _run(self):
+        while True:
+            pcm = self._queue.get()
+            if pcm is None:
+                break
+            while pcm:
+                if self._segment is None:
+                    self._open_segment()
+                room = len(pcm) if not self.segment_bytes else self.segment_bytes - self._segment_written
+                self._write(pcm[:room])
+                pcm = pcm[room:]
+                if self.segment_bytes and self._segment_written >= self.segment_bytes:
+                    self._close_segment()
+        self._close_segment()
+
+    def _write(self, pcm):
+        try:
+            self._segment.write(pcm)
+        except (BrokenPipeError, OSError) as e:
+            logger.warning(f"Recording encoder for {self.current_path} failed ({e}). Continuing as WAV.")
+            self.use_ffmpeg = False
+            self._close_segment()
+            self._open_segment()
+            self._segment.write(pcm)
+        self._segment_written += len(pcm)
+        self.samples_written += len(pcm) // 2
+        with _activity:
+            _activity.notify_all()
+
+    def _open_segment(self):
+        index = len(self.segments)
+        suffix = f"_{index:03d}" if index else ""
+        extension = FFmpegSegment.extension if self.use_ffmpeg else WavSegment.extension
+        path = f"{self.base_path}{suffix}{extension}"
+        if self.use_ffmpeg:
+            self._segment = FFmpegSegment(path, self.sample_rate)
+        else:
+            self._segment = WavSegment(path, self.sample_rate)
+        self._segment_written = 0
+        self.segments.append(path)
+        with _activity:
+            _active_paths.add(os.path.abspath(path))
+        if self.on_segment is not None:
+            self.on_segment(path)
+
+    def _close_segment(self):
+        segment, self._segment = self._segment, None
+        if segment is None:
+            return
+        try:
+            segment.close()
+        except Exception as e:
+            logger.error(f"Error closing recording segment {segment.path}: {e}")
+        finally:
+            with _activity:
+                _active_paths.discard(os.path.abspath(segment.path))
+                _activity.notify_all()
+        if self.on_close is not None:
+            self.on_close(segment.path, self._segment_written // 2)
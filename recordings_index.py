@@ -0,0 +1,216 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import recorder
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".webm", ".ogg", ".flac", ".m4a", ".pcm", ".bin")
+COLUMNS = ("filename", "kind", "session_id", "client_id", "created", "updated", "size", "duration", "score",
+           "label", "complete")
+
+
+class RecordingsIndex:
+    def __init__(self, recordings_dir, db_path=None, max_age_seconds=None, max_total_bytes=None):
+        self.recordings_dir = recordings_dir
+        self.max_age_seconds = max_age_seconds
+        self.max_total_bytes = max_total_bytes
+        os.makedirs(recordings_dir, exist_ok=True)
+        self._db = sqlite3.connect(db_path or os.path.join(recordings_dir, "recordings.sqlite"),
+                                   check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS recordings ("
+            "filename TEXT PRIMARY KEY, kind TEXT, session_id TEXT, client_id TEXT, created REAL, updated REAL, "
+            "size INTEGER, duration REAL, score REAL, label TEXT, complete INTEGER)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS recordings_created ON recordings (created)")
+        self._db.commit()
+        self._lock = threading.Lock()
+        self._records = {}
+        self._latest = {}
+        self._total_bytes = 0
+        self._sweeper = None
+        self._stop = threading.Event()
+        self.swept_files = 0
+        self.swept_bytes = 0
+        self._load()
+
+    def _load(self):
+        rows = self._db.execute(f"SELECT {', '.join(COLUMNS)} FROM recordings ORDER BY created").fetchall()
+        missing = []
+        for row in rows:
+            record = dict(zip(COLUMNS, row))
+            if not os.path.exists(os.path.join(self.recordings_dir, record["filename"])):
+                missing.append(record["filename"])
+                continue
+            self._remember(record)
+        if missing:
+            self._db.executemany("DELETE FROM recordings WHERE filename = ?", [(name,) for name in missing])
+
+        for filename in sorted(os.listdir(self.recordings_dir)):
+            path = os.path.join(self.recordings_dir, filename)
+            if filename in self._records or not filename.endswith(AUDIO_EXTENSIONS) or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            kind = "realtime" if filename.startswith("live_recording_") else "upload"
+            record = self._new_record(filename, kind, created=stat.st_mtime, size=stat.st_size, complete=True)
+            self._remember(record)
+            self._store(record)
+        self._db.commit()
+
+    def _new_record(self, filename, kind, session_id=None, client_id=None, created=None, size=0, complete=False):
+        now = time.time()
+        return {"filename": filename, "kind": kind, "session_id": session_id, "client_id": client_id,
+                "created": created or now, "updated": now, "size": size, "duration": None, "score": None,
+                "label": None, "complete": int(complete)}
+
+    def _remember(self, record):
+        previous = self._records.get(record["filename"])
+        if previous is not None:
+            self._total_bytes -= previous["size"] or 0
+        self._records[record["filename"]] = record
+        self._total_bytes += record["size"] or 0
+        for key in self._latest_keys(record):
+            current = self._latest.get(key)
+            if current is None or self._records[current]["created"] <= record["created"]:
+                self._latest[key] = record["filename"]
+
+    def _latest_keys(self, record):
+        keys = [("kind", record["kind"])]
+        if record["session_id"]:
+            keys.append(("session", record["session_id"]))
+        if record["client_id"]:
+            keys.append(("client", record["client_id"]))
+            keys.append(("client", record["client_id"], record["kind"]))
+        return keys
+
+    def _store(self, record):
+        self._db.execute(
+            f"INSERT OR REPLACE INTO recordings ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+            tuple(record[column] for column in COLUMNS)
+        )
+
+    def add(self, filename, kind, session_id=None, client_id=None, complete=False, **fields):
+        record = self._new_record(filename, kind, session_id, client_id, complete=complete)
+        record.update(fields)
+        with self._lock:
+            self._remember(record)
+            self._store(record)
+            self._db.commit()
+        return dict(record)
+
+    def update(self, filename, **fields):
+        with self._lock:
+            record = self._records.get(filename)
+            if record is None:
+                return None
+            record = dict(record, updated=time.time(), **fields)
+            if "complete" in fields:
+                record["complete"] = int(fields["complete"])
+            self._remember(record)
+            self._store(record)
+            self._db.commit()
+            return dict(record)
+
+    def get(self, filename):
+        with self._lock:
+            record = self._records.get(filename)
+            return dict(record) if record is not None else None
+
+    def latest(self, kind=None, session_id=None, client_id=None):
+        if session_id:
+            key = ("session", session_id)
+        elif client_id:
+            key = ("client", client_id, kind) if kind else ("client", client_id)
+        else:
+            key = ("kind", kind)
+        with self._lock:
+            filename = self._latest.get(key)
+            return dict(self._records[filename]) if filename is not None else None
+
+    def recent(self, limit=20):
+        with self._lock:
+            records = sorted(self._records.values(), key=lambda record: record["created"], reverse=True)
+            return [dict(record) for record in records[:limit]]
+
+    def remove(self, filename, delete_file=True):
+        with self._lock:
+            record = self._forget(filename)
+            self._db.execute("DELETE FROM recordings WHERE filename = ?", (filename,))
+            self._db.commit()
+        if record is not None and delete_file:
+            try:
+                os.remove(os.path.join(self.recordings_dir, filename))
+            except FileNotFoundError:
+                pass
+        return record
+
+    def _forget(self, filename):
+        record = self._records.pop(filename, None)
+        if record is None:
+            return None
+        self._total_bytes -= record["size"] or 0
+        for key in self._latest_keys(record):
+            if self._latest.get(key) == filename:
+                candidates = [r for r in self._records.values() if key in self._latest_keys(r)]
+                if candidates:
+                    self._latest[key] = max(candidates, key=lambda r: r["created"])["filename"]
+                else:
+                    del self._latest[key]
+        return record
+
+    def sweep(self, now=None):
+        now = now or time.time()
+        with self._lock:
+            records = sorted(self._records.values(), key=lambda record: record["created"])
+            total = self._total_bytes
+        victims = []
+        for record in records:
+            if recorder.is_recording(os.path.join(self.recordings_dir, record["filename"])):
+                continue
+            too_old = self.max_age_seconds and now - record["created"] > self.max_age_seconds
+            too_big = self.max_total_bytes and total > self.max_total_bytes
+            if not (too_old or too_big):
+                continue
+            victims.append(record["filename"])
+            total -= record["size"] or 0
+        for filename in victims:
+            record = self.remove(filename)
+            if record is not None:
+                self.swept_files += 1
+                self.swept_bytes += record["size"] or 0
+        return len(victims)
+
+    def start_sweeper(self, interval):
+        if self._sweeper is not None or not interval:
+            return
+        self._sweeper = threading.Thread(target=self._sweep_loop, args=(interval,), name="recordings-sweeper",
+                                         daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
+
+    def _sweep_loop(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                removed = self.sweep()
+                if removed:
+                    logger.info(f"Recordings sweeper removed {removed} file(s).")
+            except Exception as e:
+                logger.error(f"Recordings sweeper error: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "recordings": len(self._records),
+                "total_bytes": self._total_bytes,
+                "max_total_bytes": self.max_total_bytes,
+                "max_age_seconds": self.max_age_seconds,
+                "swept_files": self.swept_files,
+                "swept_bytes": self.swept_bytes,
+            }
@@ -0,0 +1,155 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+FINGERPRINT_CHECK_INTERVAL = 1.0
+PURGE_EVERY = 256
+
+
+def content_key(data, *params):
+    digest = hashlib.sha256(data).hexdigest()
+    if params:
+        return digest + ":" + ":".join(str(p) for p in params)
+    return digest
+
+
+def file_fingerprint(paths):
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        digest.update(f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+
+class ResultCache:
+    def __init__(self, fingerprint_paths, max_entries=1024, ttl=3600.0, db_path=None, max_db_rows=100000):
+        self.fingerprint_paths = fingerprint_paths
+        self.max_entries = max(0, int(max_entries))
+        self.ttl = float(ttl) if ttl else None
+        self.max_db_rows = int(max_db_rows)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._fingerprint = None
+        self._fingerprint_checked = 0.0
+        self._writes = 0
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0,
+                         "evictions": 0, "expired": 0, "invalidations": 0}
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, fingerprint TEXT, score REAL, label TEXT, created REAL, accessed REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+            self._db.commit()
+
+    def fingerprint(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._fingerprint is not None and now - self._fingerprint_checked < FINGERPRINT_CHECK_INTERVAL:
+                return self._fingerprint
+        current = file_fingerprint(self.fingerprint_paths())
+        with self._lock:
+            if self._fingerprint is not None and current != self._fingerprint:
+                self._memory.clear()
+                self.counters["invalidations"] += 1
+                if self._db is not None:
+                    self._db.execute("DELETE FROM results WHERE fingerprint != ?", (current,))
+                    self._db.commit()
+            self._fingerprint = current
+            self._fingerprint_checked = now
+        return current
+
+    def get(self, key):
+        fingerprint = self.fingerprint()
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] == fingerprint and not self._expired(entry[3], now):
+                    self._memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return {"score": entry[1], "label": entry[2]}
+                del self._memory[key]
+                self.counters["expired"] += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT score, label, created FROM results WHERE key = ? AND fingerprint = ?",
+                    (key, fingerprint)
+                ).fetchone()
+                if row is not None and not self._expired(row[2], now):
+                    self._db.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+                    self._remember(key, (fingerprint, row[0], row[1], row[2]))
+                    self.counters["disk_hits"] += 1
+                    return {"score": row[0], "label": row[1]}
+
+            self.counters["misses"] += 1
+            return None
+
+    def put(self, key, score, label):
+        fingerprint = self.fingerprint()
+        now = time.time()
+        with self._lock:
+            self._remember(key, (fingerprint, score, label, now))
+            self.counters["stores"] += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, fingerprint, score, label, created, accessed) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, fingerprint, score, label, now, now)
+                )
+                self._writes += 1
+                if self._writes % PURGE_EVERY == 0:
+                    self._purge_disk(now)
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["memory_entries"] = len(self._memory)
+            if self._db is not None:
+                stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else None
+        stats["fingerprint"] = self._fingerprint
+        return stats
+
+    def _expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def _remember(self, key, entry):
+        if self.max_entries == 0:
+            return
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def _purge_disk(self, now):
+        if self.ttl is not None:
+            expired = self._db.execute("DELETE FROM results WHERE created < ?", (now - self.ttl,)).rowcount
+            self.counters["expired"] += max(expired, 0)
+        excess = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0] - self.max_db_rows
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY accessed LIMIT ?)",
+                (excess,)
+            )
+            self.counters["evictions"] += excess
@@ -0,0 +1,55 @@
+import threading
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self._data = np.zeros(self.capacity, dtype=np.float32)
+        self._start = 0
+        self._end = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return self._end - self._start
+
+    @property
+    def position(self):
+        with self._lock:
+            return self._start
+
+    def write(self, samples):
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        with self._lock:
+            if samples.size > self.capacity:
+                self._end += samples.size - self.capacity
+                samples = samples[-self.capacity:]
+
+            offset = self._end % self.capacity
+            first = min(samples.size, self.capacity - offset)
+            self._data[offset:offset + first] = samples[:first]
+            self._data[:samples.size - first] = samples[first:]
+            self._end += samples.size
+
+            overflow = (self._end - self._start) - self.capacity
+            if overflow > 0:
+                self._start += overflow
+                self.dropped += overflow
+
+    def peek(self, count):
+        with self._lock:
+            if count > self._end - self._start:
+                raise ValueError(f"Requested {count} samples but only {self._end - self._start} are buffered.")
+            offset = self._start % self.capacity
+            first = min(count, self.capacity - offset)
+            out = np.empty(count, dtype=np.float32)
+            out[:first] = self._data[offset:offset + first]
+            out[first:] = self._data[:count - first]
+            return out
+
+    def consume(self, count):
+        with self._lock:
+            self._start += min(count, self._end - self._start)
@@ -0,0 +1,228 @@
+import json
+import logging
+import os
+import queue
+import threading
+import uuid
+
+import audio_processor
+import metrics
+import vad
+from features import StreamingFeatureExtractor
+from ring_buffer import AudioRingBuffer
+
+logger = logging.getLogger(__name__)
+
+WINDOW_SAMPLES = audio_processor.SAMPLE_RATE * audio_processor.DURATION
+BUFFER_WINDOWS = 4
+OUTPUT_QUEUE_SIZE = 32
+CLOSED = None
+
+
+class RealtimeSession:
+    def __init__(self, session_id, pool, source="device", sample_rate=audio_processor.SAMPLE_RATE, hop_seconds=None,
+                 client_id=None, index=None):
+        self.session_id = session_id
+        self.pool = pool
+        self.client_id = client_id
+        self.index = index
+        self.source = source
+        self.sample_rate = int(sample_rate)
+        self.output = queue.Queue(maxsize=OUTPUT_QUEUE_SIZE)
+        self.dropped_results = 0
+        self.segment_scores = []
+        self.notify = None
+        self.buffer = AudioRingBuffer(WINDOW_SAMPLES * BUFFER_WINDOWS)
+        self.extractor = StreamingFeatureExtractor(hop_seconds) if hop_seconds else None
+        self.hop_samples = self.extractor.hop_samples if self.extractor else WINDOW_SAMPLES
+        self.vad = vad.VoiceActivityDetector()
+        self.recorder = None
+        self.saved_path = None
+        self._should_run = threading.Event()
+        self._thread = None
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        self._should_run.set()
+        self.pool.register(self.session_id, self._deliver)
+        self._open_recording()
+        if self.source == "device":
+            self._thread = threading.Thread(target=self._capture_loop, name=f"session-{self.session_id}", daemon=True)
+            self._thread.start()
+        logger.info(f"Realtime session {self.session_id} started ({self.source}).")
+
+    def stop(self, timeout=10):
+        self._should_run.clear()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        self.pool.unregister(self.session_id)
+        self.close_output()
+        self._close_recording()
+        logger.info(f"Realtime session {self.session_id} stopped.")
+
+    def is_alive(self):
+        if self.source == "device":
+            return self._thread is not None and self._thread.is_alive()
+        return self._should_run.is_set()
+
+    def feed(self, payload):
+        if not self._should_run.is_set():
+            return
+        samples = audio_processor.pcm16_to_float(payload)
+        if self.sample_rate != audio_processor.SAMPLE_RATE:
+            samples = audio_processor.resample(samples, self.sample_rate, audio_processor.SAMPLE_RATE)
+        self._ingest(samples)
+
+    def _ingest(self, samples):
+        if samples.size == 0:
+            return
+        if self.recorder is not None:
+            self.recorder.write(samples)
+        self.buffer.write(samples)
+        while len(self.buffer) >= WINDOW_SAMPLES:
+            start = self.buffer.position
+            window = self.buffer.peek(WINDOW_SAMPLES)
+            self.buffer.consume(self.hop_samples)
+            self._submit_window(window, start)
+            self._seq += 1
+
+    def _submit_window(self, window, start):
+        if not vad.check(self.vad, window, "realtime"):
+            if self.extractor is not None:
+                self.extractor.reset()
+            self._deliver(vad.no_speech_result(self._seq))
+            return
+        if self.extractor is None:
+            self.pool.submit(self.session_id, self._seq, window)
+            return
+        with metrics.timed("extract_features"):
+            full = self.extractor.window_features(window, start)
+        features = audio_processor.prepare_features(full)
+        if features is None:
+            self._deliver({"seq": self._seq, "score": 0.0, "label": "normal"})
+            return
+        self.pool.submit(self.session_id, self._seq, features)
+
+    def close_output(self):
+        self._put(CLOSED)
+
+    def _deliver(self, result):
+        if "error" not in result and result.get("speech", True):
+            with self._lock:
+                self.segment_scores.append(result["score"])
+        self._put(json.dumps(result))
+
+    def _put(self, message):
+        while True:
+            try:
+                self.output.put_nowait(message)
+                if self.notify is not None:
+                    self.notify()
+                return
+            except queue.Full:
+                pass
+            try:
+                self.output.get_nowait()
+                with self._lock:
+                    self.dropped_results += 1
+            except queue.Empty:
+                pass
+
+    @property
+    def recording_path(self):
+        return self.recorder.current_path if self.recorder is not None else None
+
+    def _open_recording(self):
+        self.recorder = audio_processor.open_live_recorder(
+            f"live_recording_{self.session_id}", on_segment=self._segment_opened, on_close=self._segment_closed
+        )
+
+    def _segment_opened(self, path):
+        if self.index is not None:
+            self.index.add(os.path.basename(path), "realtime", session_id=self.session_id, client_id=self.client_id)
+
+    def _segment_closed(self, path, samples):
+        with self._lock:
+            scores, self.segment_scores = self.segment_scores, []
+        if self.index is None:
+            return
+        brainrot = sum(1 for score in scores if score > audio_processor.THRESHOLD)
+        self.index.update(
+            os.path.basename(path),
+            size=os.path.getsize(path) if os.path.exists(path) else 0,
+            duration=round(samples / audio_processor.SAMPLE_RATE, 3),
+            score=round(sum(scores) / len(scores), 3) if scores else None,
+            label=("brainrot" if brainrot / len(scores) >= 0.5 else "normal") if scores else None,
+            complete=True
+        )
+
+    def _close_recording(self):
+        if self.recorder is None:
+            return
+        self.saved_path = self.recorder.close()
+        if self.saved_path:
+            logger.info(f"Saved live recording for session {self.session_id} as: {self.saved_path}")
+
+    def _capture_loop(self):
+        stream = None
+        try:
+            stream = audio_processor.open_input_stream()
+            while self._should_run.is_set():
+                audio = audio_processor.record_audio_chunk(stream)
+                if audio.size == 0:
+                    self._put(json.dumps({"error": "No audio input device available."}))
+                    break
+                self._ingest(audio)
+        except Exception as e:
+            logger.error(f"Error in realtime session {self.session_id}: {e}")
+        finally:
+            if stream is not None:
+                stream.close()
+            self.close_output()
+
+
+class SessionManager:
+    def __init__(self, pool, index=None):
+        self.pool = pool
+        self.index = index
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def create_session(self, source="device", sample_rate=audio_processor.SAMPLE_RATE, hop_seconds=None,
+                       client_id=None):
+        session = RealtimeSession(uuid.uuid4().hex, self.pool, source=source, sample_rate=sample_rate,
+                                  hop_seconds=hop_seconds, client_id=client_id, index=self.index)
+        with self._lock:
+            self._sessions[session.session_id] = session
+        session.start()
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def close_session(self, session_id, timeout=10):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            session.stop(timeout=timeout)
+        return session
+
+    def close_all(self, timeout=10):
+        with self._lock:
+            session_ids = list(self._sessions)
+        for session_id in session_ids:
+            self.close_session(session_id, timeout=timeout)
+
+    def active_count(self):
+        with self._lock:
+            return sum(1 for session in self._sessions.values() if session.is_alive())
+
+    def session_ids(self):
+        with self._lock:
+            return list(self._sessions)
+
+    def dropped_results(self):
+        with self._lock:
+            return {session_id: session.dropped_results for session_id, session in self._sessions.items()}
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SHARED_WEIGHTS = os.environ.get("SHARED_WEIGHTS", "1") == "1"
+BLOCK_PREFIX = "brainrot-"
+ALIGNMENT = 64
+HEADER_BYTES = 8
+
+_lock = threading.Lock()
+_published = {}
+_attached = {}
+
+
+def block_name(path):
+    info = os.stat(path)
+    identity = f"{os.path.abspath(path)}:{info.st_mtime_ns}:{info.st_size}"
+    return BLOCK_PREFIX + hashlib.sha1(identity.encode()).hexdigest()[:16]
+
+
+def _layout(arrays):
+    entries = {}
+    offset = 0
+    for key, value in arrays.items():
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        entries[key] = {"offset": offset, "shape": list(value.shape), "dtype": value.dtype.str}
+        offset += value.nbytes
+    return entries, offset
+
+
+def publish(path):
+    name = block_name(path)
+    with _lock:
+        if name in _published:
+            return name
+        with np.load(path, allow_pickle=False) as data:
+            spec = str(data["spec"])
+            arrays = {key: np.ascontiguousarray(data[key], dtype=np.float32) for key in data.files if key != "spec"}
+        entries, data_bytes = _layout(arrays)
+        header = json.dumps({"path": os.path.abspath(path), "spec": spec, "arrays": entries}).encode()
+        data_start = -(-(HEADER_BYTES + len(header)) // ALIGNMENT) * ALIGNMENT
+        try:
+            block = shared_memory.SharedMemory(name=name, create=True, size=data_start + data_bytes)
+        except FileExistsError:
+            block = shared_memory.SharedMemory(name=name)
+            _published[name] = block
+            return name
+        block.buf[:HEADER_BYTES] = len(header).to_bytes(HEADER_BYTES, "little")
+        block.buf[HEADER_BYTES:HEADER_BYTES + len(header)] = header
+        for key, value in arrays.items():
+            entry = entries[key]
+            view = np.ndarray(value.shape, dtype=value.dtype, buffer=block.buf, offset=data_start + entry["offset"])
+            view[...] = value
+        _published[name] = block
+    logger.info(f"Shared model weights for {path} in {name} ({block.size / 1024 / 1024:.1f} MB).")
+    return name
+
+
+def publish_all(paths):
+    names = set()
+    for path in paths:
+        try:
+            names.add(publish(path))
+        except Exception as e:
+            logger.warning(f"Could not share model weights for {path}: {e}")
+    with _lock:
+        for name in [name for name in _published if name not in names]:
+            _unlink(_published.pop(name))
+    return names
+
+
+def attach(path):
+    if not SHARED_WEIGHTS:
+        return None
+    try:
+        name = block_name(path)
+    except OSError:
+        return None
+    with _lock:
+        block = _published.get(name) or _attached.get(name)
+        if block is None:
+            try:
+                block = shared_memory.SharedMemory(name=name)
+            except FileNotFoundError:
+                return None
+            _attached[name] = block
+    size = int.from_bytes(bytes(block.buf[:HEADER_BYTES]), "little")
+    header = json.loads(bytes(block.buf[HEADER_BYTES:HEADER_BYTES + size]))
+    data_start = -(-(HEADER_BYTES + size) // ALIGNMENT) * ALIGNMENT
+    weights = {}
+    for key, entry in header["arrays"].items():
+        view = np.ndarray(tuple(entry["shape"]), dtype=np.dtype(entry["dtype"]), buffer=block.buf,
+                          offset=data_start + entry["offset"])
+        view.flags.writeable = False
+        weights[key] = view
+    return json.loads(header["spec"]), weights
+
+
+def untrack_attached():
+    with _lock:
+        for block in _attached.values():
+            resource_tracker.unregister(block._name, "shared_memory")
+
+
+def _unlink(block):
+    try:
+        block.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def release():
+    with _lock:
+        for block in _published.values():
+            _unlink(block)
+        _published.clear()
+
+
+def stats():
+    with _lock:
+        return {
+            "enabled": SHARED_WEIGHTS,
+            "published": {name: block.size for name, block in _published.items()},
+            "attached": {name: block.size for name, block in _attached.items()},
+        }
@@ -0,0 +1,11 @@
+class PcmCaptureProcessor extends AudioWorkletProcessor {
+    process(inputs) {
+        const input = inputs[0];
+        if (input && input[0] && input[0].length > 0) {
+            this.port.postMessage(input[0].slice(0));
+        }
+        return true;
+    }
+}
+
+registerProcessor("pcm-capture", PcmCaptureProcessor);
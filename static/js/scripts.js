@@ -2,6 +2,7 @@ const recordButton = document.getElementById("recordButton");
 const recordStop = document.getElementById("recordStop");
 const muteButton = document.getElementById("muteButton");
 const downloadAudio = document.getElementById("downloadAudio");
+const latestAudio = document.getElementById("latestAudio");
 const errorMessage = document.getElementById("errorMessage");
 const canvas = document.getElementById("canvas");
 const startVisualizerButton = document.getElementById("startVisualizer");
@@ -16,9 +17,15 @@ let animationId = null;
 
 const BASE_URL = "";
 const WS_URL = "ws://localhost:5001/ws/realtime-predictions";
+const CLIENT_ID = localStorage.getItem("clientId") || (crypto.randomUUID ? crypto.randomUUID() : String(Date.now()) + Math.random().toString(16).slice(2));
+localStorage.setItem("clientId", CLIENT_ID);
+
+const STREAM_SAMPLE_RATE = 22050;
+const STREAM_FRAME_SAMPLES = 4096;
 
 let mediaRecorder, recordedChunks = [];
 let realTimeWebSocket = null;
+let streamCapture = null;
 
 function updateResultLabel(text, color) {
     resultLabel.textContent = text;
@@ -59,6 +66,7 @@ recordButton?.addEventListener("click", async () => {
             try {
                 const response = await fetch(`${BASE_URL}/upload`, {
                     method: "POST",
+                    headers: { "X-Client-Id": CLIENT_ID },
                     body: formData
                 });
 
@@ -71,6 +79,8 @@ recordButton?.addEventListener("click", async () => {
 
                 if (data.error) {
                     updateResultLabel("⚠️ Error: " + data.error, "gray");
+                } else if (data.label === "no_speech") {
+                    updateResultLabel("🔇 No speech detected", "gray");
                 } else {
                     const { score, label } = data;
                     updateResultLabel(
@@ -121,7 +131,7 @@ muteButton?.addEventListener("click", () => {
 
 downloadAudio?.addEventListener("click", async () => {
     try {
-        const response = await fetch(`${BASE_URL}/get-latest-audio`);
+        const response = await fetch(`${BASE_URL}/get-latest-audio`, { headers: { "X-Client-Id": CLIENT_ID } });
         if (!response.ok) {
             const errorText = await response.text();
             throw new Error(`Server error getting latest audio: ${errorText}`);
@@ -132,21 +142,19 @@ downloadAudio?.addEventListener("click", async () => {
             throw new Error("No recent audio to download.");
         }
 
-        const audioResponse = await fetch(`${BASE_URL}/download-audio/${filename}`);
-        if (!audioResponse.ok) {
-            const errorText = await audioResponse.text();
-            throw new Error(`Audio file not found on server or download failed: ${errorText}`);
+        const url = `${BASE_URL}/download-audio/${encodeURIComponent(filename)}`;
+        if (latestAudio) {
+            latestAudio.src = `${url}?inline=1`;
+            latestAudio.hidden = false;
+            latestAudio.play().catch(error => console.warn("Playback did not start:", error));
         }
 
-        const blob = await audioResponse.blob();
-        const url = window.URL.createObjectURL(blob);
         const a = document.createElement("a");
         a.href = url;
         a.download = filename;
         document.body.appendChild(a);
         a.click();
         a.remove();
-        window.URL.revokeObjectURL(url);
         updateErrorMessage("");
     } catch (error) {
         console.error("Download failed:", error);
@@ -228,6 +236,65 @@ function stopVisualizer() {
     }
 }
 
+function floatToPcm16(samples) {
+    const pcm = new Int16Array(samples.length);
+    for (let i = 0; i < samples.length; i++) {
+        const s = Math.max(-1, Math.min(1, samples[i]));
+        pcm[i] = s < 0 ? s * 0x8000 : s * 0x7fff;
+    }
+    return pcm;
+}
+
+async function startStreamCapture(socket) {
+    const ctx = new (window.AudioContext || window.webkitAudioContext)({ sampleRate: STREAM_SAMPLE_RATE });
+    socket.send(JSON.stringify({ type: "start", format: "pcm16", sample_rate: ctx.sampleRate, client_id: CLIENT_ID }));
+    let stream;
+    try {
+        stream = await navigator.mediaDevices.getUserMedia({ audio: true });
+        await ctx.audioWorklet.addModule("static/js/pcm-capture-worklet.js");
+    } catch (err) {
+        if (stream) stream.getTracks().forEach(track => track.stop());
+        ctx.close();
+        throw err;
+    }
+
+    const source = ctx.createMediaStreamSource(stream);
+    const node = new AudioWorkletNode(ctx, "pcm-capture");
+    const pending = new Float32Array(STREAM_FRAME_SAMPLES);
+    let filled = 0;
+
+    node.port.onmessage = (event) => {
+        const block = event.data;
+        let offset = 0;
+        while (offset < block.length) {
+            const count = Math.min(block.length - offset, STREAM_FRAME_SAMPLES - filled);
+            pending.set(block.subarray(offset, offset + count), filled);
+            filled += count;
+            offset += count;
+            if (filled === STREAM_FRAME_SAMPLES) {
+                if (socket.readyState === WebSocket.OPEN) {
+                    socket.send(floatToPcm16(pending).buffer);
+                }
+                filled = 0;
+            }
+        }
+    };
+
+    source.connect(node);
+    streamCapture = { stream, ctx, source, node };
+}
+
+function stopStreamCapture() {
+    if (!streamCapture) return;
+    const { stream, ctx, source, node } = streamCapture;
+    streamCapture = null;
+    node.port.onmessage = null;
+    source.disconnect();
+    node.disconnect();
+    stream.getTracks().forEach(track => track.stop());
+    ctx.close();
+}
+
 function startRealtimeDetection() {
     if (realTimeWebSocket && realTimeWebSocket.readyState === WebSocket.OPEN) {
         console.log("Real-time detection already active.");
@@ -237,12 +304,21 @@ function startRealtimeDetection() {
     updateRealtimeStatus("Connecting...", "orange");
     updateResultLabel("Listening for brainrot...", "purple");
 
-    realTimeWebSocket = new WebSocket(WS_URL);
+    const socket = new WebSocket(`${WS_URL}?client_id=${encodeURIComponent(CLIENT_ID)}`);
+    socket.binaryType = "arraybuffer";
+    realTimeWebSocket = socket;
 
-    realTimeWebSocket.onopen = (event) => {
+    realTimeWebSocket.onopen = async (event) => {
         console.log("WebSocket opened:", event);
-        updateRealtimeStatus("Active", "green");
-        updateErrorMessage("");
+        try {
+            await startStreamCapture(socket);
+            updateRealtimeStatus("Active", "green");
+            updateErrorMessage("");
+        } catch (err) {
+            console.error("Microphone streaming error:", err);
+            updateErrorMessage("Mic access blocked or unavailable for real-time detection.");
+            socket.close();
+        }
     };
 
     realTimeWebSocket.onmessage = (event) => {
@@ -251,6 +327,8 @@ function startRealtimeDetection() {
             if (data.error) {
                 updateResultLabel("⚠️ Real-time Error: " + data.error, "gray");
                 console.error("Real-time detection error:", data.error);
+            } else if (data.label === "no_speech") {
+                updateResultLabel("🔇 LIVE: No speech", "gray");
             } else {
                 const { score, label } = data;
                 updateResultLabel(
@@ -268,6 +346,7 @@ function startRealtimeDetection() {
 
     realTimeWebSocket.onclose = (event) => {
         console.log("WebSocket closed:", event);
+        stopStreamCapture();
         updateRealtimeStatus("Stopped", "gray");
         updateResultLabel("Real-time analysis stopped.", "gray");
         realTimeWebSocket = null;
@@ -282,6 +361,7 @@ function startRealtimeDetection() {
 }
 
 function stopRealtimeDetection() {
+    stopStreamCapture();
     if (realTimeWebSocket && realTimeWebSocket.readyState === WebSocket.OPEN) {
         console.log("Closing WebSocket for real-time detection.");
         realTimeWebSocket.close();
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+import backends
+
+tf = pytest.importorskip("tensorflow")
+
+TOLERANCE = 1e-5
+
+
+def random_bilstm(timesteps=20, features=39):
+    from tensorflow.keras import Input, Sequential
+    from tensorflow.keras.layers import LSTM, Bidirectional, Dense, Dropout
+
+    tf.keras.utils.set_random_seed(0)
+    return Sequential([
+        Input((timesteps, features)),
+        Bidirectional(LSTM(8, return_sequences=True)),
+        Bidirectional(LSTM(6), merge_mode="sum"),
+        Dropout(0.3),
+        Dense(4, activation="relu"),
+        Dense(1, activation="sigmoid"),
+    ])
+
+
+def test_numpy_export_matches_keras(tmp_path):
+    model = random_bilstm()
+    model_path = str(tmp_path / "model.h5")
+    model.save(model_path)
+    export_path = backends.export_keras_model(model, str(tmp_path / "model.npz"))
+
+    batch = np.random.default_rng(0).standard_normal((5, 20, 39)).astype(np.float32)
+    keras_scores = backends.create_backend("keras", model_path).predict(batch)
+    numpy_scores = backends.create_backend("numpy", export_path).predict(batch)
+
+    assert numpy_scores.shape == keras_scores.shape == (5,)
+    assert np.allclose(numpy_scores, keras_scores, atol=TOLERANCE, rtol=0)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+import features as feature_engine
+
+librosa = pytest.importorskip("librosa")
+
+LIBROSA_TOLERANCE = 5e-3
+STREAMING_TOLERANCE = 1e-4
+
+
+def synthetic_clip(seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * feature_engine.SAMPLE_RATE)) / feature_engine.SAMPLE_RATE
+    tone = 0.3 * np.sin(2 * np.pi * 220.0 * t) * (1.0 + np.sin(2 * np.pi * 0.7 * t))
+    return (tone + 0.05 * rng.standard_normal(t.size)).astype(np.float32)
+
+
+def librosa_features(audio):
+    mfcc = librosa.feature.mfcc(y=audio, sr=feature_engine.SAMPLE_RATE, n_mfcc=feature_engine.N_MFCC)
+    delta = librosa.feature.delta(mfcc)
+    delta2 = librosa.feature.delta(mfcc, order=2)
+    return np.vstack([mfcc, delta, delta2]).T
+
+
+def test_features_match_librosa():
+    clips = [synthetic_clip(feature_engine.DURATION, seed) for seed in range(3)]
+    batch, valid = feature_engine.extract_batch(clips)
+    assert valid.all()
+    for clip, engine in zip(clips, batch):
+        reference = librosa_features(clip)[:feature_engine.MAX_TIMESTEPS]
+        steps = reference.shape[0]
+        assert np.abs(engine[:steps] - reference).max() < LIBROSA_TOLERANCE
+        assert np.abs(feature_engine.compute_features(clip)[:steps] - reference).max() < LIBROSA_TOLERANCE
+
+
+def test_streaming_matches_full_recompute():
+    audio = synthetic_clip(8.0)
+    extractor = feature_engine.StreamingFeatureExtractor(hop_seconds=0.5)
+    windows = 0
+    for start in range(0, audio.size - extractor.window_samples + 1, extractor.hop_samples):
+        window = audio[start:start + extractor.window_samples]
+        streamed = extractor.window_features(window, start)
+        assert np.abs(streamed - feature_engine.compute_features(window)).max() < STREAMING_TOLERANCE
+        windows += 1
+    assert windows > 1
+    assert extractor.frames_reused > 0
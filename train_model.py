@@ -1,13 +1,14 @@
 import os
 import numpy as np
-import librosa
-import tensorflow as tf
 from sklearn.model_selection import train_test_split
 from sklearn.utils.class_weight import compute_class_weight
 from sklearn.preprocessing import StandardScaler
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dense, Dropout, Bidirectional
 from tensorflow.keras.callbacks import EarlyStopping
+from backends import export_keras_model
+from dataset_cache import CACHE_DIR, build_dataset
+from training_pipeline import fit_scaler, make_dataset
 
 
 DATA_DIR = "dataset"
@@ -15,86 +16,91 @@ SAMPLE_RATE = 22050
 DURATION = 3
 N_MFCC = 13
 AUGMENT = True
+AUGMENT_SEED = int(os.environ.get("AUGMENT_SEED", "0"))
+FEATURE_WORKERS = int(os.environ["FEATURE_WORKERS"]) if os.environ.get("FEATURE_WORKERS") else None
+STREAMING = os.environ.get("TRAIN_STREAMING", "0") == "1"
+BATCH_SIZE = 16
 MODEL_PATH = "brainrot_lstm_model.h5"
+EXPORT_PATH = "brainrot_lstm_model.npz"
+CASCADE_HINT = "Model saved. Run python cascade.py to retrain and check the cascade against it."
 
-def extract_features(file_path):
-    y, sr = librosa.load(file_path, sr=SAMPLE_RATE, duration=DURATION)
-    if len(y) < sr * DURATION:
-        y = np.pad(y, (0, sr * DURATION - len(y)))
 
-    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=N_MFCC)
-    delta = librosa.feature.delta(mfcc)
-    delta2 = librosa.feature.delta(mfcc, order=2)
-    combined = np.vstack([mfcc, delta, delta2])
-    return combined.T 
-    
-def augment_audio(y):
-    noise = y + 0.005 * np.random.randn(len(y))
-    stretch = librosa.effects.time_stretch(y, rate=np.random.uniform(0.8, 1.2))
-    pitch = librosa.effects.pitch_shift(y, sr=SAMPLE_RATE, n_steps=np.random.randint(-2, 2))
-    return [noise[:len(y)], stretch[:len(y)], pitch[:len(y)]]
+def build_model(input_shape):
+    model = Sequential([
+        Bidirectional(LSTM(64, return_sequences=False), input_shape=input_shape),
+        Dropout(0.3),
+        Dense(64, activation='relu'),
+        Dropout(0.3),
+        Dense(1, activation='sigmoid')
+    ])
+    model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'])
+    return model
 
 
-features, labels = [], []
+def train_streaming(X, y):
+    indices = np.arange(len(y))
+    train_idx, test_idx = train_test_split(indices, test_size=0.2, stratify=y, random_state=42)
+    train_idx, val_idx = train_test_split(train_idx, test_size=0.2, stratify=y[train_idx], random_state=42)
 
-for label_dir, label_value in [("brainrot", 1), ("no_brainrot", 0)]:
-    full_dir = os.path.join(DATA_DIR, label_dir)
-    for filename in os.listdir(full_dir):
-        if filename.endswith(".wav"):
-            path = os.path.join(full_dir, filename)
-            try:
-                y, _ = librosa.load(path, sr=SAMPLE_RATE, duration=DURATION)
-                feats = extract_features(path)
-                features.append(feats)
-                labels.append(label_value)
+    mean, scale = fit_scaler(X, train_idx)
+    np.save("scaler_mean.npy", mean)
+    np.save("scaler_scale.npy", scale)
 
-                if AUGMENT and label_value == 1:
-                    for aug_y in augment_audio(y):
-                        mfcc = librosa.feature.mfcc(y=aug_y, sr=SAMPLE_RATE, n_mfcc=N_MFCC)
-                        delta = librosa.feature.delta(mfcc)
-                        delta2 = librosa.feature.delta(mfcc, order=2)
-                        combined = np.vstack([mfcc, delta, delta2])
-                        features.append(combined.T)
-                        labels.append(label_value)
-            except Exception as e:
-                print(f"Error processing {filename}: {e}")
+    train_ds = make_dataset(X, y, train_idx, mean, scale, BATCH_SIZE, augment=True, shuffle=True, seed=AUGMENT_SEED)
+    val_ds = make_dataset(X, y, val_idx, mean, scale, BATCH_SIZE)
+    test_ds = make_dataset(X, y, test_idx, mean, scale, BATCH_SIZE)
 
+    class_weights = compute_class_weight(class_weight='balanced', classes=np.unique(y[train_idx]), y=y[train_idx])
+    class_weights = {i: w for i, w in enumerate(class_weights)}
 
-X = tf.keras.preprocessing.sequence.pad_sequences(features, padding='post', dtype='float32')
-y = np.array(labels)
+    model = build_model(X.shape[1:])
+    early_stop = EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
+    model.fit(train_ds, validation_data=val_ds, epochs=100, class_weight=class_weights, callbacks=[early_stop])
 
+    loss, acc = model.evaluate(test_ds)
+    model.save(MODEL_PATH)
+    export_keras_model(model, EXPORT_PATH, mean, scale)
+    print(CASCADE_HINT)
 
-scaler = StandardScaler()
-X_flat = X.reshape(-1, X.shape[-1])
-scaler.fit(X_flat)
 
+def main():
+    X, y = build_dataset(DATA_DIR, augment=AUGMENT, seed=AUGMENT_SEED, workers=FEATURE_WORKERS)
+    print(f"Loaded {len(y)} feature matrices {X.shape[1:]} from {CACHE_DIR}.")
+    if STREAMING:
+        train_streaming(X, y)
+        return
 
-np.save("scaler_mean.npy", scaler.mean_)
-np.save("scaler_scale.npy", scaler.scale_)
+    X = np.asarray(X)
 
-X_scaled = ((X_flat - scaler.mean_) / scaler.scale_).reshape(X.shape)
+    scaler = StandardScaler()
+    X_flat = X.reshape(-1, X.shape[-1])
+    scaler.fit(X_flat)
 
 
-X_train, X_test, y_train, y_test = train_test_split(X_scaled, y, test_size=0.2, stratify=y, random_state=42)
+    np.save("scaler_mean.npy", scaler.mean_)
+    np.save("scaler_scale.npy", scaler.scale_)
 
+    X_scaled = ((X_flat - scaler.mean_) / scaler.scale_).reshape(X.shape)
 
-class_weights = compute_class_weight(class_weight='balanced', classes=np.unique(y_train), y=y_train)
-class_weights = {i: w for i, w in enumerate(class_weights)}
 
+    X_train, X_test, y_train, y_test = train_test_split(X_scaled, y, test_size=0.2, stratify=y, random_state=42)
 
-model = Sequential([
-    Bidirectional(LSTM(64, return_sequences=False), input_shape=(X.shape[1], X.shape[2])),
-    Dropout(0.3),
-    Dense(64, activation='relu'),
-    Dropout(0.3),
-    Dense(1, activation='sigmoid')
-])
 
-model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'])
-early_stop = EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
+    class_weights = compute_class_weight(class_weight='balanced', classes=np.unique(y_train), y=y_train)
+    class_weights = {i: w for i, w in enumerate(class_weights)}
 
-model.fit(X_train, y_train, validation_split=0.2, epochs=100, batch_size=16,
-          class_weight=class_weights, callbacks=[early_stop])
 
-loss, acc = model.evaluate(X_test, y_test)
-model.save(MODEL_PATH)
+    model = build_model((X.shape[1], X.shape[2]))
+    early_stop = EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
+
+    model.fit(X_train, y_train, validation_split=0.2, epochs=100, batch_size=BATCH_SIZE,
+              class_weight=class_weights, callbacks=[early_stop])
+
+    loss, acc = model.evaluate(X_test, y_test)
+    model.save(MODEL_PATH)
+    export_keras_model(model, EXPORT_PATH, scaler.mean_, scaler.scale_)
+    print(CASCADE_HINT)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import numpy as np
+import tensorflow as tf
+
+SCALER_CHUNK_ROWS = 256
+TIME_MASK_FRAMES = 10
+FEATURE_MASK_BINS = 4
+NOISE_STDDEV = 0.05
+
+
+class WelfordScaler:
+    def __init__(self, width):
+        self.count = 0
+        self.mean = np.zeros(width, dtype=np.float64)
+        self.m2 = np.zeros(width, dtype=np.float64)
+
+    def update(self, rows):
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, self.mean.shape[0])
+        if rows.shape[0] == 0:
+            return
+        count = rows.shape[0]
+        mean = rows.mean(axis=0)
+        m2 = ((rows - mean) ** 2).sum(axis=0)
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * (count / total)
+        self.m2 += m2 + delta ** 2 * (self.count * count / total)
+        self.count = total
+
+    @property
+    def scale(self):
+        std = np.sqrt(self.m2 / max(self.count, 1))
+        std[std == 0.0] = 1.0
+        return std
+
+
+def fit_scaler(features, indices=None, chunk_rows=SCALER_CHUNK_ROWS):
+    indices = np.arange(len(features)) if indices is None else np.sort(indices)
+    scaler = WelfordScaler(features.shape[-1])
+    for start in range(0, len(indices), chunk_rows):
+        scaler.update(features[indices[start:start + chunk_rows]])
+    return scaler.mean, scaler.scale
+
+
+def augment_batch(x):
+    shape = tf.shape(x)
+    batch, steps, width = shape[0], shape[1], shape[2]
+
+    start = tf.random.uniform([batch, 1], 0, tf.maximum(steps - TIME_MASK_FRAMES, 1), dtype=tf.int32)
+    length = tf.random.uniform([batch, 1], 0, TIME_MASK_FRAMES + 1, dtype=tf.int32)
+    frames = tf.range(steps)[None, :]
+    time_keep = tf.logical_or(frames < start, frames >= start + length)
+
+    first = tf.random.uniform([batch, 1], 0, tf.maximum(width - FEATURE_MASK_BINS, 1), dtype=tf.int32)
+    bins = tf.random.uniform([batch, 1], 0, FEATURE_MASK_BINS + 1, dtype=tf.int32)
+    columns = tf.range(width)[None, :]
+    feature_keep = tf.logical_or(columns < first, columns >= first + bins)
+
+    keep = tf.logical_and(time_keep[:, :, None], feature_keep[:, None, :])
+    x = tf.where(keep, x, tf.zeros_like(x))
+    return x + tf.random.normal(shape, stddev=NOISE_STDDEV)
+
+
+def make_dataset(features, labels, indices, mean, scale, batch_size=16, augment=False, shuffle=False, seed=0):
+    mean = np.asarray(mean, dtype=np.float32)
+    scale = np.asarray(scale, dtype=np.float32)
+    steps, width = features.shape[1:]
+
+    def load(batch_indices):
+        order = np.sort(batch_indices)
+        x = (np.asarray(features[order], dtype=np.float32) - mean) / scale
+        return x, np.asarray(labels[order], dtype=np.float32)
+
+    def load_batch(batch_indices):
+        x, y = tf.numpy_function(load, [batch_indices], (tf.float32, tf.float32))
+        x.set_shape([None, steps, width])
+        y.set_shape([None])
+        return x, y
+
+    dataset = tf.data.Dataset.from_tensor_slices(np.asarray(indices, dtype=np.int64))
+    if shuffle:
+        dataset = dataset.shuffle(len(indices), seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size).map(load_batch, num_parallel_calls=tf.data.AUTOTUNE)
+    if augment:
+        dataset = dataset.map(lambda x, y: (augment_batch(x), y), num_parallel_calls=tf.data.AUTOTUNE)
+    return dataset.prefetch(tf.data.AUTOTUNE)
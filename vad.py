@@ -0,0 +1,126 @@
+import os
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+import metrics
+
+SAMPLE_RATE = 22050
+VAD_ENABLED = os.environ.get("VAD_ENABLED", "1") == "1"
+VAD_FRAME_SAMPLES = 512
+VAD_ENERGY_FLOOR_DB = float(os.environ.get("VAD_ENERGY_FLOOR_DB", "-50"))
+VAD_MARGIN_DB = float(os.environ.get("VAD_MARGIN_DB", "6"))
+VAD_FLATNESS_MAX = float(os.environ.get("VAD_FLATNESS_MAX", "0.35"))
+VAD_ZCR_MAX = float(os.environ.get("VAD_ZCR_MAX", "0.35"))
+VAD_MIN_SPEECH_FRACTION = float(os.environ.get("VAD_MIN_SPEECH_FRACTION", "0.1"))
+VAD_BAND_HZ = (200.0, 4000.0)
+NOISE_FLOOR_ALPHA = 0.2
+NO_SPEECH = "no_speech"
+
+metrics.describe("vad_windows_total", "Windows checked by the voice-activity gate, by path and decision")
+
+_lock = threading.Lock()
+_paths = {}
+
+
+@lru_cache(maxsize=None)
+def frame_window():
+    return np.hanning(VAD_FRAME_SAMPLES).astype(np.float32)
+
+
+@lru_cache(maxsize=None)
+def speech_band(sample_rate=SAMPLE_RATE):
+    freqs = np.fft.rfftfreq(VAD_FRAME_SAMPLES, 1.0 / sample_rate)
+    return (freqs >= VAD_BAND_HZ[0]) & (freqs <= VAD_BAND_HZ[1])
+
+
+class VoiceActivityDetector:
+    def __init__(self, energy_floor_db=VAD_ENERGY_FLOOR_DB, margin_db=VAD_MARGIN_DB, flatness_max=VAD_FLATNESS_MAX,
+                 zcr_max=VAD_ZCR_MAX, min_speech_fraction=VAD_MIN_SPEECH_FRACTION):
+        self.energy_floor_db = energy_floor_db
+        self.margin_db = margin_db
+        self.flatness_max = flatness_max
+        self.zcr_max = zcr_max
+        self.min_speech_fraction = min_speech_fraction
+        self.noise_floor_db = None
+
+    def reset(self):
+        self.noise_floor_db = None
+
+    def frame_features(self, audio):
+        count = audio.size // VAD_FRAME_SAMPLES
+        frames = np.asarray(audio[:count * VAD_FRAME_SAMPLES], dtype=np.float32).reshape(count, VAD_FRAME_SAMPLES)
+        window = frame_window()
+        power = np.abs(np.fft.rfft(frames * window, axis=1)[:, speech_band()]) ** 2 + 1e-12
+        energy_db = 10.0 * np.log10(2.0 * power.sum(axis=1) / (VAD_FRAME_SAMPLES * np.sum(window ** 2)) + 1e-12)
+        flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (VAD_FRAME_SAMPLES - 1)
+        return energy_db, flatness, zcr
+
+    def speech_frames(self, audio):
+        energy_db, flatness, zcr = self.frame_features(audio)
+        if energy_db.size == 0:
+            return np.zeros(0, dtype=bool)
+        noise_like = (flatness >= self.flatness_max) | (energy_db < self.energy_floor_db)
+        if noise_like.any():
+            window_floor = float(np.median(energy_db[noise_like]))
+            if self.noise_floor_db is None:
+                self.noise_floor_db = window_floor
+            else:
+                self.noise_floor_db += NOISE_FLOOR_ALPHA * (window_floor - self.noise_floor_db)
+        threshold = self.energy_floor_db
+        if self.noise_floor_db is not None:
+            threshold = max(threshold, self.noise_floor_db + self.margin_db)
+        return (energy_db > threshold) & (flatness < self.flatness_max) & (zcr < self.zcr_max)
+
+    def speech_fraction(self, audio):
+        frames = self.speech_frames(audio)
+        return float(frames.mean()) if frames.size else 0.0
+
+    def is_speech(self, audio):
+        return self.speech_fraction(audio) >= self.min_speech_fraction
+
+
+def check(detector, audio, path):
+    if not VAD_ENABLED:
+        return True
+    with metrics.timed("vad"):
+        speech = detector.is_speech(audio)
+    decision = "speech" if speech else NO_SPEECH
+    metrics.increment("vad_windows_total", path=path, decision=decision)
+    with _lock:
+        counts = _paths.setdefault(path, {"speech": 0, NO_SPEECH: 0})
+        counts[decision] += 1
+    return speech
+
+
+def no_speech_result(seq=None):
+    result = {"score": 0.0, "label": NO_SPEECH, "speech": False}
+    if seq is not None:
+        result = dict(seq=seq, **result)
+    return result
+
+
+def stats():
+    with _lock:
+        paths = {path: dict(counts) for path, counts in _paths.items()}
+    speech = sum(counts["speech"] for counts in paths.values())
+    skipped = sum(counts[NO_SPEECH] for counts in paths.values())
+    vad = metrics.stage("vad").snapshot()
+    inference_ms = sum(metrics.stage(name).snapshot()["sum"] for name in ("extract_features", "predict"))
+    per_window_ms = inference_ms / speech if speech else None
+    for counts in paths.values():
+        total = counts["speech"] + counts[NO_SPEECH]
+        counts["skip_ratio"] = round(counts[NO_SPEECH] / total, 4) if total else None
+    return {
+        "enabled": VAD_ENABLED,
+        "windows": speech + skipped,
+        "skipped": skipped,
+        "skip_ratio": round(skipped / (speech + skipped), 4) if speech + skipped else None,
+        "paths": paths,
+        "vad_ms_mean": vad["mean"],
+        "inference_ms_per_window": round(per_window_ms, 3) if per_window_ms is not None else None,
+        "estimated_cpu_saved_ms": round(skipped * per_window_ms - vad["sum"], 1) if per_window_ms else None,
+    }
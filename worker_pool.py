@@ -0,0 +1,385 @@
+import collections
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import queue
+import threading
+import time
+import uuid
+
+import numpy as np
+
+import log_setup
+import metrics
+import shared_weights
+from batcher import collect_batch
+from model_registry import ModelUnavailable
+
+logger = logging.getLogger(__name__)
+
+MODEL_CHECK_SECONDS = 1.0
+WORKER_START_METHOD = os.environ.get("WORKER_START_METHOD", "spawn")
+WORKER_HEARTBEAT_SECONDS = 2.0
+WORKER_HEALTH_TIMEOUT = float(os.environ.get("WORKER_HEALTH_TIMEOUT", "30"))
+WORKER_START_TIMEOUT = float(os.environ.get("WORKER_START_TIMEOUT", "180"))
+WORKER_MAX_JOBS = int(os.environ.get("WORKER_MAX_JOBS", "0"))
+WORKER_MAX_RSS_MB = float(os.environ.get("WORKER_MAX_RSS_MB", "0"))
+DISPATCH_REFRESH_SECONDS = 0.25
+PREDICT_TIMEOUT = 60
+
+
+def memory_usage(pid="self"):
+    usage = {}
+    fields = {"VmRSS:": "rss_mb", "RssAnon:": "anon_mb", "RssFile:": "file_mb", "RssShmem:": "shmem_mb"}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                parts = line.split()
+                if parts and parts[0] in fields:
+                    usage[fields[parts[0]]] = round(int(parts[1]) / 1024, 1)
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if parts and parts[0] == "Pss:":
+                    usage["pss_mb"] = round(int(parts[1]) / 1024, 1)
+    except OSError:
+        pass
+    return usage
+
+
+def worker_main(task_queue, conn, max_batch_size, max_wait, generation):
+    started = time.monotonic()
+    log_buffer = log_setup.buffer_logs()
+    import audio_processor
+
+    seen_generation = generation.value
+    warmup_seconds = audio_processor.warmup()
+    metrics.buffer()
+    model = audio_processor.get_model()
+    conn.send(("ready", {
+        "import_and_warmup": round(time.monotonic() - started, 3),
+        "warmup": round(warmup_seconds, 3),
+        "backend": model.backend_name if model is not None else None,
+        "shared_weights": bool(getattr(getattr(model, "backend", None), "shared", False)),
+    }))
+    send_logs(conn, log_buffer)
+    last_heartbeat = time.monotonic()
+
+    while True:
+        batch = collect_batch(task_queue, max_batch_size, max_wait, first_timeout=MODEL_CHECK_SECONDS, stop_item=None)
+        if generation.value != seen_generation:
+            seen_generation = generation.value
+            try:
+                audio_processor.registry.reload()
+            except Exception as e:
+                logger.warning(f"Worker {os.getpid()} could not reload models: {e}")
+        stopping = bool(batch) and batch[-1] is None
+        jobs = [item for item in batch if item is not None]
+        if jobs:
+            conn.send(("results", run_jobs(jobs, audio_processor)))
+            observations = metrics.drain()
+            if observations:
+                conn.send(("metrics", observations))
+        send_logs(conn, log_buffer)
+        if stopping:
+            return
+        if time.monotonic() - last_heartbeat >= WORKER_HEARTBEAT_SECONDS:
+            conn.send(("heartbeat", None))
+            last_heartbeat = time.monotonic()
+
+
+def send_logs(conn, log_buffer):
+    records = log_buffer.drain()
+    if records:
+        conn.send(("logs", records))
+
+
+def run_jobs(jobs, audio_processor):
+    started = time.monotonic()
+    for _, _, _, submitted in jobs:
+        metrics.observe_stage("worker_queue_wait", (started - submitted) * 1000.0)
+    features = [payload if payload.ndim == 3 else None for _, _, payload, _ in jobs]
+    raw = [i for i, (_, _, payload, _) in enumerate(jobs) if payload.ndim != 3]
+    if raw:
+        batch, valid = audio_processor.extract_features_batch([jobs[i][2] for i in raw])
+        for row, i in enumerate(raw):
+            if valid[row]:
+                features[i] = batch[row:row + 1]
+
+    valid = [f for f in features if f is not None]
+    scores = []
+    error = None
+    if valid:
+        try:
+            scores = list(audio_processor.predict_batch(np.concatenate(valid, axis=0)))
+        except Exception as e:
+            logger.error(f"Prediction error in worker {os.getpid()}: {e}")
+            error = {"error": str(e), "unavailable": isinstance(e, audio_processor.ModelUnavailable)}
+
+    results = []
+    for (session_id, seq, _, _), f in zip(jobs, features):
+        if error is not None and f is not None:
+            results.append((session_id, dict(error, seq=seq)))
+            continue
+        score = float(scores.pop(0)) if f is not None else 0.0
+        label = "brainrot" if score > audio_processor.THRESHOLD else "normal"
+        results.append((session_id, {"seq": seq, "score": round(score, 3), "label": label}))
+    return results
+
+
+class PoolWorker:
+    def __init__(self, process, tasks, conn):
+        self.process = process
+        self.pid = process.pid
+        self.tasks = tasks
+        self.conn = conn
+        self.spawned_at = time.monotonic()
+        self.last_seen = self.spawned_at
+        self.ready = False
+        self.retiring = False
+        self.jobs = 0
+        self.in_flight = collections.deque()
+
+    def describe(self, now):
+        return {
+            "pid": self.pid,
+            "ready": self.ready,
+            "retiring": self.retiring,
+            "jobs": self.jobs,
+            "in_flight": len(self.in_flight),
+            "age_seconds": round(now - self.spawned_at, 1),
+            "last_seen_seconds": round(now - self.last_seen, 1),
+            "memory": memory_usage(self.pid),
+        }
+
+
+class InferenceWorkerPool:
+    def __init__(self, num_workers=2, max_batch_size=16, max_wait_ms=5.0, start_method=WORKER_START_METHOD):
+        self.num_workers = max(1, int(num_workers))
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.start_method = start_method
+        self._ctx = multiprocessing.get_context(start_method)
+        if start_method == "forkserver":
+            self._ctx.set_forkserver_preload(["worker_preload"])
+        self._workers = []
+        self._dispatcher = None
+        self._monitor = None
+        self._stopping = threading.Event()
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._generation = self._ctx.Value("i", 0)
+        self.counters = {"spawned": 0, "recycled": 0, "crashed": 0, "killed": 0, "resubmitted": 0}
+        self.ready = {}
+
+    def start(self):
+        with self._lock:
+            if self._workers:
+                return
+            self._stopping.clear()
+            self._share_weights()
+            for _ in range(self.num_workers):
+                self._spawn_worker()
+            self._dispatcher = threading.Thread(target=self._dispatch, name="worker-pool-dispatch", daemon=True)
+            self._dispatcher.start()
+            self._monitor = threading.Thread(target=self._watch_workers, name="worker-pool-monitor", daemon=True)
+            self._monitor.start()
+
+    def _share_weights(self):
+        import audio_processor
+
+        try:
+            audio_processor.share_model_weights()
+        except Exception as e:
+            logger.warning(f"Could not share model weights with inference workers: {e}")
+
+    def _spawn_worker(self):
+        tasks = self._ctx.Queue()
+        reader, writer = self._ctx.Pipe(duplex=False)
+        process = self._ctx.Process(
+            target=worker_main,
+            args=(tasks, writer, self.max_batch_size, self.max_wait, self._generation),
+            daemon=True
+        )
+        process.start()
+        writer.close()
+        self._workers.append(PoolWorker(process, tasks, reader))
+        self.counters["spawned"] += 1
+
+    def stop(self, timeout=10):
+        self._stopping.set()
+        with self._lock:
+            workers = list(self._workers)
+        for worker in workers:
+            worker.tasks.put(None)
+        for worker in workers:
+            worker.process.join(timeout=timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        for thread in (self._dispatcher, self._monitor):
+            if thread is not None and thread is not threading.current_thread():
+                thread.join(timeout=timeout)
+        with self._lock:
+            for worker in self._workers:
+                worker.conn.close()
+            self._workers = []
+            self.ready.clear()
+        shared_weights.release()
+
+    def register(self, session_id, handler):
+        self._handlers[session_id] = handler
+
+    def unregister(self, session_id):
+        self._handlers.pop(session_id, None)
+
+    def submit(self, session_id, seq, payload):
+        self.start()
+        self._enqueue((session_id, seq, payload, time.monotonic()))
+
+    def _enqueue(self, job):
+        with self._lock:
+            candidates = [worker for worker in self._workers if not worker.retiring] or self._workers
+            if not candidates:
+                raise RuntimeError("The inference worker pool has no workers.")
+            worker = min(candidates, key=lambda w: (not w.ready, len(w.in_flight)))
+            worker.in_flight.append(job)
+            worker.tasks.put(job)
+
+    def predict(self, features, timeout=PREDICT_TIMEOUT):
+        key = f"predict-{uuid.uuid4().hex}"
+        results = queue.Queue()
+        self.register(key, results.put)
+        try:
+            for row in range(len(features)):
+                self.submit(key, row, features[row:row + 1])
+            scores = np.zeros(len(features), dtype=np.float32)
+            for _ in range(len(features)):
+                result = results.get(timeout=timeout)
+                if "error" in result:
+                    raise (ModelUnavailable if result["unavailable"] else RuntimeError)(result["error"])
+                scores[result["seq"]] = result["score"]
+            return scores
+        finally:
+            self.unregister(key)
+
+    def reload_models(self):
+        self._share_weights()
+        with self._generation.get_lock():
+            self._generation.value += 1
+
+    def alive_workers(self):
+        with self._lock:
+            return sum(1 for worker in self._workers if worker.process.is_alive())
+
+    def memory_mb(self, field="rss_mb"):
+        with self._lock:
+            pids = [worker.pid for worker in self._workers]
+        return sum(memory_usage(pid).get(field, 0.0) for pid in pids)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            workers = [worker.describe(now) for worker in self._workers]
+            counters = dict(self.counters)
+        return {
+            "workers": self.num_workers,
+            "start_method": self.start_method,
+            "alive": self.alive_workers(),
+            "ready": dict(self.ready),
+            "sessions": len(self._handlers),
+            "model_generation": self._generation.value,
+            "counters": counters,
+            "processes": workers,
+            "parent_memory": memory_usage(),
+            "shared_weights": shared_weights.stats(),
+        }
+
+    def _dispatch(self):
+        while not self._stopping.is_set():
+            with self._lock:
+                workers = {worker.conn: worker for worker in self._workers}
+            for conn in multiprocessing.connection.wait(list(workers), timeout=DISPATCH_REFRESH_SECONDS):
+                worker = workers[conn]
+                try:
+                    kind, payload = conn.recv()
+                except (EOFError, OSError):
+                    self._worker_exited(worker)
+                    continue
+                worker.last_seen = time.monotonic()
+                if kind == "results":
+                    self._deliver(worker, payload)
+                elif kind == "metrics":
+                    metrics.merge(payload)
+                elif kind == "logs":
+                    log_setup.replay(payload)
+                elif kind == "ready":
+                    worker.ready = True
+                    payload["time_to_first_prediction"] = round(time.monotonic() - worker.spawned_at, 3)
+                    self.ready[worker.pid] = payload
+                    logger.info(f"Inference worker {worker.pid} ready: {payload}")
+
+    def _deliver(self, worker, results):
+        with self._lock:
+            for _ in results:
+                if worker.in_flight:
+                    worker.in_flight.popleft()
+            worker.jobs += len(results)
+        for session_id, result in results:
+            handler = self._handlers.get(session_id)
+            if handler is not None:
+                handler(result)
+        if WORKER_MAX_JOBS and worker.jobs >= WORKER_MAX_JOBS:
+            self._recycle(worker, f"served {worker.jobs} jobs")
+
+    def _worker_exited(self, worker):
+        with self._lock:
+            if worker not in self._workers:
+                return
+            self._workers.remove(worker)
+            worker.conn.close()
+            worker.tasks.cancel_join_thread()
+            self.ready.pop(worker.pid, None)
+            pending = list(worker.in_flight)
+            if self._stopping.is_set():
+                return
+            if not worker.retiring:
+                logger.warning(f"Inference worker {worker.pid} exited unexpectedly. Starting a replacement.")
+                self.counters["crashed"] += 1
+                self._spawn_worker()
+            self.counters["resubmitted"] += len(pending)
+        if pending:
+            logger.warning(f"Resubmitting {len(pending)} jobs from inference worker {worker.pid}.")
+            for job in pending:
+                self._enqueue(job)
+
+    def _recycle(self, worker, reason):
+        with self._lock:
+            if worker.retiring or worker not in self._workers or self._stopping.is_set():
+                return
+            logger.info(f"Recycling inference worker {worker.pid} ({reason}).")
+            worker.retiring = True
+            self.counters["recycled"] += 1
+            self._spawn_worker()
+            worker.tasks.put(None)
+
+    def _watch_workers(self):
+        while not self._stopping.wait(WORKER_HEARTBEAT_SECONDS):
+            now = time.monotonic()
+            with self._lock:
+                workers = list(self._workers)
+            for worker in workers:
+                if not worker.process.is_alive():
+                    continue
+                limit = WORKER_HEALTH_TIMEOUT if worker.ready else WORKER_START_TIMEOUT
+                if now - worker.last_seen > limit:
+                    logger.warning(f"Inference worker {worker.pid} missed its health check "
+                                   f"({now - worker.last_seen:.0f}s without a heartbeat). Killing it.")
+                    with self._lock:
+                        self.counters["killed"] += 1
+                    worker.process.kill()
+                    continue
+                if WORKER_MAX_RSS_MB and not worker.retiring:
+                    rss = memory_usage(worker.pid).get("rss_mb", 0.0)
+                    if rss > WORKER_MAX_RSS_MB:
+                        self._recycle(worker, f"RSS {rss:.0f} MB over {WORKER_MAX_RSS_MB:.0f} MB")
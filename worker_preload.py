@@ -0,0 +1,6 @@
+import audio_processor
+import shared_weights
+
+if audio_processor.INFERENCE_BACKEND == "numpy":
+    audio_processor.warmup()
+    shared_weights.untrack_attached()